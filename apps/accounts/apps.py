@@ -4,3 +4,13 @@ from django.apps import AppConfig
 class AccountsConfig(AppConfig):
     default_auto_field = 'django.db.models.BigAutoField'
     name = 'apps.accounts'
+
+    def ready(self):
+        """
+        當 Django 應用程式啟動時執行
+
+        檢查庫存警告分散發送的設定（網站與 worker 程序都會執行）
+        """
+        from .services import UserPreferenceService
+
+        UserPreferenceService.check_delivery_settings()
@@ -0,0 +1,65 @@
+# Generated by Django 5.1.1 on 2026-10-17 04:22
+
+import json
+
+from django.db import migrations, models
+from django.utils import timezone
+
+
+LEGACY_TASK = 'apps.library.tasks.check_low_stock_books_for_user'
+BUCKET_TASK = 'apps.library.tasks.check_low_stock_books_for_frequency'
+
+
+def merge_stock_alert_tasks(apps, schema_editor):
+    """
+    把每位使用者一個的庫存警告排程合併成每個頻率一個
+
+    每個頻率挑一個舊排程改成該頻率的分組任務（沿用它的 interval/crontab），其餘舊排程刪除
+    """
+    PeriodicTask = apps.get_model('django_celery_beat', 'PeriodicTask')
+    PeriodicTasks = apps.get_model('django_celery_beat', 'PeriodicTasks')
+    UserPreference = apps.get_model('accounts', 'UserPreference')
+
+    legacy = PeriodicTask.objects.filter(task=LEGACY_TASK)
+    if not legacy.exists():
+        return
+
+    frequencies = dict(UserPreference.objects.values_list('user_id', 'stock_alert_frequency'))
+    existing = set(PeriodicTask.objects.filter(task=BUCKET_TASK).values_list('name', flat=True))
+
+    templates = {}
+    for task_id, kwargs in legacy.values_list('id', 'kwargs').iterator():
+        frequency = frequencies.get(json.loads(kwargs or '{}').get('user_id'))
+        if (
+            frequency and frequency != 'disabled'
+            and frequency not in templates
+            and f'stock_alert_{frequency}' not in existing
+        ):
+            templates[frequency] = task_id
+
+    for frequency, task_id in templates.items():
+        PeriodicTask.objects.filter(id=task_id).update(
+            name=f'stock_alert_{frequency}',
+            task=BUCKET_TASK,
+            kwargs=json.dumps({'frequency': frequency}),
+        )
+    legacy.delete()
+
+    # QuerySet 的 update/delete 不會觸發 Signal，手動通知 Beat 重新載入排程
+    PeriodicTasks.objects.update_or_create(ident=1, defaults={'last_update': timezone.now()})
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('accounts', '0003_alter_userpreference_stock_alert_frequency'),
+        ('django_celery_beat', '0019_alter_periodictasks_options'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='userpreference',
+            index=models.Index(fields=['stock_alert_frequency', 'browser_notification', 'user'], name='accounts_pref_alert_idx'),
+        ),
+        migrations.RunPython(merge_stock_alert_tasks, migrations.RunPython.noop),
+    ]
@@ -55,6 +55,13 @@ class UserPreference(models.Model):
     class Meta:
         verbose_name = '使用者偏好設定'
         verbose_name_plural = '使用者偏好設定'
+        indexes = [
+            # 依頻率分組的庫存警告任務：找出某個頻率、開啟瀏覽器通知的使用者
+            models.Index(
+                fields=['stock_alert_frequency', 'browser_notification', 'user'],
+                name='accounts_pref_alert_idx',
+            ),
+        ]
 
     def __str__(self):
         return f'{self.user.username} 的偏好設定'
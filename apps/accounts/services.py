@@ -3,9 +3,12 @@
 
 處理偏好設定相關的業務邏輯，包含動態排程管理
 """
+from django.conf import settings
+from django.core.exceptions import ImproperlyConfigured
 from django.db import transaction
 from django_celery_beat.models import PeriodicTask, IntervalSchedule, CrontabSchedule
 import json
+import zlib
 
 
 class UserPreferenceService:
@@ -20,6 +23,16 @@ class UserPreferenceService:
         'weekly': {'type': 'crontab', 'hour': 9, 'minute': 0, 'day_of_week': 1},
     }
 
+    # 通知分散發送的時間範圍（秒），每位使用者固定落在其中某個時段，避免同一秒全部送出
+    # 可在 settings.STOCK_ALERT_DELIVERY_WINDOWS 覆寫；沒有列出的頻率不分散
+    DEFAULT_DELIVERY_WINDOWS = {'hourly': 600, 'daily': 1800, 'weekly': 1800}
+
+    # 分散發送的時段長度（秒），可在 settings.STOCK_ALERT_DELIVERY_SLOT_SECONDS 覆寫
+    DEFAULT_DELIVERY_SLOT_SECONDS = 60
+
+    # Redis broker 預設的 visibility_timeout（秒）：延後執行的任務超過這個時間還沒確認會被重新派送
+    DEFAULT_VISIBILITY_TIMEOUT = 60 * 60
+
     @classmethod
     def get_or_create_preference(cls, user):
         """
@@ -72,28 +85,48 @@ class UserPreferenceService:
 
         return preference
 
+    # 依頻率分組的定時任務（每個頻率只有一個，與使用者人數無關）
+    BUCKET_TASK_NAME = 'stock_alert_{frequency}'
+    BUCKET_TASK = 'apps.library.tasks.check_low_stock_books_for_frequency'
+
+    # 舊版每位使用者一個的定時任務
+    LEGACY_TASK = 'apps.library.tasks.check_low_stock_books_for_user'
+
     @classmethod
     def sync_user_schedule(cls, preference):
         """
         同步使用者的定時任務排程
 
-        根據使用者的偏好設定，建立或更新 Celery Beat 排程
+        排程不再是每位使用者一個，而是每個頻率一個（由該任務查出訂閱的使用者後分批通知），
+        這裡只要確認使用者選擇的頻率已有排程即可
 
         Args:
             preference: UserPreference instance
         """
-        task_name = f'user_{preference.user.id}_stock_alert'
-        frequency = preference.stock_alert_frequency
-
-        # 如果停用通知，刪除排程
-        if frequency == 'disabled':
-            PeriodicTask.objects.filter(name=task_name).delete()
+        if preference.stock_alert_frequency == 'disabled':
             return
 
-        # 取得排程設定
+        cls.ensure_bucket_schedule(preference.stock_alert_frequency)
+
+    @classmethod
+    def ensure_bucket_schedule(cls, frequency):
+        """
+        確認某個頻率的定時任務存在（已存在就不修改，避免每次使用者改設定都讓 Beat 重新載入排程）
+
+        Args:
+            frequency: 通知頻率
+
+        Returns:
+            PeriodicTask | None: 頻率不需要排程時回傳 None
+        """
         schedule_config = cls.FREQUENCY_SCHEDULES.get(frequency)
         if not schedule_config:
-            return
+            return None
+
+        task_name = cls.BUCKET_TASK_NAME.format(frequency=frequency)
+        task = PeriodicTask.objects.filter(name=task_name).first()
+        if task is not None:
+            return task
 
         # 建立排程
         if schedule_config['type'] == 'interval':
@@ -112,29 +145,88 @@ class UserPreferenceService:
             )
             schedule_field = 'crontab'
 
-        # 建立或更新定時任務
-        task_defaults = {
-            schedule_field: schedule,
-            'task': 'apps.library.tasks.check_low_stock_books_for_user',
-            'kwargs': json.dumps({'user_id': preference.user.id}),
-            'enabled': True,
-        }
-
-        # 清除另一種排程類型
-        if schedule_field == 'interval':
-            task_defaults['crontab'] = None
-        else:
-            task_defaults['interval'] = None
-
-        PeriodicTask.objects.update_or_create(
+        task, _ = PeriodicTask.objects.get_or_create(
             name=task_name,
-            defaults=task_defaults,
+            defaults={
+                schedule_field: schedule,
+                'task': cls.BUCKET_TASK,
+                'kwargs': json.dumps({'frequency': frequency}),
+                'enabled': True,
+            },
         )
+        return task
+
+    @classmethod
+    def delivery_offset(cls, frequency, user_id):
+        """
+        使用者在分散發送範圍內的固定延遲
+
+        以使用者 ID 的雜湊決定時段：同一位使用者每次都在相同時間收到通知，
+        所有使用者平均分布在整個範圍內
+
+        Args:
+            frequency: 通知頻率
+            user_id: 使用者 ID
+
+        Returns:
+            int: 延遲秒數（沒有設定 window 的頻率為 0）
+        """
+        slot_seconds = cls.delivery_slot_seconds()
+        slots = cls.delivery_windows().get(frequency, 0) // slot_seconds
+        if slots <= 1:
+            return 0
+        return (zlib.crc32(str(user_id).encode()) % slots) * slot_seconds
+
+    @classmethod
+    def delivery_windows(cls):
+        """各頻率分散發送的時間範圍（秒）"""
+        return getattr(settings, 'STOCK_ALERT_DELIVERY_WINDOWS', cls.DEFAULT_DELIVERY_WINDOWS)
+
+    @classmethod
+    def delivery_slot_seconds(cls):
+        """分散發送的時段長度（秒）"""
+        return getattr(settings, 'STOCK_ALERT_DELIVERY_SLOT_SECONDS', cls.DEFAULT_DELIVERY_SLOT_SECONDS)
+
+    @classmethod
+    def max_delivery_countdown(cls):
+        """所有頻率中最長的延遲（秒）：最後一個時段的開始時間"""
+        slot_seconds = cls.delivery_slot_seconds()
+        return max(
+            ((window // slot_seconds - 1) * slot_seconds for window in cls.delivery_windows().values()),
+            default=0,
+        )
+
+    @classmethod
+    def check_delivery_settings(cls):
+        """
+        檢查分散發送的設定（啟動時由 AccountsConfig.ready 呼叫）
+
+        延後發送的通知在 worker 中等待時尚未確認，等待超過 broker 的 visibility_timeout 會被重新派送、重複通知，
+        所以最長的延遲必須小於 visibility_timeout
+
+        Raises:
+            ImproperlyConfigured: 設定值不正確
+        """
+        slot_seconds = cls.delivery_slot_seconds()
+        if not isinstance(slot_seconds, int) or slot_seconds <= 0:
+            raise ImproperlyConfigured('STOCK_ALERT_DELIVERY_SLOT_SECONDS 必須是正整數')
+
+        unknown = set(cls.delivery_windows()) - set(cls.FREQUENCY_SCHEDULES)
+        if unknown:
+            raise ImproperlyConfigured(f'STOCK_ALERT_DELIVERY_WINDOWS 有不支援的頻率：{", ".join(sorted(unknown))}')
+
+        transport_options = getattr(settings, 'CELERY_BROKER_TRANSPORT_OPTIONS', None) or {}
+        visibility_timeout = transport_options.get('visibility_timeout', cls.DEFAULT_VISIBILITY_TIMEOUT)
+        countdown = cls.max_delivery_countdown()
+        if countdown >= visibility_timeout:
+            raise ImproperlyConfigured(
+                f'庫存警告最長延遲 {countdown} 秒，必須小於 broker 的 visibility_timeout（{visibility_timeout} 秒）'
+            )
 
     @classmethod
     def delete_user_schedule(cls, user):
         """
-        刪除使用者的定時任務排程
+        刪除使用者舊版的個人定時任務排程
 
         Args:
             user: User instance
@@ -1,5 +1,12 @@
 // apps/core/static/core/js/utils.js
 
+/**
+ * GET 回應的驗證器快取（ETag）
+ * key: 完整 URL，value: { etag, data }
+ * 下次請求同一個 URL 時帶上 If-None-Match，伺服器回 304 就直接使用這裡的資料
+ */
+const responseValidatorCache = new Map();
+
 /**
  * 通用的 AJAX 請求函數
  * 封裝 fetch API，自動處理 CSRF Token、錯誤處理等
@@ -13,6 +20,7 @@ async function sendRequest({
     onError = null,
     onComplete = null,
     showLoadingOverlay = false,
+    useETag = true,
   }) {
     if (!url) {
       console.error("URL is required");
@@ -33,6 +41,13 @@ async function sendRequest({
   
     let body = null;
   
+    // 條件式請求：帶上上次拿到的 ETag
+    const canRevalidate = useETag && method === "GET";
+    const cachedResponse = canRevalidate ? responseValidatorCache.get(url) : null;
+    if (cachedResponse) {
+      headers["If-None-Match"] = cachedResponse.etag;
+    }
+
     // CSRF Token（Django 安全機制）
     const csrfToken = document.querySelector(
       'input[name="csrfmiddlewaretoken"]'
@@ -68,6 +83,12 @@ async function sendRequest({
         headers,
         body,
       });
+
+      // 304 Not Modified：資料沒有變動，直接使用上次的回應
+      if (response.status === 304 && cachedResponse) {
+        onSuccess(cachedResponse.data);
+        return;
+      }
   
       if (!response.ok) {
         const contentType = response.headers.get("Content-Type");
@@ -83,6 +104,12 @@ async function sendRequest({
         contentType && contentType.includes("application/json")
           ? await response.json()
           : await response.text();
+
+      // 記住這次回應的 ETag
+      const etag = response.headers.get("ETag");
+      if (canRevalidate && etag) {
+        responseValidatorCache.set(url, { etag, data: responseData });
+      }
   
       onSuccess(responseData);
     } catch (error) {
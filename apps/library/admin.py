@@ -4,12 +4,23 @@ from .models import BookDetail
 from .models import Publisher
 from .models import Author
 from .models import ReadingList
+from .models import BookChange
+
+
+class CounterFieldsAdmin(admin.ModelAdmin):
+    """編輯既有資料時不寫回計數欄位（見 CounterFieldsMixin）"""
+
+    def save_model(self, request, obj, form, change):
+        if change:
+            obj.save(update_fields=obj.editable_field_names())
+        else:
+            super().save_model(request, obj, form, change)
 
 @admin.register(Book)
-class BookAdmin(admin.ModelAdmin):
-    list_display = ('title', 'price', 'stock', 'publisher')  # 列表顯示欄位
+class BookAdmin(CounterFieldsAdmin):
+    list_display = ('title', 'price', 'stock', 'publisher', 'favorite_count')  # 列表顯示欄位
     list_filter = ('authors',)  # 篩選器
-    search_fields = ('title', 'authors')  # 搜尋欄位
+    search_fields = ('title', 'authors__name')  # 搜尋欄位
     ordering = ('-price',)  # 預設排序
 
 @admin.register(BookDetail)
@@ -20,14 +31,14 @@ class BookDetailAdmin(admin.ModelAdmin):
     ordering = ('-publish_date',)
 
 @admin.register(Publisher)
-class PublisherAdmin(admin.ModelAdmin):
-    list_display = ('name', 'city')
+class PublisherAdmin(CounterFieldsAdmin):
+    list_display = ('name', 'city', 'book_count')
     search_fields = ('name', 'city')
     ordering = ('-name',)
 
 @admin.register(Author)
-class AuthorAdmin(admin.ModelAdmin):
-    list_display = ('name', 'bio', 'birth_date', 'nationality')
+class AuthorAdmin(CounterFieldsAdmin):
+    list_display = ('name', 'bio', 'birth_date', 'nationality', 'book_count')
     search_fields = ('name', 'bio', 'birth_date', 'nationality')
     ordering = ('-birth_date',)
 
@@ -39,3 +50,10 @@ class ReadingListAdmin(admin.ModelAdmin):
     list_filter = ['added_date']
     search_fields = ['user__username', 'book__title']
     date_hierarchy = 'added_date'
+
+@admin.register(BookChange)
+class BookChangeAdmin(admin.ModelAdmin):
+    list_display = ['id', 'seq', 'action', 'book_id', 'created_at']
+    list_filter = ['action']
+    search_fields = ['book_id']
+    date_hierarchy = 'created_at'
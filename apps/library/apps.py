@@ -10,5 +10,7 @@ class LibraryConfig(AppConfig):
         當 Django 應用程式啟動時執行
 
         在這裡導入 signals 模組，讓 Signal 自動註冊
+        （task_signals 為 Celery 任務統計，網站與 worker 程序都需要註冊）
         """
         from . import signals  # noqa: F401
+        from . import task_signals  # noqa: F401
@@ -8,13 +8,15 @@ Consumer 就像是 WebSocket 版本的 View：
 import json
 from channels.generic.websocket import AsyncWebsocketConsumer
 
+from apps.library.services import UserNotifier
+
 
 class BookListConsumer(AsyncWebsocketConsumer):
     """
     書籍列表 WebSocket Consumer
 
     功能：
-    1. 客戶端連線時，加入 'book_updates' 群組
+    1. 客戶端連線時，加入 'book_updates' 群組；已登入的使用者另外加入自己的個人群組
     2. 收到群組訊息時，轉發給客戶端
     3. 客戶端斷線時，從群組移除
     """
@@ -22,6 +24,9 @@ class BookListConsumer(AsyncWebsocketConsumer):
     # 群組名稱（所有連線的客戶端都會加入這個群組）
     GROUP_NAME = 'book_updates'
 
+    # 事件附帶的欄位（有提供才轉發）：書籍異動的資料、匯出進度
+    BOOK_FIELDS = ('book_ids', 'books', 'deleted_ids', 'version', 'from_seq', 'change_seq', 'progress')
+
     async def connect(self):
         """
         WebSocket 連線建立時觸發
@@ -34,6 +39,14 @@ class BookListConsumer(AsyncWebsocketConsumer):
             self.channel_name  # 每個連線都有唯一的 channel_name
         )
 
+        # 已登入的使用者加入個人群組（匯出完成、個人庫存警告只送到這裡）
+        # scope['user'] 由 config/asgi.py 的 AuthMiddlewareStack 提供
+        user = self.scope.get('user')
+        self.user_group_name = None
+        if user is not None and user.is_authenticated:
+            self.user_group_name = UserNotifier.group_name(user.id)
+            await self.channel_layer.group_add(self.user_group_name, self.channel_name)
+
         # 接受連線（很重要！不呼叫就會拒絕連線）
         await self.accept()
 
@@ -50,6 +63,8 @@ class BookListConsumer(AsyncWebsocketConsumer):
             self.GROUP_NAME,
             self.channel_name
         )
+        if getattr(self, 'user_group_name', None):
+            await self.channel_layer.group_discard(self.user_group_name, self.channel_name)
 
         print(f"[WebSocket] 連線離開: {self.channel_name}, code={close_code}")
 
@@ -70,11 +85,18 @@ class BookListConsumer(AsyncWebsocketConsumer):
         這個方法名稱對應 group_send 中的 'type': 'book_update'
         當有人呼叫 group_send 時，這個方法會被觸發
         """
-        # 將訊息發送給客戶端（瀏覽器）
-        await self.send(text_data=json.dumps({
+        payload = {
             'type': 'book_update',
             'action': event['action'],    # 'create', 'update', 'delete'
             'message': event['message'],  # 顯示給使用者的訊息
-        }))
+        }
+
+        # 書籍異動事件附帶異動後的資料，客戶端直接更新畫面，不需要重新查詢列表
+        for field in self.BOOK_FIELDS:
+            if field in event:
+                payload[field] = event[field]
+
+        # 將訊息發送給客戶端（瀏覽器）
+        await self.send(text_data=json.dumps(payload, ensure_ascii=False))
 
         print(f"[WebSocket] 已發送給客戶端: {event['action']}")
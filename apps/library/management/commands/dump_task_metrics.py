@@ -0,0 +1,30 @@
+"""
+輸出 Celery 任務統計
+
+使用方式：
+    python manage.py dump_task_metrics
+    python manage.py dump_task_metrics --reset
+
+輸出格式與 GET /metrics/ 相同（Prometheus 文字格式），可在沒有開放網址的環境直接查看
+"""
+from django.core.management.base import BaseCommand
+
+from apps.library.services import TaskMetrics
+
+
+class Command(BaseCommand):
+    help = '輸出 Celery 任務的排隊時間、執行時間、執行結果與處理數量（Prometheus 文字格式）'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--reset',
+            action='store_true',
+            help='輸出後清除所有統計',
+        )
+
+    def handle(self, *args, **options):
+        self.stdout.write(TaskMetrics.render(), ending='')
+
+        if options['reset']:
+            TaskMetrics.reset()
+            self.stderr.write(self.style.SUCCESS('已清除任務統計'))
@@ -0,0 +1,64 @@
+"""
+檢查熱門查詢的執行計畫
+
+使用方式：
+    python manage.py explain_hot_queries
+    python manage.py explain_hot_queries --max-rows 10000 --show-plan
+    python manage.py explain_hot_queries --query low_stock_books
+
+有查詢在大資料表上整張表掃描時，以非 0 狀態碼結束（可放進 CI）
+"""
+from django.core.management.base import BaseCommand, CommandError
+
+from apps.library.services import QueryPlanAudit
+
+
+class Command(BaseCommand):
+    help = '對熱門查詢執行 EXPLAIN，資料表超過筆數門檻卻整張表掃描時失敗'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--max-rows',
+            type=int,
+            default=QueryPlanAudit.DEFAULT_MAX_SCAN_ROWS,
+            help=f'允許整張表掃描的資料表筆數上限（預設 {QueryPlanAudit.DEFAULT_MAX_SCAN_ROWS}）',
+        )
+        parser.add_argument(
+            '--query',
+            action='append',
+            dest='names',
+            help='只檢查指定名稱的查詢（可重複指定）',
+        )
+        parser.add_argument(
+            '--show-plan',
+            action='store_true',
+            help='顯示每個查詢的 SQL 與執行計畫',
+        )
+
+    def handle(self, *args, **options):
+        results = QueryPlanAudit.run(options['max_rows'], options['names'])
+        if not results:
+            raise CommandError('沒有符合的查詢')
+
+        failed = []
+        for result in results:
+            scans = '、'.join(f'{table}（{rows} 筆）' for table, rows in result['full_scans'])
+            if result['failed']:
+                failed.append(result['name'])
+                self.stdout.write(self.style.ERROR(f"[FAIL] {result['name']}：整張表掃描 {scans}"))
+            elif scans and result['bounded']:
+                self.stdout.write(self.style.WARNING(f"[OK]   {result['name']}：依索引順序掃描 {scans}，取到 LIMIT 筆數即停止"))
+            elif scans:
+                self.stdout.write(self.style.WARNING(f"[OK]   {result['name']}：整張表掃描 {scans}（低於門檻）"))
+            else:
+                self.stdout.write(self.style.SUCCESS(f"[OK]   {result['name']}"))
+
+            if options['show_plan']:
+                self.stdout.write(f"       SQL: {result['sql']}")
+                for line in result['plan'].splitlines():
+                    self.stdout.write(f'       {line}')
+
+        if failed:
+            raise CommandError(f'{len(failed)} 個查詢在大資料表上整張表掃描：{", ".join(failed)}')
+
+        self.stdout.write(self.style.SUCCESS(f'{len(results)} 個查詢的執行計畫都沒有問題'))
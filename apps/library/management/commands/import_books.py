@@ -0,0 +1,42 @@
+"""
+批次匯入書籍（CSV / XLSX）
+
+檔案第一列為標題，可使用英文或匯出報表的中文欄位名稱：
+    title/書名、price/價格（必填）、stock/庫存、publisher/出版社、authors/作者（多位以 ; 或 、 分隔）
+
+使用方式：
+    python manage.py import_books books.csv
+    python manage.py import_books books.xlsx --chunk-size 2000
+"""
+from django.core.management.base import BaseCommand, CommandError
+
+from apps.library.services import BookImportError, BookImportService, BroadcastDispatcher
+
+
+class Command(BaseCommand):
+    help = '批次匯入書籍（CSV / XLSX）'
+
+    def add_arguments(self, parser):
+        parser.add_argument('path', help='CSV 或 XLSX 檔案路徑')
+        parser.add_argument(
+            '--chunk-size',
+            type=int,
+            default=BookImportService.CHUNK_SIZE,
+            help=f'每批寫入的筆數（預設 {BookImportService.CHUNK_SIZE}）',
+        )
+
+    def handle(self, *args, **options):
+        try:
+            stats = BookImportService.run(options['path'], chunk_size=options['chunk_size'])
+        except (BookImportError, OSError) as e:
+            raise CommandError(f'匯入失敗：{e}')
+
+        for error in stats['errors']:
+            self.stdout.write(self.style.WARNING(f"第 {error['row']} 列：{error['message']}"))
+
+        # 等背景執行緒把匯入完成的廣播送出再結束
+        BroadcastDispatcher.flush()
+
+        self.stdout.write(self.style.SUCCESS(
+            f"匯入完成：讀取 {stats['processed']} 列，新增 {stats['created']} 本，失敗 {stats['failed']} 列"
+        ))
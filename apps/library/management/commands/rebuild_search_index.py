@@ -0,0 +1,31 @@
+"""
+重建書籍全文搜尋索引
+
+使用方式：
+    python manage.py rebuild_search_index
+    python manage.py rebuild_search_index --book-id 1 --book-id 2
+"""
+from django.core.management.base import BaseCommand
+
+from apps.library.services import BookSearchService
+
+
+class Command(BaseCommand):
+    help = '重建書籍全文搜尋索引（第一次部署或索引資料不一致時執行）'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--book-id',
+            type=int,
+            action='append',
+            dest='book_ids',
+            help='只重建指定的書籍（可重複指定）',
+        )
+
+    def handle(self, *args, **options):
+        if options['book_ids']:
+            total = BookSearchService.index_books(options['book_ids'])
+        else:
+            total = BookSearchService.rebuild()
+
+        self.stdout.write(self.style.SUCCESS(f'已重建 {total} 本書籍的搜尋索引'))
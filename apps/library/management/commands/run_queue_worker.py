@@ -0,0 +1,31 @@
+"""
+依佇列設定啟動 Celery worker
+
+使用方式：
+    python manage.py run_queue_worker exports
+    python manage.py run_queue_worker alerts -- --loglevel info
+
+concurrency、prefetch multiplier 與處理的佇列來自 config/task_profiles.py 的 QUEUE_WORKERS，
+`--` 之後的參數直接傳給 celery worker
+"""
+from django.core.management.base import BaseCommand
+
+from config.celery import app
+from config.task_profiles import QUEUE_WORKERS, build_worker_argv
+
+
+class Command(BaseCommand):
+    help = '依 QUEUE_WORKERS 的設定啟動處理某個佇列的 Celery worker'
+
+    def add_arguments(self, parser):
+        parser.add_argument('queue', choices=sorted(QUEUE_WORKERS), help='佇列名稱')
+        parser.add_argument('--print', action='store_true', help='只輸出啟動指令，不啟動 worker')
+        parser.add_argument('worker_args', nargs='*', help='直接傳給 celery worker 的參數（放在 -- 之後）')
+
+    def handle(self, *args, **options):
+        argv = build_worker_argv(options['queue'], options['worker_args'])
+        if options['print']:
+            self.stdout.write(' '.join(['celery', '-A', 'config', *argv]))
+            return
+
+        app.worker_main(argv=argv)
@@ -0,0 +1,27 @@
+# Generated by Django 5.1.1 on 2026-10-17 03:57
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('library', '0002_readinglist'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='BookChange',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('book_id', models.BigIntegerField(verbose_name='書籍 ID')),
+                ('action', models.CharField(choices=[('create', '新增'), ('update', '更新'), ('delete', '刪除')], max_length=10, verbose_name='動作')),
+                ('created_at', models.DateTimeField(auto_now_add=True, verbose_name='異動時間')),
+            ],
+            options={
+                'verbose_name': '書籍異動紀錄',
+                'verbose_name_plural': '書籍異動紀錄',
+                'ordering': ['id'],
+            },
+        ),
+    ]
@@ -0,0 +1,95 @@
+# Generated by Django 5.1.1 on 2026-10-17 04:05
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+# SQLite：FTS5 外部內容表，以觸發器與 library_booksearchdocument 同步
+SQLITE_CREATE = [
+    """
+    CREATE VIRTUAL TABLE library_booksearchdocument_fts USING fts5(
+        document,
+        content='library_booksearchdocument',
+        content_rowid='book_id',
+        tokenize='unicode61 remove_diacritics 2'
+    )
+    """,
+    """
+    CREATE TRIGGER library_booksearchdocument_ai AFTER INSERT ON library_booksearchdocument BEGIN
+        INSERT INTO library_booksearchdocument_fts(rowid, document) VALUES (new.book_id, new.document);
+    END
+    """,
+    """
+    CREATE TRIGGER library_booksearchdocument_ad AFTER DELETE ON library_booksearchdocument BEGIN
+        INSERT INTO library_booksearchdocument_fts(library_booksearchdocument_fts, rowid, document)
+        VALUES ('delete', old.book_id, old.document);
+    END
+    """,
+    """
+    CREATE TRIGGER library_booksearchdocument_au AFTER UPDATE ON library_booksearchdocument BEGIN
+        INSERT INTO library_booksearchdocument_fts(library_booksearchdocument_fts, rowid, document)
+        VALUES ('delete', old.book_id, old.document);
+        INSERT INTO library_booksearchdocument_fts(rowid, document) VALUES (new.book_id, new.document);
+    END
+    """,
+]
+
+SQLITE_DROP = [
+    'DROP TRIGGER IF EXISTS library_booksearchdocument_au',
+    'DROP TRIGGER IF EXISTS library_booksearchdocument_ad',
+    'DROP TRIGGER IF EXISTS library_booksearchdocument_ai',
+    'DROP TABLE IF EXISTS library_booksearchdocument_fts',
+]
+
+# PostgreSQL：tsvector 運算式的 GIN 索引（'simple' 設定不做詞幹處理，適合已拆好的 n-gram）
+POSTGRES_CREATE = [
+    """
+    CREATE INDEX library_booksearchdocument_tsv_idx ON library_booksearchdocument
+    USING gin (to_tsvector('simple', document))
+    """,
+]
+
+POSTGRES_DROP = [
+    'DROP INDEX IF EXISTS library_booksearchdocument_tsv_idx',
+]
+
+
+def create_search_index(apps, schema_editor):
+    statements = {
+        'sqlite': SQLITE_CREATE,
+        'postgresql': POSTGRES_CREATE,
+    }.get(schema_editor.connection.vendor, [])
+    for sql in statements:
+        schema_editor.execute(sql)
+
+
+def drop_search_index(apps, schema_editor):
+    statements = {
+        'sqlite': SQLITE_DROP,
+        'postgresql': POSTGRES_DROP,
+    }.get(schema_editor.connection.vendor, [])
+    for sql in statements:
+        schema_editor.execute(sql)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('library', '0003_bookchange'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='BookSearchDocument',
+            fields=[
+                ('book', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, primary_key=True, related_name='search_document', serialize=False, to='library.book', verbose_name='書籍')),
+                ('document', models.TextField(verbose_name='搜尋內容')),
+                ('updated_at', models.DateTimeField(auto_now=True, verbose_name='更新時間')),
+            ],
+            options={
+                'verbose_name': '書籍搜尋文件',
+                'verbose_name_plural': '書籍搜尋文件',
+            },
+        ),
+        migrations.RunPython(create_search_index, drop_search_index),
+    ]
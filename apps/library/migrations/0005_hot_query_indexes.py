@@ -0,0 +1,39 @@
+# Generated by Django 5.1.1 on 2026-10-17 04:08
+
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('library', '0004_booksearchdocument'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='book',
+            index=models.Index(fields=['title', 'id'], name='library_book_title_id_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='book',
+            index=models.Index(fields=['price', 'id'], name='library_book_price_id_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='book',
+            index=models.Index(fields=['stock', 'id'], name='library_book_stock_id_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='book',
+            index=models.Index(condition=models.Q(('stock__lt', 5)), fields=['stock'], name='library_book_low_stock_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='publisher',
+            index=models.Index(fields=['name'], name='library_publisher_name_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='readinglist',
+            index=models.Index(fields=['user', '-added_date'], name='library_rl_user_added_idx'),
+        ),
+    ]
@@ -0,0 +1,52 @@
+# Generated by Django 5.1.1 on 2026-10-17 04:10
+
+from django.db import migrations, models
+from django.db.models import Count, OuterRef, Subquery
+from django.db.models.functions import Coalesce
+
+
+def backfill_counters(apps, schema_editor):
+    """以一個 UPDATE ... 子查詢計算現有資料的計數"""
+    Author = apps.get_model('library', 'Author')
+    Book = apps.get_model('library', 'Book')
+    Publisher = apps.get_model('library', 'Publisher')
+    ReadingList = apps.get_model('library', 'ReadingList')
+
+    def count_of(queryset, field):
+        return Coalesce(Subquery(
+            queryset.filter(**{field: OuterRef('pk')})
+            .order_by()
+            .values(field)
+            .annotate(total=Count('pk'))
+            .values('total')
+        ), 0)
+
+    Publisher.objects.update(book_count=count_of(Book.objects.all(), 'publisher'))
+    Book.objects.update(favorite_count=count_of(ReadingList.objects.all(), 'book'))
+    Author.objects.update(book_count=count_of(Book.authors.through.objects.all(), 'author'))
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('library', '0005_hot_query_indexes'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='author',
+            name='book_count',
+            field=models.IntegerField(default=0, editable=False, verbose_name='書籍數量'),
+        ),
+        migrations.AddField(
+            model_name='book',
+            name='favorite_count',
+            field=models.IntegerField(default=0, editable=False, verbose_name='收藏數'),
+        ),
+        migrations.AddField(
+            model_name='publisher',
+            name='book_count',
+            field=models.IntegerField(default=0, editable=False, verbose_name='書籍數量'),
+        ),
+        migrations.RunPython(backfill_counters, migrations.RunPython.noop),
+    ]
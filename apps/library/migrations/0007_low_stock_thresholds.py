@@ -0,0 +1,23 @@
+# Generated by Django 5.1.1 on 2026-10-17 04:24
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('library', '0006_counter_fields'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='book',
+            name='low_stock_threshold',
+            field=models.PositiveIntegerField(blank=True, help_text='未設定時使用出版社的門檻，出版社也未設定時為 5', null=True, verbose_name='庫存警告門檻'),
+        ),
+        migrations.AddField(
+            model_name='publisher',
+            name='low_stock_threshold',
+            field=models.PositiveIntegerField(blank=True, help_text='未設定時為 5', null=True, verbose_name='庫存警告門檻'),
+        ),
+    ]
@@ -0,0 +1,26 @@
+# Generated by Django 5.1.1 on 2026-10-17 09:10
+
+from django.db import migrations, models
+from django.db.models import F
+
+
+def backfill_seq(apps, schema_editor):
+    """既有的紀錄都已 commit，直接沿用 id 當序號（客戶端記住的序號不會失效）"""
+    BookChange = apps.get_model('library', 'BookChange')
+    BookChange.objects.update(seq=F('id'))
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('library', '0007_low_stock_thresholds'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='bookchange',
+            name='seq',
+            field=models.BigIntegerField(blank=True, null=True, unique=True, verbose_name='序號'),
+        ),
+        migrations.RunPython(backfill_seq, migrations.RunPython.noop),
+    ]
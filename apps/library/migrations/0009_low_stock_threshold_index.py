@@ -0,0 +1,21 @@
+# Generated by Django 5.1.1 on 2026-10-17 04:45
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('library', '0008_bookchange_seq'),
+    ]
+
+    operations = [
+        migrations.RemoveIndex(
+            model_name='book',
+            name='library_book_low_stock_idx',
+        ),
+        migrations.AddIndex(
+            model_name='book',
+            index=models.Index(fields=['low_stock_threshold'], name='library_book_threshold_idx'),
+        ),
+    ]
@@ -0,0 +1,59 @@
+# Generated by Django 5.1.1 on 2026-10-17 13:20
+
+from collections import defaultdict
+
+from django.db import migrations
+
+# 每批建立的文件數量
+CHUNK_SIZE = 2000
+
+
+def backfill_search_documents(apps, schema_editor):
+    """替還沒有搜尋文件的書籍建立文件（0004 建立資料表時不含既有書籍），內容與 BookSearchService.build_document 相同"""
+    # 斷詞規則只依文字計算，與資料表結構無關
+    from apps.library.services.book_search import BookSearchService
+
+    Book = apps.get_model('library', 'Book')
+    BookSearchDocument = apps.get_model('library', 'BookSearchDocument')
+    Through = Book.authors.through
+
+    last_id = 0
+    while True:
+        rows = list(
+            Book.objects.filter(id__gt=last_id, search_document__isnull=True)
+            .order_by('id')
+            .values_list('id', 'title', 'publisher__name', 'detail__isbn', 'detail__description')[:CHUNK_SIZE]
+        )
+        if not rows:
+            break
+        last_id = rows[-1][0]
+
+        authors = defaultdict(list)
+        for book_id, name in (
+            Through.objects.filter(book_id__in=[row[0] for row in rows])
+            .values_list('book_id', 'author__name')
+        ):
+            authors[book_id].append(name)
+
+        BookSearchDocument.objects.bulk_create([
+            BookSearchDocument(
+                book_id=book_id,
+                document=BookSearchService.make_document([
+                    title, *authors[book_id], publisher_name,
+                    # ISBN 同時保留原始格式與去掉連字號的版本
+                    isbn, isbn.replace('-', '') if isbn else None, description,
+                ]),
+            )
+            for book_id, title, publisher_name, isbn, description in rows
+        ])
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('library', '0009_low_stock_threshold_index'),
+    ]
+
+    operations = [
+        migrations.RunPython(backfill_search_documents, migrations.RunPython.noop),
+    ]
@@ -3,5 +3,7 @@ from .book_detail import BookDetail
 from .publisher import Publisher
 from .author import Author
 from .reading_list import ReadingList  # 新增
+from .book_change import BookChange
+from .book_search_document import BookSearchDocument
 
-__all__ = ['Book', 'BookDetail', 'Publisher', 'Author', 'ReadingList']  # 新增 ReadingList
+__all__ = ['Book', 'BookDetail', 'Publisher', 'Author', 'ReadingList', 'BookChange', 'BookSearchDocument']  # 新增 ReadingList
@@ -1,12 +1,19 @@
 from django.db import models
 
+from .mixins import CounterFieldsMixin
 
-class Author(models.Model):
+
+class Author(CounterFieldsMixin, models.Model):
     """作者"""
+
+    COUNTER_FIELDS = ('book_count',)
+
     name = models.CharField(max_length=100, verbose_name='姓名')
     bio = models.TextField(blank=True, verbose_name='簡介')
     birth_date = models.DateField(null=True, blank=True, verbose_name='出生日期')
     nationality = models.CharField(max_length=50, blank=True, verbose_name='國籍')
+    # 書籍數量（由 Signal 維護）
+    book_count = models.IntegerField(default=0, editable=False, verbose_name='書籍數量')
 
     class Meta:
         verbose_name = '作者'
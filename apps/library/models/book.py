@@ -1,17 +1,41 @@
 from django.db import models
 from .publisher import Publisher
 from .author import Author
+from .mixins import CounterFieldsMixin
+
+class Book(CounterFieldsMixin, models.Model):
+    # 庫存低於此數量視為「庫存不足」
+    LOW_STOCK_THRESHOLD = 5
+
+    COUNTER_FIELDS = ('favorite_count',)
 
-class Book(models.Model):
     title = models.CharField(max_length=100, verbose_name='書名')
     authors = models.ManyToManyField(Author, related_name='books', verbose_name='作者', blank=True, null=True)
     price = models.IntegerField(verbose_name='價格')
     stock = models.IntegerField(default=0, verbose_name='庫存')
     publisher = models.ForeignKey(Publisher, on_delete=models.CASCADE, related_name='books', verbose_name='出版社', null=True, blank=True)
+    # 庫存低於此數量時發出警告（未設定時使用出版社的門檻）
+    low_stock_threshold = models.PositiveIntegerField(
+        null=True,
+        blank=True,
+        verbose_name='庫存警告門檻',
+        help_text='未設定時使用出版社的門檻，出版社也未設定時為 5',
+    )
+    # 被加入閱讀清單的次數（由 Signal 維護）
+    favorite_count = models.IntegerField(default=0, editable=False, verbose_name='收藏數')
 
     class Meta:
         verbose_name = '書本資訊'
         verbose_name_plural = '書本資訊'
+        indexes = [
+            # 書籍列表 API 的 Keyset 分頁：(排序欄位, id)
+            models.Index(fields=['title', 'id'], name='library_book_title_id_idx'),
+            models.Index(fields=['price', 'id'], name='library_book_price_id_idx'),
+            # 同時用於庫存不足清單重建：stock < 最大門檻 的範圍掃描（LowStockService.low_stock_queryset）
+            models.Index(fields=['stock', 'id'], name='library_book_stock_id_idx'),
+            # 書籍自訂門檻的最大值（LowStockService.max_threshold）
+            models.Index(fields=['low_stock_threshold'], name='library_book_threshold_idx'),
+        ]
 
     def __str__(self):
         return self.title
\ No newline at end of file
@@ -0,0 +1,49 @@
+from django.db import models
+
+
+class BookChange(models.Model):
+    """
+    書籍異動紀錄（只新增、不修改）
+
+    seq 是遞增的序號，客戶端記住最後看到的序號，
+    之後只要拿「這個序號之後」的異動即可同步
+
+    不直接使用 id：id 在寫入時就決定，但紀錄要等交易 commit 才看得到，
+    兩個交易可能不依 id 的順序 commit，讀取端已經讀到 N+1 時 N 才出現就會永遠漏掉。
+    seq 在 commit 之後才依序編號（BookChangeFeed.assign_seq），看得到 N+1 時 N 一定已經看得到
+    """
+
+    class Action(models.TextChoices):
+        CREATE = 'create', '新增'
+        UPDATE = 'update', '更新'
+        DELETE = 'delete', '刪除'
+
+    # 不使用 ForeignKey：書籍刪除後仍要保留刪除紀錄
+    book_id = models.BigIntegerField(verbose_name='書籍 ID')
+
+    action = models.CharField(
+        max_length=10,
+        choices=Action.choices,
+        verbose_name='動作'
+    )
+
+    # commit 後才編號，尚未編號的紀錄為 NULL
+    seq = models.BigIntegerField(
+        null=True,
+        blank=True,
+        unique=True,
+        verbose_name='序號'
+    )
+
+    created_at = models.DateTimeField(
+        auto_now_add=True,
+        verbose_name='異動時間'
+    )
+
+    class Meta:
+        verbose_name = '書籍異動紀錄'
+        verbose_name_plural = '書籍異動紀錄'
+        ordering = ['id']
+
+    def __str__(self):
+        return f"#{self.seq or '-'} {self.get_action_display()} 書籍 {self.book_id}"
@@ -0,0 +1,33 @@
+from django.db import models
+
+from .book import Book
+
+
+class BookSearchDocument(models.Model):
+    """
+    書籍全文搜尋文件
+
+    把書名、作者、出版社、ISBN、簡介展開成以空白分隔的詞（中文拆成單字與雙字詞），
+    再由資料庫的全文索引（SQLite FTS5 / PostgreSQL GIN）建立索引
+    """
+    book = models.OneToOneField(
+        Book,
+        on_delete=models.CASCADE,
+        primary_key=True,
+        related_name='search_document',
+        verbose_name='書籍'
+    )
+
+    document = models.TextField(verbose_name='搜尋內容')
+
+    updated_at = models.DateTimeField(
+        auto_now=True,
+        verbose_name='更新時間'
+    )
+
+    class Meta:
+        verbose_name = '書籍搜尋文件'
+        verbose_name_plural = '書籍搜尋文件'
+
+    def __str__(self):
+        return f"書籍 {self.book_id} 的搜尋文件"
@@ -0,0 +1,18 @@
+class CounterFieldsMixin:
+    """
+    計數欄位由 Signal 以 F() 在資料庫端加減，記憶體中的值可能已經過期
+
+    不覆寫 save()：新增資料、資料列已被刪除時的 INSERT、明確指定計數欄位的值都維持 Django 預設行為。
+    編輯既有資料（表單、後台）時改用 save(update_fields=obj.editable_field_names())，
+    不寫回計數欄位，避免用讀取時的舊值覆蓋其他請求的更新
+    """
+
+    # 子類別列出自己的計數欄位
+    COUNTER_FIELDS = ()
+
+    def editable_field_names(self):
+        """計數欄位以外、編輯時要寫回的欄位名稱"""
+        return [
+            field.name for field in self._meta.concrete_fields
+            if not field.primary_key and field.name not in self.COUNTER_FIELDS
+        ]
@@ -1,13 +1,31 @@
 from django.db import models
 
-class Publisher(models.Model):
+from .mixins import CounterFieldsMixin
+
+class Publisher(CounterFieldsMixin, models.Model):
     """出版社"""
+
+    COUNTER_FIELDS = ('book_count',)
+
     name = models.CharField(max_length=100, verbose_name='出版社名稱')
     city = models.CharField(max_length=50, verbose_name='出版社所在城市')
+    # 旗下書籍預設的庫存警告門檻（書籍可個別設定）
+    low_stock_threshold = models.PositiveIntegerField(
+        null=True,
+        blank=True,
+        verbose_name='庫存警告門檻',
+        help_text='未設定時為 5',
+    )
+    # 書籍數量（由 Signal 維護，避免列表頁每個出版社各查一次 COUNT）
+    book_count = models.IntegerField(default=0, editable=False, verbose_name='書籍數量')
 
     class Meta:
         verbose_name = '出版社'
         verbose_name_plural = '出版社'
+        indexes = [
+            # 新增/編輯出版社時檢查名稱是否重複
+            models.Index(fields=['name'], name='library_publisher_name_idx'),
+        ]
 
     def __str__(self):
         return self.name
@@ -33,6 +33,10 @@ class ReadingList(models.Model):
         unique_together = ['user', 'book']
         # 最新加入的排在前面
         ordering = ['-added_date']
+        indexes = [
+            # 我的閱讀清單：依使用者篩選並依加入日期排序
+            models.Index(fields=['user', '-added_date'], name='library_rl_user_added_idx'),
+        ]
 
     def __str__(self):
         return f"{self.user.username} - {self.book.title}"
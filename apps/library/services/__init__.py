@@ -0,0 +1,42 @@
+from .book_export import BookExportService
+from .book_facets import BookFacetService
+from .book_import import BookImportError, BookImportService
+from .book_list import BookListService
+from .broadcast import BroadcastDispatcher
+from .book_fragments import BookFragmentCache
+from .book_list_body import BookListBody
+from .book_search import BookSearchService
+from .catalog_cache import CatalogCache
+from .change_feed import BookChangeFeed, ChangeFeedResetRequired
+from .change_notifier import BookChangeNotifier
+from .counters import CounterService
+from .favorites import FavoritesCache
+from .low_stock import LowStockService
+from .query_audit import QueryPlanAudit
+from .stock import StockAdjustmentError, StockAdjustmentService
+from .task_metrics import TaskMetrics
+from .user_notifier import UserNotifier
+
+__all__ = [
+    'BookExportService',
+    'BookFacetService',
+    'BookImportError',
+    'BookImportService',
+    'BookListService',
+    'BroadcastDispatcher',
+    'BookFragmentCache',
+    'BookListBody',
+    'BookSearchService',
+    'CatalogCache',
+    'BookChangeFeed',
+    'ChangeFeedResetRequired',
+    'BookChangeNotifier',
+    'CounterService',
+    'FavoritesCache',
+    'LowStockService',
+    'QueryPlanAudit',
+    'StockAdjustmentError',
+    'StockAdjustmentService',
+    'TaskMetrics',
+    'UserNotifier',
+]
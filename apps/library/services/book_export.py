@@ -0,0 +1,349 @@
+"""
+書籍報表匯出服務
+
+原本的匯出會把整個 QuerySet 的 Book 與 Publisher 物件都載入記憶體，書籍越多 worker 佔用的記憶體越大。
+這裡改成：
+1. values_list + iterator(chunk_size)：不建立 Model 物件、不快取結果，PostgreSQL 使用 server-side cursor 分批取回
+2. 每批以 writerows 寫入有緩衝的檔案，記憶體用量只跟 CHUNK_SIZE 有關，與書籍總數無關
+3. 每寫完一批呼叫進度回呼（已完成筆數 / 總筆數）
+4. 書籍數量不多時可直接以 StreamingHttpResponse 邊產生邊下載，不必經過 Celery
+
+支援的格式（共用同一個分批資料來源）：
+- csv：Excel 可直接開啟的 UTF-8 CSV
+- csv.gz：gzip 壓縮的 CSV
+- jsonl.gz：gzip 壓縮的 JSON Lines（一列一本書，給資料處理程式使用）
+- xlsx：XlsxWriter 的 constant_memory 模式，寫完一列就輸出，不會把整個工作表留在記憶體
+
+背景匯出以「目錄版本號 + 格式」去除重複：
+- 同一版本已經匯出過（檔案還在）就直接回傳，不再掃描資料表
+- 同一版本正在匯出中，後來的請求掛到同一個任務上（以 Redis 鎖保護），不會重複排入任務
+"""
+import csv
+import codecs
+import gzip
+import json
+import os
+import uuid
+from contextlib import contextmanager
+from datetime import datetime
+
+from django.conf import settings
+from django.core.cache import cache
+from redis.exceptions import LockError
+
+from apps.library.models import Book
+from .catalog_cache import CatalogCache
+
+
+class _Echo:
+    """csv.writer 需要可寫入的物件，這裡直接把寫入的內容回傳（串流下載用）"""
+
+    def write(self, value):
+        return value
+
+
+class BookExportService:
+    """書籍報表匯出"""
+
+    # 報表欄位
+    HEADER = ('ID', '書名', '價格', '庫存', '出版社')
+    FIELDS = ('id', 'title', 'price', 'stock', 'publisher__name')
+
+    # JSON Lines 的欄位名稱
+    JSON_KEYS = ('id', 'title', 'price', 'stock', 'publisher')
+
+    # 格式 → 寫入器（也是檔案的副檔名）
+    FORMATS = {
+        'csv': '_csv_writer',
+        'csv.gz': '_csv_gz_writer',
+        'jsonl.gz': '_jsonl_gz_writer',
+        'xlsx': '_xlsx_writer',
+    }
+    DEFAULT_FORMAT = 'csv'
+
+    # gzip 壓縮等級（6 是速度與壓縮率的平衡點）
+    GZIP_LEVEL = 6
+
+    # 每次從資料庫取回的筆數
+    CHUNK_SIZE = 2000
+
+    # 寫入檔案的緩衝區大小（bytes）
+    WRITE_BUFFER_SIZE = 1024 * 1024
+
+    # 超過這個數量就不提供同步下載，請改用背景匯出
+    SYNC_MAX_ROWS = 5000
+
+    # 背景匯出時 WebSocket 進度通知的最短間隔（秒）
+    PROGRESS_INTERVAL = 1.0
+
+    EXPORT_DIR = 'exports'
+
+    # 去除重複用的快取 key（依格式與目錄版本號區分）
+    EXPORT_KEY_PREFIX = 'library:export'
+
+    # 匯出結果保留時間（秒）；目錄有變動時版本號不同，自然不會再被使用
+    RESULT_TIMEOUT = 60 * 60 * 24
+
+    # 匯出中的任務紀錄存活時間（秒），任務當掉時時間到就會自動釋放
+    INFLIGHT_TIMEOUT = 60 * 30
+
+    # 登記匯出任務時的鎖（秒）
+    LOCK_TIMEOUT = 5
+
+    # ==========================================
+    # 去除重複
+    # ==========================================
+
+    @classmethod
+    def _export_key(cls, export_format, version):
+        return f'{cls.EXPORT_KEY_PREFIX}:{export_format}:v{version}'
+
+    @classmethod
+    def get_result(cls, export_format, version):
+        """
+        取得這個版本已完成的匯出結果（檔案已被刪除則視為沒有）
+
+        Returns:
+            dict | None: {'filename', 'total_books'}
+        """
+        result = cache.get(f'{cls._export_key(export_format, version)}:result')
+        if result is None:
+            return None
+
+        filepath = os.path.join(settings.BASE_DIR, cls.EXPORT_DIR, result['filename'])
+        return result if os.path.exists(filepath) else None
+
+    @classmethod
+    def request_export(cls, user_id, export_format=DEFAULT_FORMAT):
+        """
+        登記一次匯出請求
+
+        Returns:
+            dict: {'status', 'version', ...}
+                - ready：已有相同版本的檔案，附 filename、total_books
+                - attached：相同版本正在匯出中，附 task_id
+                - queued：需要排入新任務，附 task_id（由呼叫端以這個 ID 送出任務）
+                - busy：等不到登記用的鎖（同時有大量請求），請稍後再試
+        """
+        version = CatalogCache.get_version()
+
+        # 1. 已經匯出過：直接回傳，不需要拿鎖
+        result = cls.get_result(export_format, version)
+        if result is not None:
+            return {'status': 'ready', 'version': version, **result}
+
+        key = cls._export_key(export_format, version)
+        try:
+            return cls._register_export(key, user_id, export_format, version)
+        except LockError:
+            print(f"[Export] 等不到匯出登記的鎖：{key}")
+            return {'status': 'busy', 'version': version}
+
+    @classmethod
+    def _register_export(cls, key, user_id, export_format, version):
+        """在鎖內確認結果、加入等待名單或登記新任務（鎖等待逾時會拋出 LockError）"""
+        with cache.lock(f'{key}:lock', timeout=cls.LOCK_TIMEOUT, blocking_timeout=cls.LOCK_TIMEOUT):
+            # 2. 拿到鎖後再確認一次，可能剛好匯出完成
+            result = cls.get_result(export_format, version)
+            if result is not None:
+                return {'status': 'ready', 'version': version, **result}
+
+            # 3. 正在匯出中：把使用者加入等待名單
+            task_id = cache.get(f'{key}:task')
+            if task_id is not None:
+                waiters = cache.get(f'{key}:waiters') or []
+                if user_id not in waiters:
+                    waiters.append(user_id)
+                cache.set(f'{key}:waiters', waiters, cls.INFLIGHT_TIMEOUT)
+                print(f"[Export] 使用者 {user_id} 加入進行中的匯出 {task_id}")
+                return {'status': 'attached', 'version': version, 'task_id': task_id}
+
+            # 4. 登記新的匯出任務
+            task_id = str(uuid.uuid4())
+            cache.set(f'{key}:task', task_id, cls.INFLIGHT_TIMEOUT)
+            cache.set(f'{key}:waiters', [user_id], cls.INFLIGHT_TIMEOUT)
+            return {'status': 'queued', 'version': version, 'task_id': task_id}
+
+    @classmethod
+    def get_waiters(cls, export_format, version):
+        """
+        取得正在等待這個匯出的使用者 ID
+
+        Returns:
+            list[int]
+        """
+        return cache.get(f'{cls._export_key(export_format, version)}:waiters') or []
+
+    @classmethod
+    def finish_export(cls, export_format, version, filename=None, total_books=0):
+        """
+        匯出任務結束時呼叫：記錄結果並取出等待名單（filename 為 None 表示匯出失敗，不記錄結果）
+
+        Returns:
+            list[int]: 等待這個匯出的使用者 ID
+        """
+        key = cls._export_key(export_format, version)
+        with cache.lock(f'{key}:lock', timeout=cls.LOCK_TIMEOUT, blocking_timeout=cls.LOCK_TIMEOUT):
+            if filename is not None:
+                cache.set(
+                    f'{key}:result',
+                    {'filename': filename, 'total_books': total_books},
+                    cls.RESULT_TIMEOUT,
+                )
+            waiters = cache.get(f'{key}:waiters') or []
+            cache.delete_many([f'{key}:task', f'{key}:waiters'])
+        return waiters
+
+    # ==========================================
+    # 匯出
+    # ==========================================
+
+    @classmethod
+    def count(cls):
+        return Book.objects.count()
+
+    @classmethod
+    def iter_chunks(cls):
+        """
+        分批產生報表資料列（所有格式共用）
+
+        Yields:
+            list[tuple]: 每批最多 CHUNK_SIZE 列，欄位順序同 FIELDS（沒有出版社為 None）
+        """
+        rows = (
+            Book.objects.order_by('id')
+            .values_list(*cls.FIELDS)
+            .iterator(chunk_size=cls.CHUNK_SIZE)
+        )
+
+        chunk = []
+        for row in rows:
+            chunk.append(row)
+            if len(chunk) >= cls.CHUNK_SIZE:
+                yield chunk
+                chunk = []
+        if chunk:
+            yield chunk
+
+    @staticmethod
+    def to_table_rows(chunk):
+        """表格格式（CSV、XLSX）沒有出版社時顯示「無」"""
+        return [(*row[:-1], row[-1] or '無') for row in chunk]
+
+    @classmethod
+    def make_filepath(cls, extension=DEFAULT_FORMAT, task_id=None):
+        """
+        產生匯出檔案路徑（包含時間戳記與任務 ID），目錄不存在時自動建立
+
+        同一秒內可能有不同目錄版本的匯出任務，檔名加上任務 ID 避免互相覆蓋
+        （沒有任務 ID 時以隨機值代替）
+
+        Returns:
+            tuple: (檔案名稱, 完整路徑)
+        """
+        export_dir = os.path.join(settings.BASE_DIR, cls.EXPORT_DIR)
+        os.makedirs(export_dir, exist_ok=True)
+
+        timestamp = datetime.now().strftime('%Y%m%d_%H%M%S')
+        filename = f'books_export_{timestamp}_{task_id or uuid.uuid4()}.{extension}'
+        return filename, os.path.join(export_dir, filename)
+
+    @classmethod
+    def write(cls, filepath, export_format=DEFAULT_FORMAT, progress=None):
+        """
+        匯出檔案
+
+        Args:
+            filepath: 檔案路徑
+            export_format: FORMATS 中的格式
+            progress: 每寫完一批呼叫 progress(已完成筆數, 總筆數)
+
+        Returns:
+            int: 匯出的筆數
+        """
+        if export_format not in cls.FORMATS:
+            raise ValueError(f'不支援的匯出格式：{export_format}')
+
+        total = cls.count()
+        done = 0
+
+        with getattr(cls, cls.FORMATS[export_format])(filepath) as write_rows:
+            for chunk in cls.iter_chunks():
+                write_rows(chunk)
+                done += len(chunk)
+                if progress:
+                    progress(done, max(total, done))
+
+        return done
+
+    # ==========================================
+    # 各格式的寫入器：開啟檔案、寫入標題，提供「寫入一批資料列」的函數
+    # ==========================================
+
+    @classmethod
+    @contextmanager
+    def _csv_writer(cls, filepath):
+        with open(filepath, 'w', newline='', encoding='utf-8-sig',
+                  buffering=cls.WRITE_BUFFER_SIZE) as csvfile:
+            yield cls._start_csv(csvfile)
+
+    @classmethod
+    @contextmanager
+    def _csv_gz_writer(cls, filepath):
+        with gzip.open(filepath, 'wt', newline='', encoding='utf-8-sig',
+                       compresslevel=cls.GZIP_LEVEL) as csvfile:
+            yield cls._start_csv(csvfile)
+
+    @classmethod
+    def _start_csv(cls, csvfile):
+        """寫入標題列，回傳寫入資料列的函數"""
+        writer = csv.writer(csvfile)
+        writer.writerow(cls.HEADER)
+        return lambda chunk: writer.writerows(cls.to_table_rows(chunk))
+
+    @classmethod
+    @contextmanager
+    def _jsonl_gz_writer(cls, filepath):
+        with gzip.open(filepath, 'wt', encoding='utf-8',
+                       compresslevel=cls.GZIP_LEVEL) as jsonfile:
+            yield lambda chunk: jsonfile.write(''.join(
+                json.dumps(dict(zip(cls.JSON_KEYS, row)), ensure_ascii=False) + '\n'
+                for row in chunk
+            ))
+
+    @classmethod
+    @contextmanager
+    def _xlsx_writer(cls, filepath):
+        import xlsxwriter
+
+        # constant_memory：每寫完一列就輸出到暫存檔，記憶體只保留目前這一列
+        workbook = xlsxwriter.Workbook(filepath, {'constant_memory': True})
+        try:
+            worksheet = workbook.add_worksheet('書籍')
+            worksheet.write_row(0, 0, cls.HEADER)
+            next_row = 1
+
+            def write_rows(chunk):
+                nonlocal next_row
+                for row in cls.to_table_rows(chunk):
+                    worksheet.write_row(next_row, 0, row)
+                    next_row += 1
+
+            yield write_rows
+        finally:
+            workbook.close()
+
+    @classmethod
+    def stream_csv(cls):
+        """
+        邊查詢邊產生 CSV 內容（給 StreamingHttpResponse 使用）
+
+        Yields:
+            str: 每批資料列組成的 CSV 文字
+        """
+        writer = csv.writer(_Echo())
+
+        # Excel 需要 BOM 才能正確辨識 UTF-8
+        yield codecs.BOM_UTF8.decode('utf-8') + writer.writerow(cls.HEADER)
+        for chunk in cls.iter_chunks():
+            yield ''.join(writer.writerow(row) for row in cls.to_table_rows(chunk))
@@ -0,0 +1,123 @@
+"""
+書籍列表的分面（Facet）統計
+
+依目前的篩選條件，統計每個價格分類、庫存狀態、出版社各有幾本書：
+1. 每個維度的數量套用「其他維度」的篩選、不套用自己的篩選（disjunctive faceting），
+   選了某個出版社之後，其他出版社的數量仍是切換過去會看到的筆數，而不是 0
+2. 每個維度一個查詢：出版社用 GROUP BY，價格分類與庫存狀態用條件式 COUNT（共三個查詢）
+3. 結果依目錄版本號快取，書籍有變動時自動失效
+"""
+import hashlib
+import json
+
+from django.db.models import Count
+
+from .book_list import BookListService
+from .catalog_cache import CatalogCache
+
+
+class BookFacetService:
+    """書籍列表的分面統計"""
+
+    CACHE_KEY_PREFIX = 'library:book_facets'
+    CACHE_TIMEOUT = 300
+
+    PRICE_CATEGORY_LABELS = {
+        'high': '高價書籍',
+        'medium': '中價書籍',
+        'low': '平價書籍',
+    }
+
+    STOCK_STATE_LABELS = {
+        'out': '已售完',
+        'low': '庫存不足',
+        'normal': '庫存正常',
+    }
+
+    @classmethod
+    def cache_key(cls, params):
+        """只有篩選條件會影響統計結果（排序、分頁不影響）"""
+        filters = {name: params.get(name) for name in BookListService.FILTER_PARAMS}
+        raw = json.dumps(filters, sort_keys=True)
+        return f'{cls.CACHE_KEY_PREFIX}:{hashlib.md5(raw.encode("utf-8")).hexdigest()}'
+
+    @classmethod
+    def get_facets(cls, params):
+        """
+        取得目前篩選條件下的分面統計（依目錄版本號快取）
+
+        Args:
+            params: BookListService.parse_params() 的結果
+
+        Returns:
+            dict: {
+                'total': 總數,
+                'price_categories': [{'value', 'label', 'count'}],
+                'stock_states': [{'value', 'label', 'count'}],
+                'publishers': [{'id', 'name', 'count'}]（依數量由多到少）,
+            }
+        """
+        facets, _ = CatalogCache.get_or_build(
+            cls.cache_key(params),
+            lambda: cls.build(params),
+            cls.CACHE_TIMEOUT,
+        )
+        return facets
+
+    @staticmethod
+    def _without(params, name):
+        """去掉某個維度自己的篩選條件"""
+        return {**params, name: None}
+
+    @classmethod
+    def build(cls, params):
+        """每個維度以去掉自己篩選條件的 QuerySet 各做一次彙總"""
+        # 1. 價格分類（同一個查詢順便算出套用全部篩選條件的總數）
+        selected_category = params.get('price_category')
+        price_counts = (
+            BookListService.get_queryset(cls._without(params, 'price_category'))
+            .aggregate(
+                total=Count('id', filter=BookListService.price_category_q(selected_category))
+                if selected_category else Count('id'),
+                **{
+                    category: Count('id', filter=BookListService.price_category_q(category))
+                    for category in BookListService.PRICE_CATEGORIES
+                },
+            )
+        )
+
+        # 2. 庫存狀態
+        stock_counts = (
+            BookListService.get_queryset(cls._without(params, 'stock'))
+            .aggregate(**{
+                state: Count('id', filter=BookListService.stock_state_q(state))
+                for state in BookListService.STOCK_STATES
+            })
+        )
+
+        # 3. 出版社
+        publisher_rows = (
+            BookListService.get_queryset(cls._without(params, 'publisher'))
+            .values('publisher_id', 'publisher__name')
+            .annotate(count=Count('id'))
+            .order_by()
+        )
+
+        return {
+            'total': price_counts['total'],
+            'price_categories': [
+                {'value': category, 'label': cls.PRICE_CATEGORY_LABELS[category], 'count': price_counts[category]}
+                for category in BookListService.PRICE_CATEGORIES
+            ],
+            'stock_states': [
+                {'value': state, 'label': cls.STOCK_STATE_LABELS[state], 'count': stock_counts[state]}
+                for state in BookListService.STOCK_STATES
+            ],
+            'publishers': sorted(
+                (
+                    {'id': row['publisher_id'], 'name': row['publisher__name'], 'count': row['count']}
+                    for row in publisher_rows
+                ),
+                key=lambda item: (-item['count'], item['name'] or ''),
+            ),
+        }
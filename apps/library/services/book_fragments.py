@@ -0,0 +1,85 @@
+"""
+單本書籍快取片段
+
+每本書序列化後的 dict 各自存一個快取 key：
+- 列表頁只快取「這一頁有哪些 id」，組裝時用一次 get_many 取回所有片段
+- 只有快取中缺少的書籍才回資料庫查詢
+- 某本書變動時，只需要更新那一本的片段
+"""
+from django.core.cache import cache
+
+from apps.library.models import Book
+from .book_list import BookListService
+
+
+class BookFragmentCache:
+    """單本書籍快取片段"""
+
+    # 片段格式改變時更新版本（v2：加入 low_stock），舊格式的片段不會再被讀到
+    KEY_PREFIX = 'library:book:v2'
+
+    # 片段由 Signal 主動更新，可以放比較久
+    TIMEOUT = 60 * 60 * 24
+
+    @classmethod
+    def make_key(cls, book_id):
+        return f'{cls.KEY_PREFIX}:{book_id}'
+
+    @classmethod
+    def get_many(cls, book_ids):
+        """
+        依照 book_ids 的順序取回序列化後的書籍資料
+
+        Args:
+            book_ids: 書籍 ID 列表
+
+        Returns:
+            list[dict]: 書籍資料（已被刪除的書籍會略過）
+        """
+        if not book_ids:
+            return []
+
+        keys = {book_id: cls.make_key(book_id) for book_id in book_ids}
+        cached = cache.get_many(list(keys.values()))
+
+        fragments = {}
+        missing_ids = []
+        for book_id, key in keys.items():
+            if key in cached:
+                fragments[book_id] = cached[key]
+            else:
+                missing_ids.append(book_id)
+
+        # 只查詢快取中缺少的書籍
+        if missing_ids:
+            print(f"[Cache MISS] {cls.KEY_PREFIX}: {len(missing_ids)} 本")
+            books = Book.objects.select_related('publisher').in_bulk(missing_ids)
+            new_fragments = {
+                book_id: BookListService.serialize_book(book)
+                for book_id, book in books.items()
+            }
+            cls.set_many(new_fragments)
+            fragments.update(new_fragments)
+
+        return [fragments[book_id] for book_id in book_ids if book_id in fragments]
+
+    @classmethod
+    def set_many(cls, fragments):
+        """
+        一次寫入多本書的快取片段
+
+        Args:
+            fragments: {book_id: 序列化後的書籍資料}
+        """
+        cache.set_many(
+            {cls.make_key(book_id): data for book_id, data in fragments.items()},
+            cls.TIMEOUT,
+        )
+
+    @classmethod
+    def delete(cls, book_id):
+        cache.delete(cls.make_key(book_id))
+
+    @classmethod
+    def delete_many(cls, book_ids):
+        cache.delete_many([cls.make_key(book_id) for book_id in book_ids])
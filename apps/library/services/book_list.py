@@ -0,0 +1,242 @@
+"""
+書籍列表查詢服務
+
+處理書籍列表 API 的篩選、排序與 Cursor（Keyset）分頁
+"""
+import base64
+import hashlib
+import json
+
+from django.db.models import Q
+
+from apps.library.models import Book
+from .low_stock import LowStockService
+
+
+class BookListService:
+    """書籍列表查詢服務"""
+
+    # 快取 key 前綴（每一頁各自一個 key，實際 key 會再加上目錄版本號）
+    CACHE_KEY_PREFIX = 'api_book_list_body'
+
+    # 允許的排序欄位（前面加 '-' 表示遞減）
+    SORT_FIELDS = ('id', 'title', 'price', 'stock')
+    DEFAULT_SORT = 'id'
+
+    # 每頁筆數
+    DEFAULT_LIMIT = 50
+    MAX_LIMIT = 200
+
+    # 庫存狀態篩選
+    STOCK_STATES = ('out', 'low', 'normal')
+
+    # 價格分類：(高於此價格, 最高價格（含）)，與前端 getCategoryByPrice 的分界相同
+    PRICE_CATEGORIES = {
+        'high': (500, None),
+        'medium': (300, 500),
+        'low': (None, 300),
+    }
+
+    # 只影響「哪些書」而不影響排序、分頁的參數
+    FILTER_PARAMS = ('publisher', 'price_min', 'price_max', 'price_category', 'stock')
+
+    @classmethod
+    def parse_params(cls, query_dict):
+        """
+        解析並驗證查詢參數
+
+        Args:
+            query_dict: request.GET
+
+        Returns:
+            dict: 正規化後的查詢參數
+
+        Raises:
+            ValueError: 參數格式錯誤
+        """
+        sort = query_dict.get('sort') or cls.DEFAULT_SORT
+        if sort.lstrip('-') not in cls.SORT_FIELDS:
+            raise ValueError(f'不支援的排序欄位：{sort}')
+
+        stock = query_dict.get('stock') or None
+        if stock and stock not in cls.STOCK_STATES:
+            raise ValueError(f'不支援的庫存狀態：{stock}')
+
+        price_category = query_dict.get('price_category') or None
+        if price_category and price_category not in cls.PRICE_CATEGORIES:
+            raise ValueError(f'不支援的價格分類：{price_category}')
+
+        limit = cls._parse_int(query_dict, 'limit') or cls.DEFAULT_LIMIT
+        if limit < 1:
+            raise ValueError('limit 必須是正整數')
+
+        params = {
+            'sort': sort,
+            'publisher': cls._parse_int(query_dict, 'publisher'),
+            'price_min': cls._parse_int(query_dict, 'price_min'),
+            'price_max': cls._parse_int(query_dict, 'price_max'),
+            'price_category': price_category,
+            'stock': stock,
+            'limit': min(limit, cls.MAX_LIMIT),
+            'cursor': query_dict.get('cursor') or None,
+        }
+
+        # 先解碼一次，確保 cursor 格式正確
+        if params['cursor']:
+            cls.decode_cursor(params['cursor'])
+
+        return params
+
+    @staticmethod
+    def _parse_int(query_dict, name):
+        value = query_dict.get(name)
+        if value in (None, ''):
+            return None
+        try:
+            return int(value)
+        except (TypeError, ValueError):
+            raise ValueError(f'{name} 必須是整數')
+
+    @classmethod
+    def get_queryset(cls, params):
+        """
+        依篩選條件建立基礎 QuerySet（尚未排序、分頁）
+        """
+        queryset = Book.objects.all()
+
+        if params.get('publisher') is not None:
+            queryset = queryset.filter(publisher_id=params['publisher'])
+        if params.get('price_min') is not None:
+            queryset = queryset.filter(price__gte=params['price_min'])
+        if params.get('price_max') is not None:
+            queryset = queryset.filter(price__lte=params['price_max'])
+        if params.get('price_category'):
+            queryset = queryset.filter(cls.price_category_q(params['price_category']))
+
+        if params.get('stock'):
+            queryset = queryset.filter(cls.stock_state_q(params['stock']))
+
+        return queryset
+
+    @classmethod
+    def price_category_q(cls, category):
+        """價格分類的篩選條件"""
+        low, high = cls.PRICE_CATEGORIES[category]
+        condition = Q()
+        if low is not None:
+            condition &= Q(price__gt=low)
+        if high is not None:
+            condition &= Q(price__lte=high)
+        return condition
+
+    @classmethod
+    def stock_state_q(cls, state):
+        """
+        庫存狀態的篩選條件
+
+        低庫存依書籍、出版社各自的門檻判斷（與庫存警告相同，見 LowStockService.threshold_expression）
+        """
+        if state == 'out':
+            return Q(stock__lte=0)
+        threshold = LowStockService.threshold_expression()
+        if state == 'low':
+            return Q(stock__gt=0, stock__lt=threshold)
+        return Q(stock__gt=0, stock__gte=threshold)
+
+    @classmethod
+    def get_page_queryset(cls, params):
+        """
+        建立一頁的查詢（套用 cursor、排序，多取一筆用來判斷是否還有下一頁）
+
+        Returns:
+            QuerySet: values_list('id', 排序欄位)
+        """
+        sort = params['sort']
+        field = sort.lstrip('-')
+        descending = sort.startswith('-')
+
+        queryset = cls.get_queryset(params)
+
+        # 套用 cursor 條件
+        if params.get('cursor'):
+            value, last_id = cls.decode_cursor(params['cursor'])
+            op = 'lt' if descending else 'gt'
+            if field == 'id':
+                queryset = queryset.filter(**{f'id__{op}': last_id})
+            else:
+                queryset = queryset.filter(
+                    Q(**{f'{field}__{op}': value}) |
+                    Q(**{field: value, f'id__{op}': last_id})
+                )
+
+        # id 作為第二排序鍵，確保排序穩定
+        if field == 'id':
+            ordering = [sort]
+        else:
+            ordering = [sort, '-id' if descending else 'id']
+
+        return queryset.order_by(*ordering).values_list('id', field)[:params['limit'] + 1]
+
+    @classmethod
+    def get_page_ids(cls, params):
+        """
+        取得一頁書籍的 ID
+
+        使用 Keyset 分頁：以 (排序欄位, id) 作為穩定的排序鍵，
+        下一頁從上一頁最後一筆之後開始查，不論翻到第幾頁成本都一樣。
+        這裡只查 ID 與排序欄位，書籍內容由 BookFragmentCache 組裝。
+
+        Returns:
+            dict: {'ids': [...], 'next_cursor': str | None, 'has_more': bool}
+        """
+        # 多取一筆，用來判斷是否還有下一頁
+        limit = params['limit']
+        rows = list(cls.get_page_queryset(params))
+        has_more = len(rows) > limit
+        rows = rows[:limit]
+
+        next_cursor = None
+        if has_more and rows:
+            last_id, last_value = rows[-1]
+            next_cursor = cls.encode_cursor(last_value, last_id)
+
+        return {
+            'ids': [row[0] for row in rows],
+            'next_cursor': next_cursor,
+            'has_more': has_more,
+        }
+
+    @staticmethod
+    def serialize_book(book):
+        """將 Book 轉成 API 使用的 dict（low_stock 依書籍、出版社的門檻判斷，客戶端不必自己計算）"""
+        return {
+            'id': book.id,
+            'title': book.title,
+            'price': book.price,
+            'stock': book.stock,
+            'low_stock': LowStockService.is_low(book),
+            'publisher': {
+                'id': book.publisher.id,
+                'name': book.publisher.name,
+            } if book.publisher else None,
+        }
+
+    @staticmethod
+    def encode_cursor(value, last_id):
+        raw = json.dumps([value, last_id], ensure_ascii=False).encode('utf-8')
+        return base64.urlsafe_b64encode(raw).decode('ascii')
+
+    @staticmethod
+    def decode_cursor(cursor):
+        try:
+            value, last_id = json.loads(base64.urlsafe_b64decode(cursor.encode('ascii')))
+            return value, int(last_id)
+        except (ValueError, TypeError, UnicodeError):
+            raise ValueError('無效的 cursor')
+
+    @classmethod
+    def cache_key(cls, params):
+        """每一種查詢條件 + cursor 組合對應一個快取 key"""
+        raw = json.dumps(params, sort_keys=True)
+        digest = hashlib.md5(raw.encode('utf-8')).hexdigest()
+        return f'{cls.CACHE_KEY_PREFIX}:{digest}'
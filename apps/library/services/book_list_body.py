@@ -0,0 +1,127 @@
+"""
+書籍列表 API 的預先編碼回應內容
+
+快取中直接存放最終要送出的 UTF-8 JSON bytes（以及 gzip / brotli 壓縮版本），
+快取命中時不需要再組 dict、json.dumps 或壓縮：
+- 未登入使用者：整份回應都一樣，直接送出對應壓縮格式的 bytes
+- 已登入使用者：把個人的收藏清單接在快取好的目錄 JSON 後面，目錄部分不重新編碼
+"""
+import gzip
+import json
+
+from django.core.serializers.json import DjangoJSONEncoder
+
+from .book_fragments import BookFragmentCache
+from .book_list import BookListService
+from .change_feed import BookChangeFeed
+
+try:
+    import brotli
+except ImportError:  # 未安裝 brotli 時只提供 gzip
+    brotli = None
+
+
+class BookListBody:
+    """書籍列表 API 的預先編碼回應內容"""
+
+    CONTENT_TYPE = 'application/json; charset=utf-8'
+
+    # 壓縮參數（只在快取重建時壓縮一次，可以用比較高的等級）
+    GZIP_LEVEL = 6
+    BROTLI_QUALITY = 6
+
+    @staticmethod
+    def dumps(data):
+        return json.dumps(
+            data,
+            cls=DjangoJSONEncoder,
+            ensure_ascii=False,
+            separators=(',', ':'),
+        ).encode('utf-8')
+
+    @classmethod
+    def build(cls, params):
+        """
+        查詢一頁書籍並編碼成快取用的 bytes
+
+        Returns:
+            dict: {
+                'catalog': 目錄部分的 JSON（不含外層大括號，可直接拼接）,
+                'anonymous': {'identity': bytes, 'gzip': bytes, 'br': bytes}（未登入使用者的完整回應）,
+            }
+        """
+        # 先記下異動序號再查資料，客戶端從這個序號開始套用異動紀錄即可接續同步
+        change_seq = BookChangeFeed.latest_seq()
+
+        page = BookListService.get_page_ids(params)
+        books = BookFragmentCache.get_many(page['ids'])
+
+        # 去掉外層的 { }，留下 "books":[...],"next_cursor":...,"has_more":...,"change_seq":...
+        catalog = cls.dumps({
+            'books': books,
+            'next_cursor': page['next_cursor'],
+            'has_more': page['has_more'],
+            'change_seq': change_seq,
+        })[1:-1]
+
+        anonymous = cls.assemble(catalog, [], False)
+        variants = {
+            'identity': anonymous,
+            'gzip': gzip.compress(anonymous, compresslevel=cls.GZIP_LEVEL, mtime=0),
+        }
+        if brotli is not None:
+            variants['br'] = brotli.compress(anonymous, quality=cls.BROTLI_QUALITY)
+
+        return {
+            'catalog': catalog,
+            'anonymous': variants,
+        }
+
+    @classmethod
+    def assemble(cls, catalog, favorite_book_ids, is_authenticated):
+        """
+        把目錄 JSON 與使用者相關的欄位拼成完整回應
+
+        Args:
+            catalog: build() 產生的目錄 JSON bytes
+            favorite_book_ids: 使用者收藏的書籍 ID
+            is_authenticated: 是否已登入
+
+        Returns:
+            bytes: 完整的 JSON 回應
+        """
+        return b''.join([
+            b'{"success":true,"data":{',
+            catalog,
+            b',"user_favorite_book_ids":',
+            cls.dumps(list(favorite_book_ids)),
+            b',"is_authenticated":',
+            b'true' if is_authenticated else b'false',
+            b'}}',
+        ])
+
+    @staticmethod
+    def choose_encoding(request):
+        """
+        依 Accept-Encoding 選擇回應的壓縮格式
+
+        只有未登入使用者的回應是預先壓縮好的；已登入使用者的回應含有個人資料，回傳未壓縮版本
+
+        Returns:
+            str: 'br'、'gzip' 或 'identity'
+        """
+        if request.user.is_authenticated:
+            return 'identity'
+
+        accepted = set()
+        for item in request.headers.get('Accept-Encoding', '').split(','):
+            coding, _, quality = item.strip().partition(';')
+            if quality.strip().replace(' ', '') in ('q=0', 'q=0.0', 'q=0.00', 'q=0.000'):
+                continue
+            accepted.add(coding.strip().lower())
+
+        if brotli is not None and 'br' in accepted:
+            return 'br'
+        if 'gzip' in accepted:
+            return 'gzip'
+        return 'identity'
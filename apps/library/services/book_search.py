@@ -0,0 +1,227 @@
+"""
+書籍全文搜尋服務
+
+搜尋範圍：書名、作者姓名、出版社名稱、ISBN、內容簡介
+
+中文沒有空白斷詞，所以建立索引時把連續的中日韓文字拆成「單字 + 相鄰兩字」：
+- 「資料庫」→ 資 料 庫 資料 料庫
+- 查詢「資料庫」時要求同時出現「資料」與「料庫」，單一字的查詢則比對單字
+
+拆好的詞以空白分隔存在 BookSearchDocument，由資料庫的全文索引處理：
+- SQLite：FTS5 虛擬表（migration 建立，觸發器自動同步）
+- PostgreSQL：to_tsvector('simple', document) 的 GIN 索引
+"""
+import re
+import unicodedata
+
+from django.db import connection, transaction
+
+from apps.library.models import Book, BookDetail, BookSearchDocument
+
+
+class BookSearchService:
+    """書籍全文搜尋"""
+
+    # 每次最多回傳筆數
+    DEFAULT_LIMIT = 20
+    MAX_LIMIT = 100
+
+    # 重建索引時每批處理的書籍數量
+    CHUNK_SIZE = 500
+
+    # 中日韓文字（連續的一段會被拆成 n-gram）
+    CJK_PATTERN = r'[\u3040-\u30ff\u3400-\u4dbf\u4e00-\u9fff\uac00-\ud7af\uf900-\ufaff]'
+    TOKEN_RE = re.compile(rf'{CJK_PATTERN}+|[0-9a-z]+')
+    CJK_RE = re.compile(rf'{CJK_PATTERN}+')
+
+    FTS_TABLE = 'library_booksearchdocument_fts'
+
+    # ==========================================
+    # 斷詞
+    # ==========================================
+
+    @staticmethod
+    def _normalize(text):
+        # 全形轉半形、英文轉小寫
+        return unicodedata.normalize('NFKC', text or '').lower()
+
+    @classmethod
+    def index_tokens(cls, text):
+        """
+        建立索引用的詞：中文拆成單字與雙字詞，英文與數字保留整個字
+
+        Returns:
+            list[str]
+        """
+        tokens = []
+        for run in cls.TOKEN_RE.findall(cls._normalize(text)):
+            if cls.CJK_RE.fullmatch(run):
+                tokens.extend(run)
+                tokens.extend(run[i:i + 2] for i in range(len(run) - 1))
+            else:
+                tokens.append(run)
+        return tokens
+
+    @classmethod
+    def query_tokens(cls, text):
+        """
+        查詢用的詞
+
+        Returns:
+            list[tuple[str, bool]]: (詞, 是否為前綴比對)；英文與數字使用前綴比對
+        """
+        tokens = []
+        for run in cls.TOKEN_RE.findall(cls._normalize(text)):
+            if cls.CJK_RE.fullmatch(run):
+                if len(run) == 1:
+                    tokens.append((run, False))
+                else:
+                    tokens.extend((run[i:i + 2], False) for i in range(len(run) - 1))
+            else:
+                tokens.append((run, True))
+
+        # 去除重複但保留順序
+        return list(dict.fromkeys(tokens))
+
+    # ==========================================
+    # 建立索引
+    # ==========================================
+
+    @classmethod
+    def build_document(cls, book):
+        """
+        組出一本書的搜尋內容
+
+        Args:
+            book: 已 select_related('publisher', 'detail') 與 prefetch_related('authors') 的 Book
+        """
+        parts = [book.title]
+        parts.extend(author.name for author in book.authors.all())
+        if book.publisher:
+            parts.append(book.publisher.name)
+
+        try:
+            detail = book.detail
+        except BookDetail.DoesNotExist:
+            detail = None
+        if detail is not None:
+            # ISBN 同時保留原始格式與去掉連字號的版本
+            parts.extend([detail.isbn, detail.isbn.replace('-', ''), detail.description])
+
+        return cls.make_document(parts)
+
+    @classmethod
+    def make_document(cls, parts):
+        """
+        把多段文字組成搜尋內容（批次匯入時可直接使用已知的書名、作者、出版社，不必再查詢）
+
+        Args:
+            parts: 文字列表（None 會略過）
+        """
+        return ' '.join(cls.index_tokens(' '.join(part for part in parts if part)))
+
+    @classmethod
+    def index_books(cls, book_ids):
+        """
+        重新建立指定書籍的搜尋文件（已刪除的書籍會由 CASCADE 自動移除）
+
+        Args:
+            book_ids: 書籍 ID 列表
+
+        Returns:
+            int: 建立的文件數量
+        """
+        book_ids = list(book_ids)
+        total = 0
+        for start in range(0, len(book_ids), cls.CHUNK_SIZE):
+            chunk = book_ids[start:start + cls.CHUNK_SIZE]
+            books = (
+                Book.objects.filter(id__in=chunk)
+                .select_related('publisher', 'detail')
+                .prefetch_related('authors')
+            )
+            documents = [
+                BookSearchDocument(book_id=book.id, document=cls.build_document(book))
+                for book in books
+            ]
+            with transaction.atomic():
+                BookSearchDocument.objects.filter(book_id__in=chunk).delete()
+                BookSearchDocument.objects.bulk_create(documents)
+            total += len(documents)
+
+        print(f"[Search] 已更新 {total} 本書籍的搜尋索引")
+        return total
+
+    @classmethod
+    def rebuild(cls):
+        """
+        重建所有書籍的搜尋索引
+
+        Returns:
+            int: 建立的文件數量
+        """
+        book_ids = Book.objects.order_by('id').values_list('id', flat=True)
+        return cls.index_books(book_ids.iterator(chunk_size=cls.CHUNK_SIZE))
+
+    # ==========================================
+    # 查詢
+    # ==========================================
+
+    @classmethod
+    def search_ids(cls, query, limit=None):
+        """
+        全文搜尋，回傳依相關程度排序的書籍 ID
+
+        Args:
+            query: 使用者輸入的關鍵字
+            limit: 最多回傳幾筆
+
+        Returns:
+            list[int]
+        """
+        limit = min(limit or cls.DEFAULT_LIMIT, cls.MAX_LIMIT)
+        tokens = cls.query_tokens(query)
+        if not tokens:
+            return []
+
+        if connection.vendor not in ('sqlite', 'postgresql'):
+            # 其他資料庫沒有建立全文索引，退回 LIKE 比對
+            queryset = BookSearchDocument.objects.all()
+            for token, _ in tokens:
+                queryset = queryset.filter(document__contains=token)
+            return list(queryset.values_list('book_id', flat=True)[:limit])
+
+        with connection.cursor() as cursor:
+            if connection.vendor == 'sqlite':
+                # "詞" 完全比對、"詞"* 前綴比對，以空白分隔表示 AND
+                match = ' '.join(f'"{token}"*' if prefix else f'"{token}"' for token, prefix in tokens)
+                order_by = 'rowid DESC' if cls._is_broad(tokens) else 'rank'
+                cursor.execute(
+                    f'SELECT rowid FROM {cls.FTS_TABLE} WHERE {cls.FTS_TABLE} MATCH %s '
+                    f'ORDER BY {order_by} LIMIT %s',
+                    [match, limit],
+                )
+            else:
+                tsquery = ' & '.join(f"'{token}':*" if prefix else f"'{token}'" for token, prefix in tokens)
+                if cls._is_broad(tokens):
+                    order_by = 'book_id DESC'
+                    params = [tsquery, limit]
+                else:
+                    order_by = "ts_rank(to_tsvector('simple', document), to_tsquery('simple', %s)) DESC, book_id"
+                    params = [tsquery, tsquery, limit]
+                cursor.execute(
+                    f"SELECT book_id FROM {BookSearchDocument._meta.db_table} "
+                    f"WHERE to_tsvector('simple', document) @@ to_tsquery('simple', %s) "
+                    f"ORDER BY {order_by} LIMIT %s",
+                    params,
+                )
+            return [row[0] for row in cursor.fetchall()]
+
+    @staticmethod
+    def _is_broad(tokens):
+        """
+        是否為只有單一中文字的查詢
+
+        單一字會比對到大量書籍，計算相關程度要掃過全部結果，改成依新到舊排序以維持查詢速度
+        """
+        return all(len(token) == 1 and not prefix for token, prefix in tokens)
@@ -0,0 +1,126 @@
+"""
+WebSocket 廣播派送服務
+
+Signal 或 View 不直接呼叫 group_send（要等 Redis 回應，channel layer 變慢時會拖住寫入），
+而是把訊息放進有上限的佇列，由背景執行緒送出：
+1. 寫入請求只做一次 put_nowait，不受 channel layer 速度影響
+2. 佇列滿了就丟棄新訊息並計數（客戶端會透過異動紀錄 API 補齊資料）
+3. 背景執行緒使用自己的 event loop，持續重複使用同一組 Redis 連線
+"""
+import asyncio
+import atexit
+import os
+import queue
+import threading
+import time
+
+from channels.layers import get_channel_layer
+
+
+class BroadcastDispatcher:
+    """非阻塞的 WebSocket 廣播派送"""
+
+    # 佇列上限：超過就丟棄，避免 channel layer 故障時記憶體無限成長
+    MAX_QUEUE_SIZE = 1000
+
+    # 程式結束前等待佇列送完的最長時間（秒）
+    SHUTDOWN_TIMEOUT = 2
+
+    _queue = queue.Queue(maxsize=MAX_QUEUE_SIZE)
+    _lock = threading.Lock()
+    _worker = None
+    _worker_pid = None
+
+    # 統計數字
+    _stats = {'sent': 0, 'dropped': 0, 'failed': 0}
+
+    @classmethod
+    def send(cls, group, message):
+        """
+        把廣播放進佇列（不會阻塞）
+
+        Args:
+            group: 群組名稱
+            message: group_send 的訊息（必須包含 'type'）
+
+        Returns:
+            bool: False 表示佇列已滿、訊息被丟棄
+        """
+        cls._ensure_worker()
+        try:
+            cls._queue.put_nowait((group, message))
+        except queue.Full:
+            cls._stats['dropped'] += 1
+            print(f"[Broadcast] 佇列已滿，丟棄訊息: {group} - {message.get('type')}"
+                  f"（累計丟棄 {cls._stats['dropped']} 則）")
+            return False
+        return True
+
+    @classmethod
+    def stats(cls):
+        """
+        取得派送統計
+
+        Returns:
+            dict: {'sent', 'dropped', 'failed', 'pending'}
+        """
+        return {**cls._stats, 'pending': cls._queue.qsize()}
+
+    @classmethod
+    def flush(cls, timeout=None):
+        """
+        等待佇列中的訊息送完（管理指令或程式結束前使用）
+
+        Returns:
+            bool: 是否在時間內送完
+        """
+        timeout = cls.SHUTDOWN_TIMEOUT if timeout is None else timeout
+        deadline = time.monotonic() + timeout
+        while cls._queue.unfinished_tasks:
+            if time.monotonic() >= deadline:
+                return False
+            time.sleep(0.01)
+        return True
+
+    @classmethod
+    def _ensure_worker(cls):
+        """背景執行緒不存在時啟動（fork 出來的子行程也會重新啟動自己的執行緒）"""
+        pid = os.getpid()
+        if cls._worker is not None and cls._worker_pid == pid and cls._worker.is_alive():
+            return
+
+        with cls._lock:
+            if cls._worker is not None and cls._worker_pid == pid and cls._worker.is_alive():
+                return
+            if cls._worker_pid != pid:
+                # fork 後繼承的佇列屬於父行程，換一個新的
+                cls._queue = queue.Queue(maxsize=cls.MAX_QUEUE_SIZE)
+            cls._worker_pid = pid
+            cls._worker = threading.Thread(
+                target=cls._run,
+                name='broadcast-dispatcher',
+                daemon=True,
+            )
+            cls._worker.start()
+
+    @classmethod
+    def _run(cls):
+        """背景執行緒：逐一送出佇列中的訊息"""
+        loop = asyncio.new_event_loop()
+        asyncio.set_event_loop(loop)
+        channel_layer = get_channel_layer()
+
+        while True:
+            group, message = cls._queue.get()
+            try:
+                loop.run_until_complete(channel_layer.group_send(group, message))
+                cls._stats['sent'] += 1
+            except Exception as e:
+                cls._stats['failed'] += 1
+                print(f"[Broadcast] 發送失敗: {group} - {e}")
+            finally:
+                cls._queue.task_done()
+
+
+# 程式結束前盡量把還在佇列中的訊息送出
+atexit.register(BroadcastDispatcher.flush)
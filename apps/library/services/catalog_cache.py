@@ -0,0 +1,124 @@
+"""
+書籍目錄快取服務
+
+以「目錄版本號」取代刪除快取：
+1. 書籍有變動時只把版本號 +1，舊版本的快取 key 自然不再被讀到
+2. 快取未命中時只讓一個請求（拿到 Redis 鎖的那個）重新查詢資料庫
+3. 其他同時進來的請求先拿上一版的資料回應，不會一起打資料庫
+"""
+import time
+
+from django.core.cache import cache
+from redis.exceptions import LockError
+
+from .versioning import VersionCounter
+
+
+class CatalogCache:
+    """書籍目錄快取（版本號 + 單一重建）"""
+
+    # 目錄版本號的快取 key（永不過期）
+    VERSION_KEY = 'library:catalog_version'
+    _counter = VersionCounter(VERSION_KEY)
+
+    # 重建鎖的存活時間（秒），避免重建的請求當掉後鎖永遠不釋放
+    LOCK_TIMEOUT = 10
+
+    # 上一版資料保留時間（秒），重建期間回應給其他請求使用
+    STALE_TIMEOUT = 600
+
+    # 完全沒有舊資料時，等待重建完成的最長時間（秒）與輪詢間隔
+    WAIT_TIMEOUT = 2
+    WAIT_INTERVAL = 0.05
+
+    @classmethod
+    def get_version(cls):
+        """
+        取得目前的目錄版本號
+
+        Returns:
+            int: 版本號
+        """
+        return cls._counter.get()
+
+    @classmethod
+    def bump_version(cls):
+        """
+        目錄有變動時呼叫：版本號 +1
+
+        Returns:
+            int: 新的版本號
+        """
+        version = cls._counter.bump()
+        print(f"[Cache] 目錄版本更新: {version}")
+        return version
+
+    @classmethod
+    def get_last_modified(cls):
+        """
+        取得目錄最後修改時間
+
+        Returns:
+            datetime | None
+        """
+        return cls._counter.last_modified()
+
+    @classmethod
+    def get_or_build(cls, base_key, builder, timeout):
+        """
+        取得目前版本的快取資料，未命中時以單一請求重建
+
+        Args:
+            base_key: 快取 key（不含版本號）
+            builder: 無參數函數，回傳要快取的資料
+            timeout: 快取存活時間（秒）
+
+        Returns:
+            tuple: (快取資料, 該資料所屬的版本號)；重建期間可能回傳上一版的資料
+        """
+        version = cls.get_version()
+        key = f'{base_key}:v{version}'
+        stale_key = f'{base_key}:stale'
+
+        value = cache.get(key)
+        if value is not None:
+            print(f"[Cache HIT] {key}")
+            return value, version
+
+        lock = cache.lock(f'{base_key}:lock', timeout=cls.LOCK_TIMEOUT)
+        if lock.acquire(blocking=False):
+            try:
+                # 拿到鎖後再確認一次，可能剛好有別人建好了
+                value = cache.get(key)
+                if value is None:
+                    print(f"[Cache MISS] {key}")
+                    value = builder()
+                    cache.set(key, value, timeout)
+                    cache.set(stale_key, (version, value), cls.STALE_TIMEOUT)
+                    print(f"[Cache SET] {key}")
+                return value, version
+            finally:
+                try:
+                    lock.release()
+                except LockError:
+                    # 重建時間超過 LOCK_TIMEOUT，鎖已自動過期
+                    pass
+
+        # 沒拿到鎖：其他請求正在重建，先回應上一版的資料
+        stale = cache.get(stale_key)
+        if stale is not None:
+            print(f"[Cache STALE] {key}")
+            return stale[1], stale[0]
+
+        # 連上一版都沒有（第一次建立），短暫等待重建完成
+        deadline = time.monotonic() + cls.WAIT_TIMEOUT
+        while time.monotonic() < deadline:
+            time.sleep(cls.WAIT_INTERVAL)
+            value = cache.get(key)
+            if value is not None:
+                print(f"[Cache HIT] {key}（等待重建）")
+                return value, version
+
+        # 等太久就自己查，但不寫入快取，避免覆蓋重建者的結果
+        print(f"[Cache MISS] {key}（等待逾時）")
+        return builder(), version
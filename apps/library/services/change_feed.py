@@ -0,0 +1,226 @@
+"""
+書籍異動紀錄（Change Feed）服務
+
+Signal 在書籍新增、更新、刪除時寫入一筆異動紀錄，
+客戶端或同步程式帶著上次的序號來查詢，只拿到之後有變動的書籍
+
+序號依 commit 的順序編號：紀錄寫入時 seq 為 NULL，交易 commit 後由 BookChangeNotifier（或批次匯入）
+呼叫 assign_seq，在鎖內接著目前最大的序號往下編，讀到序號 N 時 N 以前的紀錄一定都已經看得到
+"""
+from datetime import timedelta
+
+from django.db import connection, transaction
+from django.db.models import BigIntegerField, Case, Max, Subquery, Value, When
+from django.db.models.functions import Coalesce
+from django.utils import timezone
+
+from apps.library.models import BookChange
+from .book_fragments import BookFragmentCache
+
+
+class ChangeFeedResetRequired(Exception):
+    """要求的序號已被壓縮清除，客戶端必須重新載入完整資料"""
+
+
+class BookChangeFeed:
+    """書籍異動紀錄服務"""
+
+    DEFAULT_LIMIT = 500
+    MAX_LIMIT = 2000
+
+    # 壓縮設定：超過保留天數的紀錄會被刪除，但至少保留最新的 KEEP_LATEST 筆
+    RETENTION_DAYS = 7
+    KEEP_LATEST = 1000
+
+    # 每個 UPDATE 編號的紀錄數量（避免超過 SQLite 的參數數量上限）
+    ASSIGN_CHUNK_SIZE = 500
+
+    # 編號用的 PostgreSQL advisory lock
+    SEQ_LOCK_ID = 7_310_001
+
+    # commit 超過這個時間（秒）還沒編號的紀錄（commit 後的處理失敗），由定時任務呼叫 assign_orphans 補上
+    ORPHAN_SECONDS = 60
+
+    @classmethod
+    def record(cls, action, book_id):
+        """寫入一筆異動紀錄（尚未編號，commit 後由 assign_seq 編號）"""
+        return BookChange.objects.create(action=action, book_id=book_id)
+
+    @classmethod
+    def record_many(cls, action, book_ids):
+        """
+        一次寫入多筆相同動作的異動紀錄（QuerySet.update 等不會觸發 Signal 的批次操作使用）
+
+        Returns:
+            list[BookChange]: 已寫入的紀錄（含 id，尚未編號）
+        """
+        return BookChange.objects.bulk_create([
+            BookChange(action=action, book_id=book_id) for book_id in book_ids
+        ])
+
+    @classmethod
+    def assign_seq(cls, change_ids):
+        """
+        依 commit 的順序替紀錄編號（必須在寫入紀錄的交易 commit 之後呼叫）
+
+        PostgreSQL：編號的交易持有同一把 advisory lock，前一次編號 commit 後才會讀取最大序號，
+        所以序號大的紀錄一定比序號小的晚看得到
+
+        Args:
+            change_ids: 異動紀錄 id（已 rollback 或已編號的會略過）
+
+        Returns:
+            dict: {id: 序號}
+        """
+        change_ids = sorted(set(change_ids))
+        if not change_ids:
+            return {}
+
+        if connection.vendor == 'postgresql':
+            with transaction.atomic():
+                # 交易結束時自動釋放
+                with connection.cursor() as cursor:
+                    cursor.execute('SELECT pg_advisory_xact_lock(%s)', [cls.SEQ_LOCK_ID])
+                cls._number(change_ids)
+        else:
+            # SQLite 同一時間只有一個寫入者，每個 UPDATE 不會交錯；
+            # 不開交易，避免先讀取再升級成寫入時與其他連線的交易衝突（database is locked）
+            cls._number(change_ids)
+
+        return dict(BookChange.objects.filter(id__in=change_ids).values_list('id', 'seq'))
+
+    @classmethod
+    def _number(cls, change_ids):
+        """依 id 順序接在目前最大的序號後面（最大序號在同一個 UPDATE 中讀取）"""
+        last_seq = Subquery(
+            BookChange.objects.filter(seq__isnull=False).order_by('-seq').values('seq')[:1]
+        )
+        pending = list(
+            BookChange.objects.filter(id__in=change_ids, seq__isnull=True)
+            .order_by('id')
+            .values_list('id', flat=True)
+        )
+        for start in range(0, len(pending), cls.ASSIGN_CHUNK_SIZE):
+            chunk = pending[start:start + cls.ASSIGN_CHUNK_SIZE]
+            BookChange.objects.filter(id__in=chunk, seq__isnull=True).update(
+                seq=Coalesce(last_seq, Value(0), output_field=BigIntegerField()) + Case(
+                    *[When(id=change_id, then=Value(rank)) for rank, change_id in enumerate(chunk, start=1)],
+                    output_field=BigIntegerField(),
+                ),
+            )
+
+    @classmethod
+    def assign_orphans(cls):
+        """
+        補上 commit 後沒有編號的紀錄（commit 後的處理失敗或程序中止）
+
+        Returns:
+            int: 編號的紀錄數量
+        """
+        cutoff = timezone.now() - timedelta(seconds=cls.ORPHAN_SECONDS)
+        orphan_ids = list(
+            BookChange.objects.filter(seq__isnull=True, created_at__lt=cutoff)
+            .values_list('id', flat=True)[:cls.MAX_LIMIT]
+        )
+        if orphan_ids:
+            cls.assign_seq(orphan_ids)
+            print(f"[ChangeFeed] 補上 {len(orphan_ids)} 筆未編號的異動紀錄")
+        return len(orphan_ids)
+
+    @classmethod
+    def latest_seq(cls):
+        """目前最新的序號（沒有任何紀錄時為 0）"""
+        return BookChange.objects.aggregate(latest=Max('seq'))['latest'] or 0
+
+    @classmethod
+    def get_changes(cls, since, limit=None):
+        """
+        取得某個序號之後的異動
+
+        同一本書在這段期間內的多次異動只會回傳最後的狀態
+
+        Args:
+            since: 客戶端上次看到的序號
+            limit: 最多讀取幾筆異動紀錄
+
+        Returns:
+            dict: {
+                'books': 新增或更新的書籍資料,
+                'deleted_ids': 已刪除的書籍 ID,
+                'latest_seq': 這次讀到的最後序號（下次查詢帶這個值）,
+                'has_more': 是否還有更多異動,
+            }
+
+        Raises:
+            ChangeFeedResetRequired: since 之後的紀錄已被壓縮清除
+        """
+        limit = min(limit or cls.DEFAULT_LIMIT, cls.MAX_LIMIT)
+
+        # 只讀取已編號的紀錄（唯讀；編號失敗的紀錄由定時任務 assign_orphan_book_changes 補上）
+        # 最舊的紀錄之前若還有未讀的序號，表示中間有紀錄被清掉了
+        oldest = (
+            BookChange.objects.filter(seq__isnull=False)
+            .order_by('seq').values_list('seq', flat=True).first()
+        )
+        if oldest is not None and since < oldest - 1:
+            raise ChangeFeedResetRequired()
+
+        rows = list(
+            BookChange.objects.filter(seq__gt=since)
+            .order_by('seq')
+            .values_list('seq', 'book_id', 'action')[:limit + 1]
+        )
+        has_more = len(rows) > limit
+        rows = rows[:limit]
+
+        # 每本書只保留最後一次的動作
+        last_action = {}
+        for _, book_id, action in rows:
+            last_action[book_id] = action
+
+        upsert_ids = [
+            book_id for book_id, action in last_action.items()
+            if action != BookChange.Action.DELETE
+        ]
+        books = BookFragmentCache.get_many(upsert_ids)
+
+        # 紀錄是新增/更新，但書籍已經不存在（之後被刪除，刪除紀錄在下一批）也視為刪除
+        found_ids = {book['id'] for book in books}
+        deleted_ids = [
+            book_id for book_id, action in last_action.items()
+            if action == BookChange.Action.DELETE or book_id not in found_ids
+        ]
+
+        return {
+            'books': books,
+            'deleted_ids': deleted_ids,
+            'latest_seq': rows[-1][0] if rows else since,
+            'has_more': has_more,
+        }
+
+    @classmethod
+    def compact(cls, retention_days=None, keep_latest=None):
+        """
+        刪除過舊的異動紀錄
+
+        Returns:
+            int: 刪除的筆數
+        """
+        retention_days = cls.RETENTION_DAYS if retention_days is None else retention_days
+        keep_latest = cls.KEEP_LATEST if keep_latest is None else keep_latest
+
+        cls.assign_orphans()
+
+        cutoff = timezone.now() - timedelta(days=retention_days)
+        queryset = BookChange.objects.filter(created_at__lt=cutoff)
+
+        # 保留最新的 keep_latest 筆，確保紀錄表不會被清空（未編號的紀錄不刪除）
+        boundary = (
+            BookChange.objects.filter(seq__isnull=False).order_by('-seq')
+            .values_list('seq', flat=True)[keep_latest:keep_latest + 1]
+            .first()
+        )
+        if boundary is None:
+            return 0
+        deleted, _ = queryset.filter(seq__lte=boundary).delete()
+        return deleted
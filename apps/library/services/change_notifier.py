@@ -0,0 +1,240 @@
+"""
+書籍異動通知合併服務
+
+Signal 不再每存一本書就更新快取、廣播一次，而是先記在緩衝區，之後一次處理：
+1. 在交易（transaction.atomic）中：交易 commit 後（on_commit）才處理，rollback 就不會送出
+2. 不在交易中：第一筆立即處理，之後 WINDOW 秒內的異動合併成一批
+
+每一批只做一次資料庫查詢、一次快取寫入、一次搜尋索引更新、一次版本號更新與一次 WebSocket 廣播，
+匯入或後台批次修改 5,000 本書也只會產生少量的快取操作與廣播
+"""
+import threading
+import time
+
+from django.db import connection, transaction
+
+from apps.library.models import Book, BookChange
+from .book_fragments import BookFragmentCache
+from .book_list import BookListService
+from .book_search import BookSearchService
+from .catalog_cache import CatalogCache
+from .change_feed import BookChangeFeed
+from .low_stock import LowStockService
+
+
+class _PendingChanges:
+    """尚未送出的異動（每本書只記第一次的動作與最後的書名）"""
+
+    def __init__(self):
+        self.actions = {}
+        self.titles = {}
+        self.change_ids = []
+
+    def add(self, action, book_id, title, change_id):
+        self.actions.setdefault(book_id, action)
+        self.titles[book_id] = title
+        self.change_ids.append(change_id)
+
+    def __bool__(self):
+        return bool(self.actions)
+
+
+class BookChangeNotifier:
+    """合併書籍異動後一次更新快取並廣播"""
+
+    # 不在交易中的異動，合併的時間區間（秒）
+    WINDOW = 0.5
+
+    # 一批超過這個數量時，廣播只帶書籍 ID，由客戶端透過異動紀錄 API 取得資料
+    MAX_INLINE_BOOKS = 200
+
+    # 不在交易中的緩衝區（整個 process 共用）
+    _lock = threading.Lock()
+    _pending = _PendingChanges()
+    _timer = None
+    _last_flush = 0.0
+
+    @classmethod
+    def add(cls, action, book_id, title, change_id):
+        """
+        記錄一筆書籍異動（由 Signal 呼叫）
+
+        Args:
+            action: 'create'、'update' 或 'delete'
+            book_id: 書籍 ID
+            title: 書名（刪除時用來組通知訊息）
+            change_id: 異動紀錄的 id（commit 後編號）
+        """
+        if connection.in_atomic_block:
+            cls._add_to_transaction(action, book_id, title, change_id)
+        else:
+            cls._add_to_window(action, book_id, title, change_id)
+
+    @classmethod
+    def _add_to_transaction(cls, action, book_id, title, change_id):
+        """交易中的異動：記在這個連線的緩衝區，commit 後一次送出"""
+        batch = getattr(connection, '_book_change_batch', None)
+
+        # 交易 rollback 後 on_commit 的回呼會被丟掉，這時要換一個新的緩衝區
+        if batch is None or not any(
+            callback == batch.flush for _, callback, _ in connection.run_on_commit
+        ):
+            batch = _TransactionBatch(cls)
+            connection._book_change_batch = batch
+            transaction.on_commit(batch.flush)
+
+        batch.pending.add(action, book_id, title, change_id)
+
+    @classmethod
+    def _add_to_window(cls, action, book_id, title, change_id):
+        """交易外的異動：閒置時立即送出，短時間內的連續異動合併成一批"""
+        with cls._lock:
+            cls._pending.add(action, book_id, title, change_id)
+
+            if cls._timer is not None:
+                # 已排定送出，等計時器處理
+                return
+
+            wait = cls._last_flush + cls.WINDOW - time.monotonic()
+            if wait > 0:
+                cls._timer = threading.Timer(wait, cls._flush_window_from_timer)
+                cls._timer.start()
+                return
+
+            pending = cls._take_pending()
+
+        cls.flush(pending)
+
+    @classmethod
+    def _take_pending(cls):
+        """取出交易外緩衝區的內容（呼叫時必須持有 _lock）"""
+        pending = cls._pending
+        cls._pending = _PendingChanges()
+        cls._timer = None
+        cls._last_flush = time.monotonic()
+        return pending
+
+    @classmethod
+    def _flush_window_from_timer(cls):
+        with cls._lock:
+            pending = cls._take_pending()
+        try:
+            cls.flush(pending)
+        finally:
+            # 計時器執行緒自己的資料庫連線用完要關閉
+            connection.close()
+
+    @classmethod
+    def flush_now(cls):
+        """立即送出交易外緩衝區的異動（例如管理指令結束前呼叫）"""
+        with cls._lock:
+            if cls._timer is not None:
+                cls._timer.cancel()
+            pending = cls._take_pending()
+        cls.flush(pending)
+
+    @classmethod
+    def flush(cls, pending):
+        """
+        處理一批異動：更新快取片段與搜尋索引、替異動紀錄編號、更新目錄版本號、庫存不足清單，發送一次 WebSocket 廣播
+
+        以資料庫目前的狀態為準：書籍存在就視為新增/更新，不存在就視為刪除
+        （交易中被 rollback 的 savepoint 也會因此得到正確結果）
+        """
+        if not pending:
+            return
+
+        # 這裡 import 避免與 signals 循環 import
+        from apps.library.signals import notify_book_update
+
+        # 1. 一次查回這批書籍目前的資料
+        books = Book.objects.select_related('publisher').in_bulk(list(pending.actions))
+
+        created, updated, deleted_ids = [], [], []
+        for book_id, action in pending.actions.items():
+            book = books.get(book_id)
+            if book is not None:
+                (created if action == BookChange.Action.CREATE else updated).append(book)
+            elif action != BookChange.Action.CREATE:
+                # 新增後又刪除（或被 rollback）的書，客戶端從沒看過，不需要通知
+                deleted_ids.append(book_id)
+
+        fragments = {
+            book.id: BookListService.serialize_book(book)
+            for book in created + updated
+        }
+
+        # 2. 先更新快取片段與搜尋索引（刪除的書籍由 CASCADE 移除），再編號：頁面讀到的 latest_seq 一定已經反映在資料上
+        #    （順序相反時，同時重建的頁面可能標示新的序號卻帶著舊的片段，客戶端會把這筆異動當成已套用）
+        if fragments:
+            BookFragmentCache.set_many(fragments)
+            BookSearchService.index_books(fragments)
+        if deleted_ids:
+            BookFragmentCache.delete_many(deleted_ids)
+
+        # 3. 紀錄已經 commit，依 commit 順序編號（rollback 的紀錄不存在，不會編號）
+        seqs = sorted(seq for seq in BookChangeFeed.assign_seq(pending.change_ids).values() if seq is not None)
+
+        if not seqs or (not fragments and not deleted_ids):
+            return
+
+        # 4. 編號後立即更新目錄版本號，讓編號前以目前版本快取的頁面失效
+        version = CatalogCache.bump_version()
+
+        # 5. 更新庫存不足清單
+        LowStockService.sync(created + updated, deleted_ids)
+
+        # 6. 發送一次 WebSocket 廣播
+        payload = {
+            'book_ids': list(fragments),
+            'deleted_ids': deleted_ids,
+            'version': version,
+            'from_seq': seqs[0],
+            'change_seq': seqs[-1],
+        }
+        # 序號不連續（中間夾著其他交易的異動，例如交易外合併的多筆異動）時不附書籍資料，
+        # 客戶端改從異動紀錄補齊，才不會把中間別人的異動當成已套用
+        contiguous = seqs[-1] - seqs[0] + 1 == len(seqs)
+        if contiguous and len(fragments) <= cls.MAX_INLINE_BOOKS:
+            payload['books'] = list(fragments.values())
+
+        action, message = cls._describe(pending, created, updated, deleted_ids)
+        notify_book_update(action, message, **payload)
+
+    @staticmethod
+    def _describe(pending, created, updated, deleted_ids):
+        """
+        組通知的動作與訊息
+
+        Returns:
+            tuple: (action, message)；單一異動沿用 create/update/delete，多筆為 batch
+        """
+        if len(created) + len(updated) + len(deleted_ids) == 1:
+            if created:
+                return 'create', f'新書上架：{created[0].title}'
+            if updated:
+                return 'update', f'書籍已更新：{updated[0].title}'
+            return 'delete', f'書籍已下架：{pending.titles[deleted_ids[0]]}'
+
+        parts = []
+        if created:
+            parts.append(f'新增 {len(created)} 本')
+        if updated:
+            parts.append(f'更新 {len(updated)} 本')
+        if deleted_ids:
+            parts.append(f'下架 {len(deleted_ids)} 本')
+        total = len(created) + len(updated) + len(deleted_ids)
+        return 'batch', f'{total} 本書籍已異動（{"、".join(parts)}）'
+
+
+class _TransactionBatch:
+    """一個交易內累積的異動，commit 後送出"""
+
+    def __init__(self, notifier):
+        self.notifier = notifier
+        self.pending = _PendingChanges()
+
+    def flush(self):
+        if getattr(connection, '_book_change_batch', None) is self:
+            connection._book_change_batch = None
+        self.notifier.flush(self.pending)
@@ -0,0 +1,72 @@
+"""
+計數欄位維護服務
+
+Publisher.book_count、Author.book_count、Book.favorite_count 由 Signal 以 F() 即時加減
+（資料庫端原子更新，不會有同時寫入互相覆蓋的問題）。
+bulk_create、QuerySet.update 等不會觸發 Signal 的操作可能造成誤差，
+由定時任務 reconcile() 重新計算並修正。
+"""
+from django.db.models import Count, F, OuterRef, Subquery
+from django.db.models.functions import Coalesce
+
+from apps.library.models import Author, Book, Publisher, ReadingList
+
+
+class CounterService:
+    """計數欄位維護"""
+
+    # (Model, 計數欄位, 被計數的 Model, 指向 Model 的外鍵欄位)
+    COUNTERS = (
+        (Publisher, 'book_count', Book, 'publisher'),
+        (Author, 'book_count', Book.authors.through, 'author'),
+        (Book, 'favorite_count', ReadingList, 'book'),
+    )
+
+    @staticmethod
+    def adjust(model, ids, field, delta):
+        """
+        把指定資料的計數欄位加上 delta（原子更新）
+
+        Args:
+            model: Model 類別
+            ids: 主鍵列表
+            field: 計數欄位名稱
+            delta: 增減數量
+        """
+        ids = [pk for pk in ids if pk is not None]
+        if ids and delta:
+            model.objects.filter(pk__in=ids).update(**{field: F(field) + delta})
+
+    @staticmethod
+    def count_of(counted_model, fk_field):
+        """實際數量的子查詢（與 migration 0006 的 backfill_counters 相同）"""
+        return Coalesce(Subquery(
+            counted_model.objects.filter(**{fk_field: OuterRef('pk')})
+            .order_by()
+            .values(fk_field)
+            .annotate(total=Count('pk'))
+            .values('total')
+        ), 0)
+
+    @classmethod
+    def reconcile(cls):
+        """
+        重新計算所有計數欄位，修正與實際數量不一致的資料
+
+        每個計數欄位只有一個 UPDATE ... SET 欄位 = (子查詢)：數量在資料庫中計算並寫入，
+        不會像「先讀出數量、之後再寫回」一樣覆蓋中間其他請求以 F() 做的加減
+
+        Returns:
+            dict: {'Publisher.book_count': 修正筆數, ...}
+        """
+        repaired = {}
+        for model, field, counted_model, fk_field in cls.COUNTERS:
+            actual = cls.count_of(counted_model, fk_field)
+            drifted = model.objects.exclude(**{field: actual}).update(**{field: actual})
+
+            label = f'{model.__name__}.{field}'
+            repaired[label] = drifted
+            if drifted:
+                print(f"[Counter] 修正 {label}：{drifted} 筆")
+
+        return repaired
@@ -0,0 +1,72 @@
+"""
+使用者收藏（閱讀清單）快取服務
+
+每個使用者的收藏書籍 ID 存成一個帶版本號的快取項目：
+1. 閱讀清單有變動時（Signal），版本號 +1 並直接寫入最新的 ID 列表
+2. 讀取時找不到（過期或 Redis 被清空）才從資料庫重建
+"""
+from django.core.cache import cache
+
+from apps.library.models import ReadingList
+from .versioning import VersionCounter
+
+
+class FavoritesCache:
+    """使用者收藏的版本號（每個使用者各自一個）"""
+
+    VERSION_KEY = 'library:favorites_version:{user_id}'
+
+    # 使用者的版本號放 30 天，過期後會以新的時間戳記重新開始，不會與舊值重複
+    VERSION_TIMEOUT = 60 * 60 * 24 * 30
+
+    # 收藏 ID 列表的快取 key（依版本號區分）
+    IDS_KEY = 'library:favorites:{user_id}:v{version}'
+
+    @classmethod
+    def _counter(cls, user_id):
+        return VersionCounter(cls.VERSION_KEY.format(user_id=user_id), cls.VERSION_TIMEOUT)
+
+    @classmethod
+    def get_version(cls, user_id):
+        return cls._counter(user_id).get()
+
+    @classmethod
+    def bump_version(cls, user_id):
+        return cls._counter(user_id).bump()
+
+    @classmethod
+    def get_last_modified(cls, user_id):
+        return cls._counter(user_id).last_modified()
+
+    @classmethod
+    def get_ids(cls, user_id):
+        """
+        取得使用者收藏的書籍 ID
+
+        Returns:
+            list[int]: 書籍 ID（最新加入的在前面）
+        """
+        key = cls.IDS_KEY.format(user_id=user_id, version=cls.get_version(user_id))
+        book_ids = cache.get(key)
+        if book_ids is None:
+            print(f"[Cache MISS] {key}")
+            book_ids = cls._load_ids(user_id)
+            cache.set(key, book_ids, cls.VERSION_TIMEOUT)
+        return book_ids
+
+    @classmethod
+    def refresh(cls, user_id):
+        """
+        閱讀清單有變動時呼叫：版本號 +1，並寫入最新的收藏 ID
+
+        Returns:
+            int: 新的版本號
+        """
+        version = cls.bump_version(user_id)
+        key = cls.IDS_KEY.format(user_id=user_id, version=version)
+        cache.set(key, cls._load_ids(user_id), cls.VERSION_TIMEOUT)
+        return version
+
+    @staticmethod
+    def _load_ids(user_id):
+        return list(ReadingList.objects.filter(user_id=user_id).values_list('book_id', flat=True))
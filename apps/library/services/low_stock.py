@@ -0,0 +1,341 @@
+"""
+庫存不足清單服務
+
+原本每次庫存檢查都要查詢整個 Book 資料表，而且只要書籍一直缺貨，每次檢查都會重複通知。
+這裡改成在 Redis 中維護「目前庫存不足的書籍」：
+1. 有序集合 library:low_stock（成員為書籍 ID、分數為庫存），書籍異動合併處理時（BookChangeNotifier）順便更新
+2. 書籍「從正常變成不足」的那一刻（ZADD 新增成功）寫入跨越紀錄 library:low_stock:crossings（分數為 Redis 的時間）
+3. 每個定時檢查只讀取上次檢查之後的跨越紀錄：沒有新的缺貨書籍就不通知，同一本書不會重複警告
+4. 定時全量重建一次，修正 QuerySet.update、資料庫手動修改等沒有經過 Signal 的異動
+
+門檻可依書籍或出版社設定：書籍的 low_stock_threshold → 出版社的 low_stock_threshold → Book.LOW_STOCK_THRESHOLD
+"""
+import time
+
+from django.db.models import F, OuterRef, Subquery, Value
+from django.db.models.functions import Coalesce
+from django_redis import get_redis_connection
+
+from apps.library.models import Book, Publisher
+
+
+class LowStockService:
+    """庫存不足清單（Redis 有序集合）"""
+
+    # 目前庫存不足的書籍（成員：書籍 ID，分數：庫存）
+    SET_KEY = 'library:low_stock'
+
+    # 書籍變成庫存不足的時間（成員：書籍 ID，分數：CLOCK_SCRIPT 產生的時間，微秒）
+    CROSSED_KEY = 'library:low_stock:crossings'
+
+    # 各個定時檢查上次讀到的時間（微秒）
+    CURSOR_KEY = 'library:low_stock:crossings:cursor:{consumer}'
+
+    # 最後一次產生的時間（讓時間嚴格遞增）
+    CLOCK_KEY = 'library:low_stock:crossings:clock'
+
+    # 跨越紀錄保留時間（秒）：要比最長的檢查間隔（每週）長
+    CROSSED_RETENTION = 60 * 60 * 24 * 8
+
+    # 寫入跨越紀錄與移動讀取位置都以 Redis 的時鐘在 Lua 腳本中完成：
+    # 腳本依序執行，讀取端看到時間 T 時，分數不大於 T 的紀錄一定都已寫入；
+    # 不使用各個程序自己的時鐘，避免「先取時間、讀取端移動位置之後才寫入」的紀錄落在讀取位置之前而漏掉。
+    # 時間取 Redis TIME（微秒），並保證比上一次大（時鐘倒退或同一微秒內也不會重複）
+    CLOCK_SCRIPT = """
+local now = redis.call('TIME')
+local tick = tonumber(now[1]) * 1000000 + tonumber(now[2])
+local last = tonumber(redis.call('GET', KEYS[1]) or '0')
+if tick <= last then
+    tick = last + 1
+end
+redis.call('SET', KEYS[1], tick)
+"""
+
+    # KEYS: [CLOCK_KEY, CROSSED_KEY]，ARGV: 書籍 ID
+    RECORD_CROSSED_SCRIPT = CLOCK_SCRIPT + """
+for _, member in ipairs(ARGV) do
+    redis.call('ZADD', KEYS[2], tick, member)
+end
+return tick
+"""
+
+    # KEYS: [CLOCK_KEY, CROSSED_KEY, cursor]，回傳上次讀到之後的紀錄（第一次讀取時回傳全部）
+    TAKE_CROSSED_SCRIPT = CLOCK_SCRIPT + """
+local since = redis.call('GETSET', KEYS[3], tick)
+local min_score = since and ('(' .. since) or '-inf'
+return redis.call('ZRANGEBYSCORE', KEYS[2], min_score, tick)
+"""
+
+    # 通知訊息最多列出幾本書名
+    MESSAGE_TITLES = 5
+
+    # 重建時每批處理的書籍數量
+    CHUNK_SIZE = 2000
+
+    # 重建進行中的標記與這段期間增量更新過的書籍（重建完成後重新套用）
+    REBUILDING_KEY = 'library:low_stock:rebuilding'
+    REBUILD_DIRTY_KEY = 'library:low_stock:rebuild:dirty'
+    REBUILD_TIMEOUT = 60 * 10
+
+    @staticmethod
+    def _redis():
+        return get_redis_connection('default')
+
+    @staticmethod
+    def threshold_of(book):
+        """
+        書籍的庫存警告門檻
+
+        Args:
+            book: 已 select_related('publisher') 的 Book
+        """
+        if book.low_stock_threshold is not None:
+            return book.low_stock_threshold
+        if book.publisher is not None and book.publisher.low_stock_threshold is not None:
+            return book.publisher.low_stock_threshold
+        return Book.LOW_STOCK_THRESHOLD
+
+    @staticmethod
+    def threshold_expression():
+        """
+        門檻的資料庫運算式（與 threshold_of 相同的順序；重建、列表篩選與統計共用）
+
+        出版社的門檻以子查詢（依主鍵）取得：直接寫 publisher__low_stock_threshold 時，
+        在 filter() 中會變成 INNER JOIN，沒有出版社的書籍會被排除
+        """
+        return Coalesce(
+            F('low_stock_threshold'),
+            Subquery(
+                Publisher.objects.filter(pk=OuterRef('publisher_id')).values('low_stock_threshold')[:1]
+            ),
+            Value(Book.LOW_STOCK_THRESHOLD),
+        )
+
+    @classmethod
+    def is_low(cls, book):
+        """書籍目前是否庫存不足（已 select_related('publisher')）"""
+        return book.stock < cls.threshold_of(book)
+
+    @staticmethod
+    def max_threshold_queryset(model):
+        """某個 Model 自訂門檻的最大值（依 low_stock_threshold 索引取第一筆）"""
+        return (
+            model.objects.filter(low_stock_threshold__isnull=False)
+            .order_by('-low_stock_threshold')
+            .values_list('low_stock_threshold', flat=True)[:1]
+        )
+
+    @classmethod
+    def max_threshold(cls):
+        """所有書籍、出版社門檻中的最大值：庫存不低於這個數字的書籍一定不是庫存不足"""
+        return max(
+            Book.LOW_STOCK_THRESHOLD,
+            cls.max_threshold_queryset(Book).first() or 0,
+            cls.max_threshold_queryset(Publisher).first() or 0,
+        )
+
+    @classmethod
+    def low_stock_queryset(cls):
+        """
+        以資料庫計算目前庫存不足的書籍（重建時使用）
+
+        門檻依書籍、出版社而不同，無法直接建索引；
+        先以 stock < 最大門檻 走 (stock, id) 索引的範圍掃描，只對這些書籍比較各自的門檻
+        """
+        return Book.objects.filter(stock__lt=cls.max_threshold()).alias(
+            threshold=cls.threshold_expression(),
+        ).filter(stock__lt=F('threshold'))
+
+    # ==========================================
+    # 增量更新
+    # ==========================================
+
+    @classmethod
+    def sync(cls, books=(), deleted_ids=(), record_crossed=True):
+        """
+        依書籍目前的資料更新庫存不足清單
+
+        Args:
+            books: 已 select_related('publisher') 的 Book
+            deleted_ids: 已刪除的書籍 ID
+            record_crossed: 是否寫入跨越紀錄（重建後重新套用時不重複寫入）
+
+        Returns:
+            list[int]: 這次變成庫存不足的書籍 ID
+        """
+        books = list(books)
+        if not books and not deleted_ids:
+            return []
+
+        low = [book for book in books if cls.is_low(book)]
+        recovered = [book.id for book in books if not cls.is_low(book)]
+        removed = recovered + list(deleted_ids)
+
+        redis = cls._redis()
+        pipe = redis.pipeline()
+
+        # 重建進行中：記下這些書籍，重建換上新清單後重新套用，避免這次的更新被 RENAME 蓋掉
+        skip = 0
+        if redis.exists(cls.REBUILDING_KEY):
+            pipe.sadd(cls.REBUILD_DIRTY_KEY, *[book.id for book in low], *removed)
+            pipe.expire(cls.REBUILD_DIRTY_KEY, cls.REBUILD_TIMEOUT)
+            skip = 2
+
+        # ZADD 每本書各下一次，回傳值為 1 表示「原本不在清單中」，也就是剛跨過門檻
+        for book in low:
+            pipe.zadd(cls.SET_KEY, {book.id: book.stock})
+        if removed:
+            pipe.zrem(cls.SET_KEY, *removed)
+        results = pipe.execute()[skip:]
+
+        crossed = [book.id for book, added in zip(low, results) if added]
+        if record_crossed:
+            cls._record_crossed(redis, crossed)
+        return crossed
+
+    @classmethod
+    def sync_ids(cls, book_ids, record_crossed=True):
+        """
+        依書籍 ID 重新讀取資料後更新（出版社門檻變更、重建後重新套用等情況）
+
+        Returns:
+            list[int]: 這次變成庫存不足的書籍 ID
+        """
+        book_ids = list(book_ids)
+        crossed = []
+        for start in range(0, len(book_ids), cls.CHUNK_SIZE):
+            chunk = book_ids[start:start + cls.CHUNK_SIZE]
+            books = Book.objects.select_related('publisher').in_bulk(chunk)
+            crossed += cls.sync(
+                books.values(),
+                [book_id for book_id in chunk if book_id not in books],
+                record_crossed,
+            )
+        return crossed
+
+    @classmethod
+    def _record_crossed(cls, redis, book_ids):
+        if book_ids:
+            redis.eval(cls.RECORD_CROSSED_SCRIPT, 2, cls.CLOCK_KEY, cls.CROSSED_KEY, *book_ids)
+            print(f"[LowStock] {len(book_ids)} 本書籍變成庫存不足")
+
+    # ==========================================
+    # 全量重建
+    # ==========================================
+
+    @classmethod
+    def rebuild(cls):
+        """
+        以資料庫重新計算整個清單（定時執行）
+
+        重建前不在清單中的書籍視為新的缺貨（可能是沒有經過 Signal 的異動），同樣寫入跨越紀錄
+
+        讀取資料庫到 RENAME 之間，BookChangeNotifier 仍會增量更新舊的清單，這些更新會被 RENAME 蓋掉；
+        重建期間 sync 會記下更新過的書籍，換上新清單後依資料庫目前的狀態重新套用
+        （跨越紀錄已經在當時寫入，重新套用時不再重複寫入）
+
+        Returns:
+            dict: {'total': 庫存不足的書籍數量, 'crossed': 新增的數量}
+        """
+        redis = cls._redis()
+        temp_key = f'{cls.SET_KEY}:rebuild'
+        redis.delete(temp_key, cls.REBUILD_DIRTY_KEY)
+        redis.set(cls.REBUILDING_KEY, 1, ex=cls.REBUILD_TIMEOUT)
+
+        rows = cls.low_stock_queryset().values_list('id', 'stock').iterator(chunk_size=cls.CHUNK_SIZE)
+        chunk = {}
+        for book_id, stock in rows:
+            chunk[book_id] = stock
+            if len(chunk) >= cls.CHUNK_SIZE:
+                redis.zadd(temp_key, chunk)
+                chunk = {}
+        if chunk:
+            redis.zadd(temp_key, chunk)
+
+        # 找出原本不在清單中的書籍
+        previous = {int(member) for member in redis.zrange(cls.SET_KEY, 0, -1)}
+        current = {int(member) for member in redis.zrange(temp_key, 0, -1)}
+        crossed = sorted(current - previous)
+
+        # 以 RENAME 一次換上新的清單（沒有任何缺貨書籍時 temp_key 不存在）
+        if current:
+            redis.rename(temp_key, cls.SET_KEY)
+        else:
+            redis.delete(cls.SET_KEY)
+
+        cls._record_crossed(redis, crossed)
+
+        # 重新套用重建期間增量更新過的書籍
+        pipe = redis.pipeline()
+        pipe.smembers(cls.REBUILD_DIRTY_KEY)
+        pipe.delete(cls.REBUILD_DIRTY_KEY, cls.REBUILDING_KEY)
+        dirty_ids = sorted(int(member) for member in pipe.execute()[0])
+        if dirty_ids:
+            cls.sync_ids(dirty_ids, record_crossed=False)
+
+        # 順便清除過期的跨越紀錄（分數單位為微秒）
+        redis.zremrangebyscore(
+            cls.CROSSED_KEY, '-inf', int((time.time() - cls.CROSSED_RETENTION) * 1_000_000)
+        )
+
+        print(f"[LowStock] 重建完成：{len(current)} 本庫存不足，新增 {len(crossed)} 本")
+        return {'total': len(current), 'crossed': len(crossed)}
+
+    # ==========================================
+    # 讀取
+    # ==========================================
+
+    @classmethod
+    def count(cls):
+        """目前庫存不足的書籍數量"""
+        return cls._redis().zcard(cls.SET_KEY)
+
+    @classmethod
+    def lowest_ids(cls, limit):
+        """庫存最少的幾本書籍 ID"""
+        return [int(member) for member in cls._redis().zrange(cls.SET_KEY, 0, limit - 1)]
+
+    @classmethod
+    def take_new_crossings(cls, consumer):
+        """
+        取得某個定時檢查上次讀取之後，新變成庫存不足（而且目前仍不足）的書籍
+
+        Args:
+            consumer: 定時檢查的名稱（每個名稱各自記錄讀到哪裡）
+
+        Returns:
+            list[int]: 書籍 ID（依變成缺貨的時間排序）
+        """
+        redis = cls._redis()
+        cursor_key = cls.CURSOR_KEY.format(consumer=consumer)
+
+        # 在同一個腳本中移動讀取位置並取回上次之後的紀錄（第一次檢查時讀取全部紀錄）
+        crossed = redis.eval(cls.TAKE_CROSSED_SCRIPT, 3, cls.CLOCK_KEY, cls.CROSSED_KEY, cursor_key)
+        if not crossed:
+            return []
+
+        # 已經補貨的書籍不需要通知
+        pipe = redis.pipeline()
+        for member in crossed:
+            pipe.zscore(cls.SET_KEY, member)
+        return [int(member) for member, score in zip(crossed, pipe.execute()) if score is not None]
+
+    @classmethod
+    def build_message(cls, book_ids, total=None):
+        """
+        組出庫存警告訊息（只查詢要列出書名的幾本書）
+
+        Args:
+            book_ids: 要通知的書籍 ID
+            total: 書籍總數（預設為 book_ids 的數量）
+
+        Returns:
+            str
+        """
+        total = len(book_ids) if total is None else total
+        shown = list(book_ids)[:cls.MESSAGE_TITLES]
+        books = Book.objects.in_bulk(shown)
+        book_titles = [books[book_id].title for book_id in shown if book_id in books]
+        if total > len(book_titles):
+            return f'庫存警告：{", ".join(book_titles)} 等 {total} 本書籍庫存不足！'
+        return f'庫存警告：{", ".join(book_titles)} 庫存不足！'
@@ -0,0 +1,146 @@
+"""
+熱門查詢的執行計畫檢查
+
+登記專案中最常執行的 QuerySet，對每一個執行 EXPLAIN，
+如果資料表筆數超過門檻卻整張表掃描（沒有用到索引），就視為失敗。
+部署前執行 `python manage.py explain_hot_queries`，在上線前發現缺少索引的查詢。
+"""
+import re
+
+from django.apps import apps
+from django.db import connection
+
+from apps.library.models import Book, BookChange, Publisher, ReadingList
+from .book_list import BookListService
+from .change_feed import BookChangeFeed
+from .low_stock import LowStockService
+
+
+class QueryPlanAudit:
+    """熱門查詢的執行計畫檢查"""
+
+    # 資料表筆數超過這個數量時，整張表掃描才算失敗（小表掃描比走索引還快）
+    DEFAULT_MAX_SCAN_ROWS = 1000
+
+    # 執行計畫中代表整張表掃描的寫法
+    # SQLite：「SCAN library_book」（有 USING INDEX 表示走索引）
+    # PostgreSQL：「Seq Scan on library_book」
+    SQLITE_SCAN_RE = re.compile(r'\bSCAN (\w+)(?! USING (?:COVERING )?INDEX)(?!\w)')
+    POSTGRES_SCAN_RE = re.compile(r'Seq Scan on (\w+)')
+
+    # 執行計畫中代表「取出全部結果後再排序」的寫法
+    SQLITE_SORT_MARK = 'USE TEMP B-TREE FOR ORDER BY'
+    POSTGRES_SORT_RE = re.compile(r'\bSort\b')
+
+    @classmethod
+    def hot_queries(cls):
+        """
+        登記的熱門查詢
+
+        Returns:
+            list[tuple[str, QuerySet]]: (名稱, QuerySet)
+        """
+        sample_user_id = 1
+        sample_publisher_id = 1
+        list_params = BookListService.parse_params({})
+
+        queries = [
+            # 庫存不足清單重建（LowStockService.rebuild）
+            ('low_stock_books', LowStockService.low_stock_queryset()),
+            ('low_stock_max_book_threshold', LowStockService.max_threshold_queryset(Book)),
+            # 我的閱讀清單（MyReadingListView）
+            ('my_reading_list', ReadingList.objects.filter(
+                user_id=sample_user_id
+            ).select_related('book', 'book__publisher')),
+            # 使用者收藏 ID（FavoritesCache）
+            ('favorite_book_ids', ReadingList.objects.filter(
+                user_id=sample_user_id
+            ).values_list('book_id', flat=True)),
+            # 出版社名稱重複檢查（PublisherCreateView / PublisherEditView）
+            ('publisher_name_exists', Publisher.objects.filter(name='sample')),
+            # 出版社的書籍數量（PublisherListView / PublisherDeleteView）
+            ('publisher_books', Book.objects.filter(publisher_id=sample_publisher_id)),
+            # 書籍異動紀錄（BookChangeFeed）
+            ('book_changes', BookChange.objects.filter(seq__gt=0).order_by('seq')[:BookChangeFeed.DEFAULT_LIMIT]),
+        ]
+
+        # 書籍列表 API 每一種排序的第一頁與下一頁
+        for sort in BookListService.SORT_FIELDS:
+            for direction in ('', '-'):
+                params = {**list_params, 'sort': f'{direction}{sort}'}
+                queries.append((f'book_list_sort_{direction}{sort}', BookListService.get_page_queryset(params)))
+                cursor = BookListService.encode_cursor(0 if sort != 'title' else '', 1)
+                params = {**params, 'cursor': cursor}
+                queries.append((
+                    f'book_list_sort_{direction}{sort}_next_page',
+                    BookListService.get_page_queryset(params),
+                ))
+
+        return queries
+
+    @classmethod
+    def run(cls, max_scan_rows=None, names=None):
+        """
+        執行所有登記查詢的 EXPLAIN
+
+        Args:
+            max_scan_rows: 整張表掃描允許的資料表筆數上限
+            names: 只檢查指定名稱的查詢
+
+        Returns:
+            list[dict]: 每個查詢的結果 {'name', 'sql', 'plan', 'full_scans', 'bounded', 'failed'}
+        """
+        max_scan_rows = cls.DEFAULT_MAX_SCAN_ROWS if max_scan_rows is None else max_scan_rows
+        table_rows = {}
+        results = []
+
+        for name, queryset in cls.hot_queries():
+            if names and name not in names:
+                continue
+
+            plan = queryset.explain()
+            full_scans = []
+            for table in cls.find_full_scans(plan):
+                if table not in table_rows:
+                    table_rows[table] = cls.count_rows(table)
+                full_scans.append((table, table_rows[table]))
+
+            # 有 LIMIT 且不需要另外排序：依索引順序掃描，取到足夠筆數就停止
+            bounded = queryset.query.high_mark is not None and not cls.has_sort(plan)
+
+            results.append({
+                'name': name,
+                'sql': str(queryset.query),
+                'plan': plan,
+                'full_scans': full_scans,
+                'bounded': bounded,
+                'failed': not bounded and any(rows > max_scan_rows for _, rows in full_scans),
+            })
+
+        return results
+
+    @classmethod
+    def find_full_scans(cls, plan):
+        """
+        從執行計畫找出整張表掃描的資料表
+
+        Returns:
+            list[str]: 資料表名稱
+        """
+        pattern = cls.POSTGRES_SCAN_RE if connection.vendor == 'postgresql' else cls.SQLITE_SCAN_RE
+        return list(dict.fromkeys(pattern.findall(plan)))
+
+    @classmethod
+    def has_sort(cls, plan):
+        """執行計畫是否需要把結果全部取出後再排序"""
+        if connection.vendor == 'postgresql':
+            return bool(cls.POSTGRES_SORT_RE.search(plan))
+        return cls.SQLITE_SORT_MARK in plan
+
+    @staticmethod
+    def count_rows(table):
+        """資料表筆數（找不到對應的 Model 時回傳 0）"""
+        for model in apps.get_models():
+            if model._meta.db_table == table:
+                return model._default_manager.count()
+        return 0
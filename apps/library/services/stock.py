@@ -0,0 +1,134 @@
+"""
+庫存批次調整服務
+
+編輯表單是「讀出庫存 → 修改 → save()」，兩位同仁同時進貨時後存的會蓋掉先存的。
+這裡改成只送「增減量」：
+1. 同一批的調整在一個交易中完成，先以 select_for_update 鎖定書籍（依 ID 排序，避免互相等待造成死結）
+2. 檢查調整後不會變成負數，有任何一本不符合就整批拒絕
+3. 以一次 UPDATE ... SET stock = CASE id WHEN ... THEN stock + delta END 寫入（資料庫端計算，不會覆蓋其他人的更新）
+4. QuerySet.update 不會觸發 Signal，另外寫入異動紀錄並交給 BookChangeNotifier，commit 後合併成一次快取更新與廣播
+"""
+from django.db import transaction
+from django.db.models import Case, F, IntegerField, When
+
+from apps.library.models import Book, BookChange
+from .change_feed import BookChangeFeed
+from .change_notifier import BookChangeNotifier
+
+
+class StockAdjustmentError(Exception):
+    """庫存調整失敗（整批不會寫入）；status 為建議回應的 HTTP 狀態碼"""
+
+    def __init__(self, message, details=None, status=400):
+        super().__init__(message)
+        self.message = message
+        self.details = details or []
+        self.status = status
+
+
+class StockAdjustmentService:
+    """庫存批次調整"""
+
+    # 每批最多幾筆調整
+    MAX_BATCH_SIZE = 1000
+
+    # 單筆增減量的上限（絕對值），避免輸入錯誤一次灌入或扣光大量庫存
+    MAX_DELTA = 10000
+
+    @classmethod
+    def parse(cls, adjustments):
+        """
+        驗證並合併調整資料（同一本書出現多次時增減量相加）
+
+        Args:
+            adjustments: [{'book_id': 1, 'delta': 5}, ...]
+
+        Returns:
+            dict: {book_id: delta}
+
+        Raises:
+            StockAdjustmentError: 資料格式錯誤
+        """
+        if not isinstance(adjustments, list) or not adjustments:
+            raise StockAdjustmentError('adjustments 必須是非空的列表')
+        if len(adjustments) > cls.MAX_BATCH_SIZE:
+            raise StockAdjustmentError(f'每次最多調整 {cls.MAX_BATCH_SIZE} 筆')
+
+        deltas = {}
+        for index, item in enumerate(adjustments):
+            if not isinstance(item, dict):
+                raise StockAdjustmentError(f'第 {index + 1} 筆格式錯誤')
+            book_id, delta = item.get('book_id'), item.get('delta')
+            # bool 是 int 的子類別，要另外排除
+            if not all(isinstance(value, int) and not isinstance(value, bool) for value in (book_id, delta)):
+                raise StockAdjustmentError(f'第 {index + 1} 筆的 book_id 與 delta 必須是整數')
+            if abs(delta) > cls.MAX_DELTA:
+                raise StockAdjustmentError(f'第 {index + 1} 筆的 delta 不可超過 ±{cls.MAX_DELTA}')
+            deltas[book_id] = deltas.get(book_id, 0) + delta
+
+        # 增減相抵為 0 的不需要寫入
+        return {book_id: delta for book_id, delta in deltas.items() if delta}
+
+    @classmethod
+    def apply(cls, adjustments):
+        """
+        套用一批庫存調整（全部成功或全部不寫入）
+
+        Args:
+            adjustments: [{'book_id': 1, 'delta': 5}, ...]
+
+        Returns:
+            dict: {book_id: 調整後庫存}
+
+        Raises:
+            StockAdjustmentError: 資料錯誤、書籍不存在或庫存會變成負數
+        """
+        deltas = cls.parse(adjustments)
+        if not deltas:
+            return {}
+
+        with transaction.atomic():
+            # 1. 鎖定這批書籍，取得目前的庫存
+            rows = {
+                book_id: (title, stock)
+                for book_id, title, stock in (
+                    Book.objects.select_for_update()
+                    .filter(id__in=deltas)
+                    .order_by('id')
+                    .values_list('id', 'title', 'stock')
+                )
+            }
+
+            # 2. 檢查書籍是否存在、調整後是否為負數
+            missing = sorted(set(deltas) - set(rows))
+            if missing:
+                raise StockAdjustmentError(
+                    '書籍不存在',
+                    [{'book_id': book_id} for book_id in missing],
+                    status=404,
+                )
+
+            negative = [
+                {'book_id': book_id, 'title': title, 'stock': stock, 'delta': deltas[book_id]}
+                for book_id, (title, stock) in rows.items()
+                if stock + deltas[book_id] < 0
+            ]
+            if negative:
+                raise StockAdjustmentError('庫存不足，整批調整未套用', negative, status=409)
+
+            # 3. 一次 UPDATE 寫入所有書籍
+            Book.objects.filter(id__in=deltas).update(stock=Case(
+                *[When(id=book_id, then=F('stock') + delta) for book_id, delta in deltas.items()],
+                output_field=IntegerField(),
+            ))
+
+            # 4. 寫入異動紀錄，commit 後合併成一次快取更新與廣播
+            for change in BookChangeFeed.record_many(BookChange.Action.UPDATE, list(deltas)):
+                BookChangeNotifier.add(change.action, change.book_id, rows[change.book_id][0], change.id)
+
+        print(f"[Stock] 已調整 {len(deltas)} 本書籍的庫存")
+
+        return {
+            book_id: stock + deltas[book_id]
+            for book_id, (_, stock) in rows.items()
+        }
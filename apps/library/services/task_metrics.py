@@ -0,0 +1,184 @@
+"""
+Celery 任務統計
+
+背景任務原本只有 print，無法分辨警告變慢是因為佇列塞車還是查詢本身變慢。
+這裡透過 Celery Signal（見 apps/library/task_signals.py）記錄每個任務的：
+1. 排隊時間：送出任務到 worker 開始執行（有 countdown / eta 的任務從預定時間起算）
+2. 執行時間
+3. 執行結果（成功 / 失敗 / 重試）
+4. 任務自己的數量：匯出、匯入的書籍筆數，通知的使用者人數
+
+數值以直方圖（累計分桶）存在 Redis，所有 worker 程序共用，
+輸出成 Prometheus 文字格式：GET /metrics/ 或 `python manage.py dump_task_metrics`
+"""
+import math
+from collections import defaultdict
+
+from django_redis import get_redis_connection
+
+
+class TaskMetrics:
+    """Celery 任務統計（Redis）"""
+
+    # 每個統計項目一個 hash：library:metrics:{name}
+    KEY_PREFIX = 'library:metrics'
+
+    # 時間分桶（秒）
+    TIME_BUCKETS = (0.01, 0.05, 0.1, 0.5, 1, 5, 10, 30, 60, 300, 900, 1800)
+
+    # 數量分桶（筆數、人數）
+    COUNT_BUCKETS = (1, 10, 100, 1000, 10000, 100000, 1000000)
+
+    # 統計項目：名稱 → (說明, 類型, 分桶)
+    METRICS = {
+        'celery_task_queue_wait_seconds': ('任務從送出到開始執行的等待時間', 'histogram', TIME_BUCKETS),
+        'celery_task_runtime_seconds': ('任務執行時間', 'histogram', TIME_BUCKETS),
+        'celery_task_runs_total': ('任務執行次數（依結果分類）', 'counter', None),
+        'celery_task_rows_processed': ('每次任務處理的書籍筆數', 'histogram', COUNT_BUCKETS),
+        'celery_task_users_notified': ('每次任務通知的使用者人數', 'histogram', COUNT_BUCKETS),
+    }
+
+    # 任務回傳值中的數量 → 統計項目
+    TASK_COUNTERS = {
+        'apps.library.tasks.export_books_to_csv': {'total_books': 'celery_task_rows_processed'},
+        'apps.library.tasks.import_books': {'processed': 'celery_task_rows_processed'},
+        'apps.library.tasks.send_low_stock_alerts': {'sent': 'celery_task_users_notified'},
+    }
+
+    @staticmethod
+    def _redis():
+        return get_redis_connection('default')
+
+    @classmethod
+    def _key(cls, name):
+        return f'{cls.KEY_PREFIX}:{name}'
+
+    @staticmethod
+    def _labels(labels):
+        """{'task': 'x'} → 'task="x"'（依名稱排序，值中的反斜線、引號、換行需跳脫）"""
+        return ','.join(
+            '{}="{}"'.format(
+                name, str(value).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+            )
+            for name, value in sorted(labels.items())
+        )
+
+    # ==========================================
+    # 記錄
+    # ==========================================
+
+    @classmethod
+    def observe(cls, name, value, pipe=None, **labels):
+        """
+        記錄一個直方圖數值
+
+        每個數值只累加到第一個包含它的分桶，輸出時再轉成 Prometheus 的累計分桶
+
+        Args:
+            name: 統計項目名稱（METRICS）
+            value: 數值
+            pipe: Redis pipeline（一次寫入多個數值時共用）
+            **labels: 標籤（例如 task、queue）
+        """
+        buckets = cls.METRICS[name][2]
+        label_str = cls._labels(labels)
+        bucket = next((le for le in buckets if value <= le), '+Inf')
+
+        target = pipe if pipe is not None else cls._redis().pipeline()
+        key = cls._key(name)
+        target.hincrby(key, f'{label_str}|bucket|{bucket}', 1)
+        target.hincrbyfloat(key, f'{label_str}|sum', value)
+        target.hincrby(key, f'{label_str}|count', 1)
+        if pipe is None:
+            target.execute()
+
+    @classmethod
+    def increment(cls, name, amount=1, pipe=None, **labels):
+        """累加計數器"""
+        target = pipe if pipe is not None else cls._redis()
+        target.hincrby(cls._key(name), f'{cls._labels(labels)}|total', amount)
+
+    @classmethod
+    def record_run(cls, task_name, queue, state, runtime, wait=None, retval=None):
+        """
+        記錄一次任務執行（task_postrun 時呼叫）
+
+        Args:
+            task_name: 任務名稱
+            queue: 佇列名稱
+            state: 執行結果（SUCCESS / FAILURE / RETRY）
+            runtime: 執行時間（秒）
+            wait: 排隊時間（秒，沒有送出時間時為 None）
+            retval: 任務回傳值（取出 TASK_COUNTERS 登記的數量）
+        """
+        pipe = cls._redis().pipeline()
+        if wait is not None:
+            cls.observe('celery_task_queue_wait_seconds', max(wait, 0), pipe, task=task_name, queue=queue)
+        cls.observe('celery_task_runtime_seconds', runtime, pipe, task=task_name, queue=queue)
+        cls.increment('celery_task_runs_total', pipe=pipe, task=task_name, state=state)
+
+        if isinstance(retval, dict):
+            for field, name in cls.TASK_COUNTERS.get(task_name, {}).items():
+                if isinstance(retval.get(field), int):
+                    cls.observe(name, retval[field], pipe, task=task_name)
+
+        pipe.execute()
+
+    # ==========================================
+    # 輸出
+    # ==========================================
+
+    @classmethod
+    def render(cls):
+        """
+        輸出所有統計（Prometheus 文字格式）
+
+        Returns:
+            str
+        """
+        redis = cls._redis()
+        pipe = redis.pipeline()
+        for name in cls.METRICS:
+            pipe.hgetall(cls._key(name))
+
+        lines = []
+        for (name, (help_text, metric_type, buckets)), values in zip(cls.METRICS.items(), pipe.execute()):
+            lines.append(f'# HELP {name} {help_text}')
+            lines.append(f'# TYPE {name} {metric_type}')
+
+            # 依標籤分組：{label_str: {'bucket|0.1': 3, 'sum': 1.2, 'count': 5, ...}}
+            series = defaultdict(dict)
+            for field, value in values.items():
+                label_str, _, part = field.decode().partition('|')
+                series[label_str][part] = float(value)
+
+            for label_str in sorted(series):
+                fields = series[label_str]
+                if metric_type == 'counter':
+                    lines.append(cls._sample(name, label_str, fields.get('total', 0)))
+                    continue
+
+                cumulative = 0
+                for le in buckets:
+                    cumulative += fields.get(f'bucket|{le}', 0)
+                    lines.append(cls._sample(f'{name}_bucket', cls._join(label_str, f'le="{le}"'), cumulative))
+                lines.append(cls._sample(f'{name}_bucket', cls._join(label_str, 'le="+Inf"'), fields.get('count', 0)))
+                lines.append(cls._sample(f'{name}_sum', label_str, fields.get('sum', 0)))
+                lines.append(cls._sample(f'{name}_count', label_str, fields.get('count', 0)))
+
+        return '\n'.join(lines) + '\n'
+
+    @staticmethod
+    def _join(*label_strs):
+        return ','.join(part for part in label_strs if part)
+
+    @staticmethod
+    def _sample(name, label_str, value):
+        if math.isfinite(value) and value == int(value):
+            value = int(value)
+        return f'{name}{{{label_str}}} {value}' if label_str else f'{name} {value}'
+
+    @classmethod
+    def reset(cls):
+        """清除所有統計"""
+        cls._redis().delete(*(cls._key(name) for name in cls.METRICS))
@@ -0,0 +1,98 @@
+"""
+個人 WebSocket 通知服務
+
+匯出完成、個人庫存警告等只跟某位使用者有關的訊息，不再送到所有人都在的 'book_updates' 群組，
+而是送到使用者自己的群組（BookListConsumer 連線時依登入身分加入），
+並在送出前依 UserPreference.browser_notification 排除關閉瀏覽器通知的使用者
+"""
+from asgiref.sync import async_to_sync
+from channels.layers import get_channel_layer
+
+from apps.accounts.models import UserPreference
+from .broadcast import BroadcastDispatcher
+
+
+class UserNotifier:
+    """個人 WebSocket 通知"""
+
+    # 個人群組名稱
+    GROUP_NAME = 'user_{user_id}'
+
+    # 大量發送時每批（每個背景任務）負責的使用者數量
+    FANOUT_BATCH_SIZE = 1000
+
+    @classmethod
+    def group_name(cls, user_id):
+        return cls.GROUP_NAME.format(user_id=user_id)
+
+    @staticmethod
+    def filter_enabled(user_ids):
+        """
+        排除關閉瀏覽器通知的使用者（沒有偏好設定的使用者預設為開啟）
+
+        Returns:
+            list[int]
+        """
+        user_ids = list(dict.fromkeys(user_id for user_id in user_ids if user_id is not None))
+        if not user_ids:
+            return []
+
+        disabled = set(
+            UserPreference.objects.filter(user_id__in=user_ids, browser_notification=False)
+            .values_list('user_id', flat=True)
+        )
+        return [user_id for user_id in user_ids if user_id not in disabled]
+
+    @classmethod
+    def send(cls, user_ids, action, message, **payload):
+        """
+        發送個人通知
+
+        Args:
+            user_ids: 接收通知的使用者 ID
+            action: 動作類型（例如 'export_complete'、'low_stock_warning'）
+            message: 顯示給使用者的訊息
+            **payload: 附加資料
+
+        Returns:
+            list[int]: 實際送出通知的使用者 ID
+        """
+        recipients = cls.filter_enabled(user_ids)
+        for user_id in recipients:
+            BroadcastDispatcher.send(cls.group_name(user_id), {
+                'type': 'book_update',
+                'action': action,
+                'message': message,
+                **payload,
+            })
+
+        if recipients:
+            print(f"[Notify] 已排入個人通知: {action} → 使用者 {recipients}")
+        return recipients
+
+    @classmethod
+    def send_batch(cls, user_ids, action, message, **payload):
+        """
+        背景任務大量發送個人通知
+
+        不經過有上限的派送佇列（一次上千則會被丟棄），而是在同一個 event loop 中逐一送出；
+        呼叫端須自行排除關閉瀏覽器通知的使用者
+
+        Returns:
+            int: 送出的通知數量
+        """
+        channel_layer = get_channel_layer()
+        event = {
+            'type': 'book_update',
+            'action': action,
+            'message': message,
+            **payload,
+        }
+
+        async def send_all():
+            for user_id in user_ids:
+                await channel_layer.group_send(cls.group_name(user_id), event)
+
+        async_to_sync(send_all)()
+        print(f"[Notify] 已發送個人通知: {action} → {len(user_ids)} 位使用者")
+        return len(user_ids)
@@ -0,0 +1,66 @@
+"""
+快取版本號工具
+
+用一個整數版本號代表「某份資料目前的世代」，資料變動時只需要 +1，
+並記錄最後修改時間（提供 HTTP Last-Modified 使用）
+"""
+import time
+from datetime import datetime, timezone
+
+from django.core.cache import cache
+
+
+class VersionCounter:
+    """存放在快取中的版本號"""
+
+    def __init__(self, key, timeout=None):
+        """
+        Args:
+            key: 版本號的快取 key
+            timeout: 版本號存活時間（秒），None 表示永不過期
+        """
+        self.key = key
+        self.modified_key = f'{key}:modified'
+        self.timeout = timeout
+
+    def get(self):
+        """
+        取得目前的版本號
+
+        Returns:
+            int: 版本號
+        """
+        version = cache.get(self.key)
+        if version is None:
+            # 以毫秒時間戳記當作初始值，即使 Redis 資料遺失，版本號也不會倒退回舊值
+            cache.add(self.key, int(time.time() * 1000), timeout=self.timeout)
+            version = cache.get(self.key)
+        return version
+
+    def bump(self):
+        """
+        版本號 +1 並記錄修改時間
+
+        Returns:
+            int: 新的版本號
+        """
+        try:
+            version = cache.incr(self.key)
+        except ValueError:
+            # 版本號不存在（第一次使用、過期或 Redis 被清空）
+            self.get()
+            version = cache.incr(self.key)
+        cache.set(self.modified_key, time.time(), timeout=self.timeout)
+        return version
+
+    def last_modified(self):
+        """
+        取得最後修改時間
+
+        Returns:
+            datetime | None: 從未記錄過時回傳 None
+        """
+        timestamp = cache.get(self.modified_key)
+        if timestamp is None:
+            return None
+        return datetime.fromtimestamp(timestamp, tz=timezone.utc)
@@ -6,37 +6,56 @@ Django Signal 處理 - 書籍資料變更時的自動處理
 2. 不會遺漏：任何地方修改 Book 都會觸發
 3. 集中管理：所有「資料變更後要做的事」都在這裡
 """
-from django.db.models.signals import post_save, post_delete
+from django.db import transaction
+from django.db.models.signals import m2m_changed, post_delete, post_init, post_save, pre_delete
 from django.dispatch import receiver
-from django.core.cache import cache
-from channels.layers import get_channel_layer
-from asgiref.sync import async_to_sync
 
+from .models.author import Author
 from .models.book import Book
+from .models.book_detail import BookDetail
+from .models.publisher import Publisher
+from .models.reading_list import ReadingList
+from .services import (
+    BookChangeFeed,
+    BookChangeNotifier,
+    BroadcastDispatcher,
+    BookFragmentCache,
+    BookSearchService,
+    CatalogCache,
+    CounterService,
+    FavoritesCache,
+    LowStockService,
+)
 
 
-def notify_book_update(action: str, message: str):
+def notify_book_update(action: str, message: str, **payload):
     """
     發送 WebSocket 通知給所有連線的客戶端
 
     Args:
-        action: 'create', 'update', 'delete'
+        action: 'create', 'update', 'delete'，多筆合併時為 'batch'
         message: 顯示給使用者的訊息
+        **payload: 附加資料（例如異動的書籍、目錄版本號），前端可直接更新畫面而不必重新查詢
     """
-    channel_layer = get_channel_layer()
-
-    # 發送訊息到 'book_updates' 群組
-    # async_to_sync 讓我們可以在同步程式碼中呼叫非同步函數
-    async_to_sync(channel_layer.group_send)(
+    # 放進派送佇列，由背景執行緒發送到 'book_updates' 群組，不阻塞寫入
+    BroadcastDispatcher.send(
         'book_updates',  # 群組名稱，要與 Consumer 中的一致
         {
             'type': 'book_update',  # 對應 Consumer 中的方法名稱
             'action': action,
             'message': message,
+            **payload,
         }
     )
 
-    print(f"[Signal] 已發送 WebSocket 通知: {action} - {message}")
+    print(f"[Signal] 已排入 WebSocket 通知: {action} - {message}")
+
+
+def schedule_search_index(book_ids):
+    """交易 commit 後重新建立這些書籍的搜尋索引"""
+    book_ids = list(book_ids)
+    if book_ids:
+        transaction.on_commit(lambda: BookSearchService.index_books(book_ids))
 
 
 @receiver(post_save, sender=Book)
@@ -49,15 +68,11 @@ def on_book_saved(sender, instance, created, **kwargs):
         instance: 被儲存的 Book 實例
         created: True 表示新增，False 表示更新
     """
-    # 1. 清除快取
-    cache.delete('api_book_list')
-    print(f"[Signal] 已清除快取: api_book_list")
+    # 1. 寫入異動紀錄（與書籍在同一個交易中）
+    change = BookChangeFeed.record('create' if created else 'update', instance.id)
 
-    # 2. 發送 WebSocket 通知
-    if created:
-        notify_book_update('create', f'新書上架：{instance.title}')
-    else:
-        notify_book_update('update', f'書籍已更新：{instance.title}')
+    # 2. 快取片段、目錄版本號與 WebSocket 通知合併後一次處理
+    BookChangeNotifier.add(change.action, instance.id, instance.title, change.id)
 
 
 @receiver(post_delete, sender=Book)
@@ -69,9 +84,164 @@ def on_book_deleted(sender, instance, **kwargs):
         sender: 發送信號的 Model（Book）
         instance: 被刪除的 Book 實例
     """
-    # 1. 清除快取
-    cache.delete('api_book_list')
-    print(f"[Signal] 已清除快取: api_book_list")
+    # 1. 寫入異動紀錄（與書籍在同一個交易中）
+    change = BookChangeFeed.record('delete', instance.id)
+
+    # 2. 快取片段、目錄版本號與 WebSocket 通知合併後一次處理
+    BookChangeNotifier.add(change.action, instance.id, instance.title, change.id)
+
+
+@receiver(post_save, sender=Publisher)
+def on_publisher_saved(sender, instance, created, **kwargs):
+    """
+    Publisher 儲存後觸發
+
+    書籍的快取片段與搜尋索引中含有出版社名稱，出版社改名時要更新該出版社所有書籍
+    """
+    if created:
+        return
+
+    book_ids = list(instance.books.values_list('id', flat=True))
+    if book_ids:
+        BookFragmentCache.delete_many(book_ids)
+        CatalogCache.bump_version()
+        schedule_search_index(book_ids)
+        # 出版社的庫存警告門檻可能改變，重新判斷旗下書籍
+        transaction.on_commit(lambda: LowStockService.sync_ids(book_ids))
+        print(f"[Signal] 已清除出版社 {instance.name} 的 {len(book_ids)} 本書籍快取片段")
+
+
+@receiver(post_save, sender=Author)
+def on_author_saved(sender, instance, created, **kwargs):
+    """作者改名時，更新該作者所有書籍的搜尋索引"""
+    if created:
+        return
+    schedule_search_index(instance.books.values_list('id', flat=True))
+
+
+@receiver(pre_delete, sender=Author)
+def on_author_deleting(sender, instance, **kwargs):
+    """作者刪除前記下他的書籍（刪除後關聯就不見了），commit 後更新搜尋索引"""
+    schedule_search_index(instance.books.values_list('id', flat=True))
+
+
+@receiver(m2m_changed, sender=Book.authors.through)
+def on_book_authors_changed(sender, instance, action, reverse, pk_set, **kwargs):
+    """
+    書籍與作者的關聯有變動時，更新搜尋索引
+
+    reverse=False 表示從書籍端修改（book.authors.add），反之為作者端（author.books.add）
+    """
+    if not reverse:
+        if action in ('post_add', 'post_remove', 'post_clear'):
+            schedule_search_index([instance.id])
+    elif action in ('post_add', 'post_remove'):
+        schedule_search_index(pk_set)
+    elif action == 'pre_clear':
+        # clear 之後就查不到原本的書籍，要在清除前記下來
+        schedule_search_index(instance.books.values_list('id', flat=True))
+
+
+@receiver(post_save, sender=BookDetail)
+@receiver(post_delete, sender=BookDetail)
+def on_book_detail_changed(sender, instance, **kwargs):
+    """書籍詳細資料（ISBN、簡介）變動時，更新搜尋索引"""
+    schedule_search_index([instance.book_id])
+
+
+@receiver(post_save, sender=ReadingList)
+@receiver(post_delete, sender=ReadingList)
+def on_reading_list_changed(sender, instance, **kwargs):
+    """
+    閱讀清單新增或移除後觸發
+
+    交易 commit 後更新該使用者的收藏快取（版本號 +1 並寫入最新的收藏 ID），
+    書籍列表 API 讀取收藏時不需要查詢資料庫，ETag 也會跟著改變
+    """
+    user_id = instance.user_id
+    transaction.on_commit(lambda: FavoritesCache.refresh(user_id))
+
+
+# ==========================================
+# 計數欄位維護（Publisher.book_count、Author.book_count、Book.favorite_count）
+# 以 F() 在資料庫端加減，漏掉的部分由定時任務 reconcile_counters 修正
+# ==========================================
+
+# 載入時沒有讀取出版社欄位（defer），無法判斷是否改變
+_UNKNOWN = object()
+
+
+@receiver(post_init, sender=Book)
+def remember_book_publisher(sender, instance, **kwargs):
+    """記下載入時的出版社，儲存時才知道出版社有沒有改變"""
+    # 不直接讀 instance.publisher_id，欄位被 defer 時會多一次查詢
+    instance._counter_publisher_id = instance.__dict__.get('publisher_id', _UNKNOWN)
+
+
+@receiver(post_save, sender=Book)
+def update_publisher_book_count(sender, instance, created, **kwargs):
+    """新增書籍或更換出版社時，調整出版社的書籍數量"""
+    old_publisher_id = getattr(instance, '_counter_publisher_id', _UNKNOWN)
+    new_publisher_id = instance.publisher_id
+
+    if created:
+        CounterService.adjust(Publisher, [new_publisher_id], 'book_count', 1)
+    elif old_publisher_id is not _UNKNOWN and old_publisher_id != new_publisher_id:
+        CounterService.adjust(Publisher, [old_publisher_id], 'book_count', -1)
+        CounterService.adjust(Publisher, [new_publisher_id], 'book_count', 1)
+
+    instance._counter_publisher_id = new_publisher_id
+
+
+@receiver(pre_delete, sender=Book)
+def remember_book_authors(sender, instance, **kwargs):
+    """刪除前記下書籍的作者（刪除後關聯就不見了）"""
+    instance._counter_author_ids = list(instance.authors.values_list('id', flat=True))
+
+
+@receiver(post_delete, sender=Book)
+def update_counts_on_book_deleted(sender, instance, **kwargs):
+    """刪除書籍時，調整出版社與作者的書籍數量"""
+    CounterService.adjust(Publisher, [instance.publisher_id], 'book_count', -1)
+    CounterService.adjust(Author, getattr(instance, '_counter_author_ids', []), 'book_count', -1)
+
+
+@receiver(m2m_changed, sender=Book.authors.through)
+def update_author_book_count(sender, instance, action, reverse, pk_set, **kwargs):
+    """
+    書籍與作者的關聯有變動時，調整作者的書籍數量
+
+    reverse=False：book.authors.add(作者...)，每位作者各 ±1
+    reverse=True：author.books.add(書籍...)，這位作者 ± 書籍數
+    """
+    if action == 'pre_clear':
+        related = instance.books if reverse else instance.authors
+        instance._counter_cleared_ids = list(related.values_list('id', flat=True))
+        return
+
+    if action == 'post_add':
+        ids, delta = pk_set, 1
+    elif action == 'post_remove':
+        ids, delta = pk_set, -1
+    elif action == 'post_clear':
+        ids, delta = getattr(instance, '_counter_cleared_ids', []), -1
+    else:
+        return
+
+    if reverse:
+        CounterService.adjust(Author, [instance.pk], 'book_count', delta * len(ids))
+    else:
+        CounterService.adjust(Author, ids, 'book_count', delta)
+
+
+@receiver(post_save, sender=ReadingList)
+def increase_book_favorite_count(sender, instance, created, **kwargs):
+    """加入閱讀清單時，書籍的收藏數 +1"""
+    if created:
+        CounterService.adjust(Book, [instance.book_id], 'favorite_count', 1)
+
 
-    # 2. 發送 WebSocket 通知
-    notify_book_update('delete', f'書籍已下架：{instance.title}')
+@receiver(post_delete, sender=ReadingList)
+def decrease_book_favorite_count(sender, instance, **kwargs):
+    """移出閱讀清單時，書籍的收藏數 -1"""
+    CounterService.adjust(Book, [instance.book_id], 'favorite_count', -1)
@@ -38,6 +38,8 @@ const BookListApp = (function () {
   // API 端點
   const API_ENDPOINTS = {
     BOOK_LIST: "/library/api/books/",
+    BOOK_CHANGES: "/library/api/books/changes/",
+    BOOK_FACETS: "/library/api/books/facets/",
     ADD_TO_READING_LIST: "/library/api/reading-list/add/",
     REMOVE_FROM_READING_LIST: "/library/api/reading-list/remove/",
     EXPORT_BOOKS: "/library/api/export/",  // 新增這行
@@ -66,9 +68,20 @@ const BookListApp = (function () {
   let booksData = [];
   let userFavoriteBookIds = [];
   let isAuthenticated = false;
+  // 分頁與篩選相關變數
+  let nextCursor = null;
+  let hasMore = false;
+  let currentFilters = {};
+  // 異動序號（WebSocket 事件與異動紀錄 API 用來接續同步）
+  // lastChangeSeq：這個序號以前的異動都已經套用（序號依 commit 順序連續編號，中間沒有缺漏）
+  let lastChangeSeq = 0;
   // WebSocket 相關變數
   let websocket = null;
   let wsReconnectTimer = null;
+  let wsHasConnected = false;
+
+  // 目前使用者發起的背景匯出任務（只顯示自己的匯出進度）
+  let exportTaskId = null;
 
   // ==========================================
   // 私有方法 - 狀態管理
@@ -524,6 +537,8 @@ const BookListApp = (function () {
   }
 
   function renderBooks() {
+    toggleElementVisibility("loadMoreContainer", hasMore);
+
     if (booksData.length === 0) {
       showState("emptyState");
       return;
@@ -534,6 +549,217 @@ const BookListApp = (function () {
     showDataView();
   }
 
+  // ==========================================
+  // 私有方法 - 分頁與篩選
+  // ==========================================
+
+  /**
+   * 組合書籍列表 API 的查詢參數
+   * @param {string|null} cursor - 下一頁的 cursor
+   */
+  function buildBookListParams(cursor) {
+    const params = {};
+    Object.entries(currentFilters).forEach(([key, value]) => {
+      if (value !== "" && value !== null && value !== undefined) {
+        params[key] = value;
+      }
+    });
+    if (cursor) {
+      params.cursor = cursor;
+    }
+    return params;
+  }
+
+  /**
+   * 讀取篩選表單的值
+   */
+  function readFilterForm() {
+    const form = document.getElementById("bookFilterForm");
+    if (!form) return {};
+    return Object.fromEntries(new FormData(form).entries());
+  }
+
+  /**
+   * 套用書籍列表 API 回應
+   * @param {Object} data - response.data
+   * @param {boolean} append - true 表示接在目前資料後面（載入更多）
+   */
+  function applyBookListResponse(data, append) {
+    booksData = append ? booksData.concat(data.books) : data.books;
+    if (!append) {
+      lastChangeSeq = data.change_seq || 0;
+    }
+    nextCursor = data.next_cursor;
+    hasMore = data.has_more;
+    userFavoriteBookIds = data.user_favorite_book_ids;
+    isAuthenticated = data.is_authenticated;
+  }
+
+  // ==========================================
+  // 私有方法 - 分面統計
+  // ==========================================
+
+  /**
+   * 載入目前篩選條件下的分面統計
+   */
+  function fetchFacets() {
+    sendRequest({
+      url: API_ENDPOINTS.BOOK_FACETS,
+      method: "GET",
+      params: buildBookListParams(null),
+      onSuccess: (response) => {
+        if (response.success) {
+          renderFacets(response.data);
+        }
+      },
+      onError: (error) => {
+        console.error("[BookListApp] Failed to fetch facets:", error);
+      },
+    });
+  }
+
+  /**
+   * 把分面統計的數量顯示在篩選選單中
+   * @param {Object} facets - 分面統計
+   */
+  function renderFacets(facets) {
+    const toCounts = (items, key) =>
+      Object.fromEntries(items.map((item) => [String(item[key]), item.count]));
+    // 每個維度的數量不套用自己的篩選，「全部」就是這個維度所有選項的總和
+    const sumOf = (items) => items.reduce((sum, item) => sum + item.count, 0);
+
+    updateSelectCounts("filter_publisher", toCounts(facets.publishers, "id"), sumOf(facets.publishers));
+    updateSelectCounts("filter_price_category", toCounts(facets.price_categories, "value"), sumOf(facets.price_categories));
+    updateSelectCounts("filter_stock", toCounts(facets.stock_states, "value"), sumOf(facets.stock_states));
+  }
+
+  /**
+   * 更新下拉選單每個選項後面的數量
+   * @param {string} selectId - 下拉選單 ID
+   * @param {Object} counts - 選項值對應的數量
+   * @param {number} total - 「全部」的數量
+   */
+  function updateSelectCounts(selectId, counts, total) {
+    const select = document.getElementById(selectId);
+    if (!select) return;
+
+    Array.from(select.options).forEach((option) => {
+      if (!option.dataset.label) {
+        option.dataset.label = option.textContent.trim();
+      }
+      const count = option.value === "" ? total : counts[option.value] || 0;
+      option.textContent = `${option.dataset.label}（${count}）`;
+    });
+  }
+
+  // ==========================================
+  // 私有方法 - 本地資料更新
+  // ==========================================
+
+  /**
+   * 判斷書籍是否符合目前的篩選條件（與後端 BookListService 的篩選一致）
+   * @param {Object} book - 書籍資料
+   */
+  function matchesCurrentFilters(book) {
+    const { publisher, price_min, price_max, price_category, stock } = currentFilters;
+
+    if (publisher && (!book.publisher || book.publisher.id !== Number(publisher))) {
+      return false;
+    }
+    if (price_min !== undefined && price_min !== "" && book.price < Number(price_min)) {
+      return false;
+    }
+    if (price_max !== undefined && price_max !== "" && book.price > Number(price_max)) {
+      return false;
+    }
+    if (price_category && getCategoryByPrice(book.price) !== PRICE_CATEGORIES[price_category.toUpperCase()]) {
+      return false;
+    }
+    // 低庫存的門檻依書籍、出版社而不同，以伺服器回傳的 low_stock 判斷
+    if (stock === "out" && book.stock > 0) return false;
+    if (stock === "low" && (book.stock <= 0 || !book.low_stock)) return false;
+    if (stock === "normal" && (book.stock <= 0 || book.low_stock)) return false;
+
+    return true;
+  }
+
+  /**
+   * 依目前的排序條件比較兩本書（排序欄位相同時以 id 排序，與後端一致）
+   */
+  function compareBooks(a, b) {
+    const sort = currentFilters.sort || "id";
+    const descending = sort.startsWith("-");
+    const field = sort.replace(/^-/, "");
+    const direction = descending ? -1 : 1;
+
+    if (a[field] < b[field]) return -direction;
+    if (a[field] > b[field]) return direction;
+    return (a.id - b.id) * direction;
+  }
+
+  /**
+   * 新增或更新本地的一本書
+   *
+   * 還有下一頁時，只有排在已載入範圍內的書才放進列表，其餘的會在載入更多時出現
+   * @param {Object} book - 書籍資料
+   */
+  function upsertLocalBook(book) {
+    removeLocalBook(book.id);
+
+    if (!matchesCurrentFilters(book)) return;
+
+    const lastBook = booksData[booksData.length - 1];
+    if (hasMore && lastBook && compareBooks(book, lastBook) > 0) return;
+
+    const index = booksData.findIndex((item) => compareBooks(book, item) < 0);
+    if (index === -1) {
+      booksData.push(book);
+    } else {
+      booksData.splice(index, 0, book);
+    }
+  }
+
+  /**
+   * 移除本地的一本書
+   * @param {number} bookId - 書籍 ID
+   */
+  function removeLocalBook(bookId) {
+    booksData = booksData.filter((book) => book.id !== bookId);
+  }
+
+  /**
+   * 從異動紀錄 API 補齊 lastChangeSeq 之後的異動
+   *
+   * 用於 WebSocket 重新連線或發現漏接事件時；序號已被清除（410）則重新載入第一頁
+   */
+  function syncChanges() {
+    sendRequest({
+      url: API_ENDPOINTS.BOOK_CHANGES,
+      method: "GET",
+      params: { since: lastChangeSeq },
+      useETag: false,
+      onSuccess: (response) => {
+        if (!response.success) return;
+
+        const data = response.data;
+        data.deleted_ids.forEach(removeLocalBook);
+        data.books.forEach(upsertLocalBook);
+        lastChangeSeq = Math.max(lastChangeSeq, data.latest_seq);
+        renderBooks();
+        console.log(`[BookListApp] 已同步異動至序號 ${lastChangeSeq}`);
+
+        if (data.has_more) {
+          syncChanges();
+        }
+      },
+      onError: (error) => {
+        if (error && error.reset_required) {
+          BookListApp.fetchBooks();
+        }
+      },
+    });
+  }
+
   // ==========================================
   // 私有方法 - 事件監聽器設定
   // ==========================================
@@ -587,11 +813,19 @@ const BookListApp = (function () {
         `;
 
         // 發送匯出請求
+        const exportFormat = document.getElementById("exportFormat");
+
         sendRequest({
           url: API_ENDPOINTS.EXPORT_BOOKS,
           method: "POST",
+          params: { format: exportFormat ? exportFormat.value : "csv" },
           onSuccess: (response) => {
-            if (response.success) {
+            if (response.success && response.status === "ready") {
+              // 目錄沒有變動，伺服器直接回傳已匯出的檔案
+              showUpdateNotification(response.message, "export_complete");
+            } else if (response.success) {
+              // 新的匯出任務，或加入其他人正在進行的同一個匯出
+              exportTaskId = response.task_id;
               showUpdateNotification(response.message, "create");
             }
             // 恢復按鈕狀態
@@ -607,6 +841,19 @@ const BookListApp = (function () {
     }
   }
 
+  /**
+   * 顯示背景匯出進度
+   * @param {Object} progress - { task_id, done, total }
+   */
+  function updateExportProgress(progress) {
+    const exportBtn = document.getElementById("exportBtn");
+    if (!exportBtn || !progress || progress.task_id !== exportTaskId) return;
+
+    const percent = progress.total ? Math.floor((progress.done / progress.total) * 100) : 0;
+    exportBtn.disabled = true;
+    exportBtn.textContent = `匯出中 ${percent}%`;
+  }
+
   /**
    * 重設匯出按鈕狀態
    */
@@ -645,6 +892,12 @@ const BookListApp = (function () {
     websocket.onopen = function (e) {
       console.log("[WebSocket] 連線成功！");
 
+      // 重新連線：斷線期間可能漏接事件，從異動紀錄補齊
+      if (wsHasConnected) {
+        syncChanges();
+      }
+      wsHasConnected = true;
+
       // 清除重連計時器
       if (wsReconnectTimer) {
         clearTimeout(wsReconnectTimer);
@@ -685,45 +938,54 @@ const BookListApp = (function () {
    * @param {Object} data - 包含 action 和 message
    */
   function handleBookUpdate(data) {
+    // 匯出進度只更新按鈕，不跳出通知
+    if (data.action === "export_progress") {
+      updateExportProgress(data.progress);
+      return;
+    }
+
     // 1. 顯示通知
     showUpdateNotification(data.message, data.action);
 
     // 2. 根據不同的 action 做不同處理
+    if (data.action === "export_complete" && exportTaskId) {
+      exportTaskId = null;
+      resetExportButton();
+    }
     if (data.action === "export_complete" || data.action === "low_stock_warning") {
       // 匯出完成或庫存警告，不需要重新載入資料
       console.log(`[WebSocket] ${data.action} 通知`);
       return;
     }
 
-    // 3. 其他情況（create/update/delete）：重新載入資料
-    setTimeout(() => {
-      showState("loadingState");
+    // 3. 其他情況（create/update/delete/batch/import）：用事件附帶的資料直接更新 booksData
+    if (data.change_seq <= lastChangeSeq) {
+      // 這批異動已經套用過（由事件或異動紀錄 API）
+      return;
+    }
+    if (data.action === "import") {
+      // 批次匯入的書籍數量很多，直接重新載入第一頁比逐筆同步快
+      BookListApp.fetchBooks();
+      return;
+    }
+    if (data.from_seq > lastChangeSeq + 1 || !data.books) {
+      // 中間有還沒套用的異動（漏接或較晚送達的事件），或這批異動沒有附上資料，從異動紀錄補齊
+      syncChanges();
+      return;
+    }
 
-      sendRequest({
-        url: API_ENDPOINTS.BOOK_LIST,
-        method: "GET",
-        onSuccess: (response) => {
-          if (response.success) {
-            booksData = response.data.books;
-            userFavoriteBookIds = response.data.user_favorite_book_ids;
-            isAuthenticated = response.data.is_authenticated;
-            renderBooks();
-            console.log("[WebSocket] 資料已重新載入");
-          }
-        },
-        onError: (error) => {
-          console.error("[WebSocket] 重新載入失敗:", error);
-          showState("errorState");
-        },
-      });
-    }, 500);
+    data.deleted_ids.forEach(removeLocalBook);
+    data.books.forEach(upsertLocalBook);
+    lastChangeSeq = data.change_seq;
+    renderBooks();
+    console.log(`[WebSocket] 已更新本地資料（版本 ${data.version}）`);
   }
 
 
   /**
    * 顯示更新通知
    * @param {string} message - 通知訊息
-   * @param {string} action - 動作類型 (create/update/delete)
+   * @param {string} action - 動作類型 (create/update/delete/batch/import)
    */
   function showUpdateNotification(message, action) {
     // 根據動作類型選擇顏色
@@ -731,6 +993,8 @@ const BookListApp = (function () {
       create: "bg-green-500",
       update: "bg-blue-500",
       delete: "bg-red-500",
+      batch: "bg-blue-500",
+      import: "bg-green-500",
       export_complete: "bg-purple-500",      // 匯出完成
       low_stock_warning: "bg-orange-500",    // 庫存警告
     };
@@ -801,19 +1065,20 @@ const BookListApp = (function () {
     },
 
     /**
-     * 從 API 載入書籍資料
+     * 從 API 載入書籍資料（第一頁）
      */
     fetchBooks() {
       showState("loadingState");
+      toggleElementVisibility("loadMoreContainer", false);
+      fetchFacets();
 
       sendRequest({
         url: API_ENDPOINTS.BOOK_LIST,
         method: "GET",
+        params: buildBookListParams(null),
         onSuccess: (response) => {
           if (response.success) {
-            booksData = response.data.books;
-            userFavoriteBookIds = response.data.user_favorite_book_ids;
-            isAuthenticated = response.data.is_authenticated;
+            applyBookListResponse(response.data, false);
 
             console.log(`[BookListApp] Loaded ${booksData.length} books`);
             renderBooks();
@@ -832,6 +1097,43 @@ const BookListApp = (function () {
       });
     },
 
+    /**
+     * 載入下一頁書籍資料
+     */
+    loadMoreBooks() {
+      if (!hasMore || !nextCursor) return;
+
+      const loadMoreBtn = document.getElementById("loadMoreBtn");
+      if (loadMoreBtn) loadMoreBtn.disabled = true;
+
+      sendRequest({
+        url: API_ENDPOINTS.BOOK_LIST,
+        method: "GET",
+        params: buildBookListParams(nextCursor),
+        onSuccess: (response) => {
+          if (response.success) {
+            applyBookListResponse(response.data, true);
+            console.log(`[BookListApp] Loaded ${booksData.length} books`);
+            renderBooks();
+          }
+        },
+        onError: (error) => {
+          console.error("[BookListApp] Failed to load more books:", error);
+        },
+        onComplete: () => {
+          if (loadMoreBtn) loadMoreBtn.disabled = false;
+        },
+      });
+    },
+
+    /**
+     * 套用篩選條件並重新載入第一頁
+     */
+    applyFilters() {
+      currentFilters = readFilterForm();
+      this.fetchBooks();
+    },
+
     // ==========================================
     // 新增書籍 Modal
     // ==========================================
@@ -0,0 +1,64 @@
+"""
+Celery Signal 處理（任務統計）
+
+1. before_task_publish：送出任務時在訊息標頭寫入送出時間（在送出任務的程序執行）
+2. task_prerun：worker 開始執行時記下開始時間
+3. task_postrun：執行結束後寫入排隊時間、執行時間、結果與任務回傳的數量（TaskMetrics）
+
+Celery 會捕捉 Signal 處理函數的例外並寫入 log，統計失敗不會影響任務本身
+"""
+import time
+
+from celery.signals import before_task_publish, task_postrun, task_prerun
+from celery.utils.time import maybe_iso8601
+
+from .services import TaskMetrics
+
+
+# 訊息標頭中的送出時間（worker 端可從 task.request 讀取）
+ENQUEUED_AT_HEADER = 'enqueued_at'
+
+# 執行中任務的開始時間（task_id → (time.time(), time.monotonic())）
+_started = {}
+
+
+@before_task_publish.connect
+def stamp_enqueued_at(sender=None, headers=None, **kwargs):
+    """在訊息標頭寫入送出時間"""
+    if headers is not None:
+        headers[ENQUEUED_AT_HEADER] = time.time()
+
+
+@task_prerun.connect
+def remember_task_start(sender=None, task_id=None, **kwargs):
+    """記下開始執行的時間"""
+    _started[task_id] = (time.time(), time.monotonic())
+
+
+@task_postrun.connect
+def record_task_metrics(sender=None, task_id=None, task=None, retval=None, state=None, **kwargs):
+    """寫入這次執行的統計"""
+    started = _started.pop(task_id, None)
+    if started is None or task is None:
+        return
+    started_at, started_monotonic = started
+    request = task.request
+
+    # 排隊時間：有 countdown / eta 的任務從預定執行時間起算，只計算真正因為佇列塞車等待的時間
+    wait = None
+    enqueued_at = getattr(request, ENQUEUED_AT_HEADER, None)
+    if enqueued_at is not None:
+        if request.eta:
+            enqueued_at = max(enqueued_at, maybe_iso8601(request.eta).timestamp())
+        wait = started_at - enqueued_at
+
+    queue = 'eager' if request.is_eager else (request.delivery_info or {}).get('routing_key') or 'unknown'
+
+    TaskMetrics.record_run(
+        task.name,
+        queue,
+        state or 'UNKNOWN',
+        time.monotonic() - started_monotonic,
+        wait=wait,
+        retval=retval,
+    )
@@ -3,66 +3,71 @@ Celery 任務定義
 
 這裡定義所有 library app 的背景任務
 """
-import csv
-import os
-from datetime import datetime
+import time
+from collections import defaultdict
 from celery import shared_task
-from django.conf import settings
 
 
 @shared_task(bind=True)
-def export_books_to_csv(self, user_id: int):
+def export_books_to_csv(self, user_id: int, export_format: str = 'csv', catalog_version: int = None):
     """
-    匯出書籍列表為 CSV 檔案
+    匯出書籍列表（預設 CSV，也支援 csv.gz、jsonl.gz、xlsx）
+
+    分批從資料庫取回資料並寫入檔案，記憶體用量不受書籍總數影響；
+    每寫完一批更新任務進度，並定期以 WebSocket 通知匯出進度
 
     Args:
         self: Celery task instance（因為 bind=True）
         user_id: 發起請求的使用者 ID
+        export_format: 匯出格式（BookExportService.FORMATS）
+        catalog_version: 登記匯出時的目錄版本號（由 BookExportService.request_export 取得），
+                         完成後記錄結果，相同版本的請求直接沿用這個檔案
 
     Returns:
         dict: 包含檔案路徑和訊息
     """
     # 這裡必須在函數內 import，避免 Django 尚未初始化
-    from apps.library.models.book import Book
+    from apps.library.services import BookExportService
 
     print(f"[Task] 開始匯出書籍報表，任務 ID: {self.request.id}")
 
-    # 1. 查詢所有書籍
-    books = Book.objects.select_related('publisher').all()
-    total_books = books.count()
-
-    print(f"[Task] 共有 {total_books} 本書籍要匯出")
+    # 1. 產生檔案路徑（包含時間戳記與任務 ID）
+    filename, filepath = BookExportService.make_filepath(export_format, self.request.id)
 
-    # 2. 建立匯出目錄（如果不存在）
-    export_dir = os.path.join(settings.BASE_DIR, 'exports')
-    os.makedirs(export_dir, exist_ok=True)
+    # 2. 分批寫入檔案，回報進度
+    last_notified = 0.0
 
-    # 3. 產生檔案名稱（包含時間戳記）
-    timestamp = datetime.now().strftime('%Y%m%d_%H%M%S')
-    filename = f'books_export_{timestamp}.csv'
-    filepath = os.path.join(export_dir, filename)
+    def report_progress(done, total):
+        nonlocal last_notified
+        self.update_state(state='PROGRESS', meta={'done': done, 'total': total})
 
-    # 4. 寫入 CSV 檔案
-    with open(filepath, 'w', newline='', encoding='utf-8-sig') as csvfile:
-        writer = csv.writer(csvfile)
+        now = time.monotonic()
+        if done < total and now - last_notified >= BookExportService.PROGRESS_INTERVAL:
+            last_notified = now
+            user_ids = [user_id]
+            if catalog_version is not None:
+                user_ids += BookExportService.get_waiters(export_format, catalog_version)
+            notify_export_progress(user_ids, self.request.id, done, total)
 
-        # 寫入標題列
-        writer.writerow(['ID', '書名', '價格', '庫存', '出版社'])
+    try:
+        total_books = BookExportService.write(filepath, export_format, progress=report_progress)
+    except Exception:
+        # 匯出失敗：釋放登記，讓下一次請求重新匯出
+        if catalog_version is not None:
+            BookExportService.finish_export(export_format, catalog_version)
+        raise
 
-        # 寫入資料列
-        for book in books:
-            writer.writerow([
-                book.id,
-                book.title,
-                book.price,
-                book.stock,
-                book.publisher.name if book.publisher else '無',
-            ])
+    print(f"[Task] 匯出完成：{filepath}（共 {total_books} 本書籍）")
 
-    print(f"[Task] 匯出完成：{filepath}")
+    # 3. 記錄結果，取出等待這個匯出的使用者
+    user_ids = [user_id]
+    if catalog_version is not None:
+        user_ids = BookExportService.finish_export(
+            export_format, catalog_version, filename, total_books
+        ) or user_ids
 
-    # 5. 發送 WebSocket 通知
-    notify_export_complete(user_id, filename)
+    # 4. 發送 WebSocket 通知
+    notify_export_complete(user_ids, filename)
 
     return {
         'status': 'success',
@@ -72,57 +77,59 @@ def export_books_to_csv(self, user_id: int):
     }
 
 
-def notify_export_complete(user_id: int, filename: str):
+def notify_export_progress(user_ids: list, task_id: str, done: int, total: int):
     """
-    透過 WebSocket 通知使用者匯出完成
+    透過 WebSocket 通知匯出進度（放進廣播佇列，不會拖慢匯出）
 
     Args:
-        user_id: 使用者 ID
-        filename: 匯出的檔案名稱
+        user_ids: 等待這個匯出的使用者 ID
+        task_id: 匯出任務 ID（客戶端只顯示自己發起的任務）
+        done: 已匯出筆數
+        total: 總筆數
     """
-    from channels.layers import get_channel_layer
-    from asgiref.sync import async_to_sync
-
-    channel_layer = get_channel_layer()
+    from apps.library.services import UserNotifier
 
-    # 發送到 book_updates 群組
-    async_to_sync(channel_layer.group_send)(
-        'book_updates',
-        {
-            'type': 'book_update',
-            'action': 'export_complete',
-            'message': f'報表匯出完成！檔案：{filename}',
-        }
+    UserNotifier.send(
+        user_ids,
+        'export_progress',
+        f'報表匯出中：{done} / {total}',
+        progress={'task_id': task_id, 'done': done, 'total': total},
     )
 
-    print(f"[Task] 已發送 WebSocket 通知給使用者")
+
+def notify_export_complete(user_ids: list, filename: str):
+    """
+    透過 WebSocket 通知使用者匯出完成（只送到這些使用者的個人群組）
+
+    Args:
+        user_ids: 等待這個匯出的使用者 ID
+        filename: 匯出的檔案名稱
+    """
+    from apps.library.services import UserNotifier
+
+    UserNotifier.send(user_ids, 'export_complete', f'報表匯出完成！檔案：{filename}')
+
+    print(f"[Task] 已發送 WebSocket 通知給使用者 {user_ids}")
 
 @shared_task
 def check_low_stock_books():
     """
     檢查庫存不足的書籍（定時任務）
 
-    這個任務會由 Celery Beat 定時執行
+    這個任務會由 Celery Beat 定時執行；只通知上次檢查之後新變成庫存不足的書籍，
+    缺貨中的書籍不會每次都重複警告
     """
-    from apps.library.models.book import Book
     from channels.layers import get_channel_layer
     from asgiref.sync import async_to_sync
+    from apps.library.services import LowStockService
 
     print("[定時任務] 開始檢查庫存...")
 
-    # 查詢庫存低於 5 的書籍
-    low_stock_books = Book.objects.filter(stock__lt=5)
-    count = low_stock_books.count()
-
-    if count > 0:
-        # 組裝訊息
-        book_titles = [book.title for book in low_stock_books[:5]]  # 最多顯示 5 本
-        if count > 5:
-            message = f'庫存警告：{", ".join(book_titles)} 等 {count} 本書籍庫存不足！'
-        else:
-            message = f'庫存警告：{", ".join(book_titles)} 庫存不足！'
+    # 從 Redis 讀取新變成庫存不足的書籍，不查詢整個資料表
+    crossed = LowStockService.take_new_crossings('global')
 
-        print(f"[定時任務] 發現 {count} 本書籍庫存不足")
+    if crossed:
+        print(f"[定時任務] 發現 {len(crossed)} 本書籍新變成庫存不足")
 
         # 透過 WebSocket 發送通知
         channel_layer = get_channel_layer()
@@ -131,15 +138,16 @@ def check_low_stock_books():
             {
                 'type': 'book_update',
                 'action': 'low_stock_warning',
-                'message': message,
+                'message': LowStockService.build_message(crossed),
             }
         )
     else:
-        print("[定時任務] 所有書籍庫存正常")
+        print("[定時任務] 沒有新的庫存不足書籍")
 
     return {
         'status': 'success',
-        'low_stock_count': count,
+        'low_stock_count': LowStockService.count(),
+        'new_low_stock_count': len(crossed),
     }
 
 @shared_task
@@ -147,15 +155,14 @@ def check_low_stock_books_for_user(user_id: int):
     """
     檢查庫存不足的書籍（針對特定使用者的定時任務）
 
-    這個任務會根據使用者的偏好設定被觸發
+    舊版每位使用者一個排程時使用，現在改由 check_low_stock_books_for_frequency 分組處理；
+    保留給已排入佇列的舊任務與單一使用者的手動檢查
 
     Args:
         user_id: 使用者 ID
     """
-    from apps.library.models.book import Book
     from apps.accounts.models import User
-    from channels.layers import get_channel_layer
-    from asgiref.sync import async_to_sync
+    from apps.library.services import LowStockService, UserNotifier
 
     try:
         user = User.objects.get(id=user_id)
@@ -163,33 +170,24 @@ def check_low_stock_books_for_user(user_id: int):
         print(f"[定時任務] 使用者 {user_id} 不存在")
         return {'status': 'error', 'message': 'User not found'}
 
+    # 使用者關閉瀏覽器通知時不需要檢查
+    if not UserNotifier.filter_enabled([user_id]):
+        print(f"[定時任務] 使用者 {user.username} 已關閉瀏覽器通知，略過")
+        return {'status': 'skipped', 'user_id': user_id}
+
     print(f"[定時任務] 為使用者 {user.username} 檢查庫存...")
 
-    # 查詢庫存低於 5 的書籍
-    low_stock_books = Book.objects.filter(stock__lt=5)
-    count = low_stock_books.count()
+    # 目前所有庫存不足的書籍（列出庫存最少的幾本）
+    count = LowStockService.count()
 
     if count > 0:
-        # 組裝訊息
-        book_titles = [book.title for book in low_stock_books[:5]]
-        if count > 5:
-            message = f'庫存警告：{", ".join(book_titles)} 等 {count} 本書籍庫存不足！'
-        else:
-            message = f'庫存警告：{", ".join(book_titles)} 庫存不足！'
-
+        message = LowStockService.build_message(
+            LowStockService.lowest_ids(LowStockService.MESSAGE_TITLES), total=count
+        )
         print(f"[定時任務] 發現 {count} 本書籍庫存不足，通知使用者 {user.username}")
 
-        # 透過 WebSocket 發送通知
-        channel_layer = get_channel_layer()
-        async_to_sync(channel_layer.group_send)(
-            'book_updates',
-            {
-                'type': 'book_update',
-                'action': 'low_stock_warning',
-                'message': message,
-                'user_id': user_id,  # 可用於前端過濾
-            }
-        )
+        # 透過 WebSocket 發送到使用者的個人群組
+        UserNotifier.send([user_id], 'low_stock_warning', message)
     else:
         print(f"[定時任務] 使用者 {user.username} - 所有書籍庫存正常")
 
@@ -198,3 +196,206 @@ def check_low_stock_books_for_user(user_id: int):
         'user_id': user_id,
         'low_stock_count': count,
     }
+
+
+@shared_task
+def check_low_stock_books_for_frequency(frequency: str):
+    """
+    檢查庫存不足的書籍（依通知頻率分組的定時任務）
+
+    每個頻率只有一個排程：庫存只讀取一次，再分批通知所有選擇這個頻率、開啟瀏覽器通知的使用者，
+    排程數量與查詢次數都不會隨使用者人數增加；只通知這個頻率上次檢查之後新變成庫存不足的書籍
+
+    Args:
+        frequency: 通知頻率（UserPreference.stock_alert_frequency）
+    """
+    from apps.accounts.models import UserPreference
+    from apps.accounts.services import UserPreferenceService
+    from apps.library.services import LowStockService, UserNotifier
+
+    subscribers = (
+        UserPreference.objects
+        .filter(stock_alert_frequency=frequency, browser_notification=True)
+        .order_by('user_id')
+        .values_list('user_id', flat=True)
+    )
+
+    # 1. 沒有人訂閱就不需要讀取庫存（也不消耗這個頻率的跨越紀錄）
+    if not subscribers.exists():
+        print(f"[定時任務] 頻率 {frequency} 沒有訂閱的使用者，略過")
+        return {'status': 'skipped', 'frequency': frequency}
+
+    # 2. 只讀取這個頻率上次檢查之後新變成庫存不足的書籍
+    crossed = LowStockService.take_new_crossings(f'frequency:{frequency}')
+    if not crossed:
+        print(f"[定時任務] 頻率 {frequency} - 沒有新的庫存不足書籍")
+        return {'status': 'success', 'frequency': frequency, 'low_stock_count': 0}
+    message = LowStockService.build_message(crossed)
+
+    # 3. 依每位使用者固定的時段分組，分散在整個發送範圍內
+    slots = defaultdict(list)
+    for user_id in subscribers.iterator(chunk_size=UserNotifier.FANOUT_BATCH_SIZE):
+        slots[UserPreferenceService.delivery_offset(frequency, user_id)].append(user_id)
+
+    # 4. 每個時段分批交給其他 worker，延後到該時段才發送
+    batches = 0
+    for offset, user_ids in sorted(slots.items()):
+        for start in range(0, len(user_ids), UserNotifier.FANOUT_BATCH_SIZE):
+            send_low_stock_alerts.apply_async(
+                (user_ids[start:start + UserNotifier.FANOUT_BATCH_SIZE], message),
+                countdown=offset,
+            )
+            batches += 1
+
+    print(f"[定時任務] 頻率 {frequency} 發現 {len(crossed)} 本書籍新變成庫存不足，"
+          f"分 {batches} 批在 {len(slots)} 個時段通知")
+
+    return {
+        'status': 'success',
+        'frequency': frequency,
+        'low_stock_count': len(crossed),
+        'batches': batches,
+        'slots': len(slots),
+    }
+
+
+@shared_task
+def send_low_stock_alerts(user_ids: list, message: str):
+    """
+    發送一批使用者的庫存警告（由 check_low_stock_books_for_frequency 分批排入）
+
+    速率限制（rate_limit）設定在 config/task_profiles.py 的 alert_delivery
+
+    Args:
+        user_ids: 使用者 ID
+        message: 通知訊息
+    """
+    from apps.library.services import UserNotifier
+
+    sent = UserNotifier.send_batch(user_ids, 'low_stock_warning', message)
+
+    return {
+        'status': 'success',
+        'sent': sent,
+    }
+
+
+@shared_task
+def compact_book_changes():
+    """
+    壓縮書籍異動紀錄（定時任務）
+
+    刪除超過保留天數的異動紀錄，避免紀錄表無限成長
+    """
+    from apps.library.services import BookChangeFeed
+
+    deleted = BookChangeFeed.compact()
+    print(f"[定時任務] 已清除 {deleted} 筆過期的書籍異動紀錄")
+
+    return {
+        'status': 'success',
+        'deleted': deleted,
+    }
+
+
+@shared_task
+def assign_orphan_book_changes():
+    """
+    補上未編號的書籍異動紀錄（定時任務）
+
+    commit 後編號失敗（程序中止、資料庫暫時無法連線）的紀錄沒有序號，客戶端查詢異動時看不到；
+    由這個任務定期補上，查詢異動的 API 只讀取、不寫入
+    """
+    from apps.library.services import BookChangeFeed
+
+    assigned = BookChangeFeed.assign_orphans()
+    if assigned:
+        print(f"[定時任務] 已補上 {assigned} 筆未編號的書籍異動紀錄")
+
+    return {
+        'status': 'success',
+        'assigned': assigned,
+    }
+
+
+@shared_task
+def reconcile_counters():
+    """
+    修正計數欄位（定時任務）
+
+    重新計算出版社、作者的書籍數量與書籍的收藏數，
+    修正 bulk_create、QuerySet.update 等不經過 Signal 的操作造成的誤差
+    """
+    from apps.library.services import CounterService
+
+    repaired = CounterService.reconcile()
+    print(f"[定時任務] 計數欄位修正完成：{repaired}")
+
+    return {
+        'status': 'success',
+        'repaired': repaired,
+    }
+
+
+@shared_task(bind=True)
+def import_books(self, path: str):
+    """
+    批次匯入書籍（CSV / XLSX）
+
+    每批寫入完成後更新任務進度，可用 AsyncResult(task_id).info 查詢
+
+    Args:
+        self: Celery task instance（因為 bind=True）
+        path: 檔案路徑
+
+    Returns:
+        dict: 匯入結果
+    """
+    from apps.library.services import BookImportError, BookImportService
+
+    print(f"[Task] 開始匯入書籍，任務 ID: {self.request.id}，檔案: {path}")
+
+    def report_progress(stats):
+        self.update_state(state='PROGRESS', meta={
+            'processed': stats['processed'],
+            'created': stats['created'],
+            'failed': stats['failed'],
+        })
+
+    try:
+        stats = BookImportService.run(path, progress=report_progress)
+    except BookImportError as e:
+        print(f"[Task] 匯入失敗：{e}")
+        return {
+            'status': 'error',
+            'message': str(e),
+        }
+
+    print(f"[Task] 匯入完成：新增 {stats['created']} 本，失敗 {stats['failed']} 列")
+
+    return {
+        'status': 'success',
+        'processed': stats['processed'],
+        'created': stats['created'],
+        'failed': stats['failed'],
+        'errors': stats['errors'],
+        'message': f'成功匯入 {stats["created"]} 本書籍',
+    }
+
+
+@shared_task
+def rebuild_low_stock_set():
+    """
+    重建庫存不足清單（定時任務）
+
+    以資料庫重新計算，修正沒有經過 Signal 的庫存異動
+    """
+    from apps.library.services import LowStockService
+
+    result = LowStockService.rebuild()
+    print(f"[定時任務] 庫存不足清單重建完成：{result}")
+
+    return {
+        'status': 'success',
+        **result,
+    }
@@ -28,6 +28,10 @@ urlpatterns = [
 
     # AJAX API 端點
     path('api/books/', views.BookListAPIView.as_view(), name='api_book_list'),
+    path('api/books/changes/', views.BookChangesAPIView.as_view(), name='api_book_changes'),
+    path('api/books/facets/', views.BookFacetsAPIView.as_view(), name='api_book_facets'),
+    path('api/books/search/', views.BookSearchAPIView.as_view(), name='api_book_search'),
+    path('api/books/stock/', views.BookStockAdjustAPIView.as_view(), name='api_book_stock_adjust'),
     path('api/reading-list/add/<int:book_id>/', views.AddToReadingListAPIView.as_view(), name='api_add_to_reading_list'),
     path('api/reading-list/remove/<int:book_id>/', views.RemoveFromReadingListAPIView.as_view(), name='api_remove_from_reading_list'),
     path('api/export/', views.ExportBooksView.as_view(), name='export_books'),  # 新增這行
@@ -1,15 +1,38 @@
 from django.shortcuts import render, redirect, get_object_or_404
 from django.views import View
-from django.http import HttpResponse, JsonResponse
+from django.http import HttpResponse, JsonResponse, StreamingHttpResponse
 from .models.book import Book
 from .models.publisher import Publisher
 from django.shortcuts import render, redirect, get_object_or_404
 from django.views import View
-from django.contrib.auth.mixins import LoginRequiredMixin
+from django.contrib.auth.mixins import LoginRequiredMixin, PermissionRequiredMixin
 from django.contrib import messages
 from .models.book import Book
 from .models.reading_list import ReadingList
-from django.core.cache import cache
+from .services import (
+    BookChangeFeed,
+    BookExportService,
+    BookFacetService,
+    BookFragmentCache,
+    BookListBody,
+    BookListService,
+    BookSearchService,
+    CatalogCache,
+    ChangeFeedResetRequired,
+    FavoritesCache,
+    StockAdjustmentError,
+    StockAdjustmentService,
+    TaskMetrics,
+)
+from django.conf import settings
+from django.utils.cache import patch_cache_control, patch_vary_headers
+from django.utils.decorators import method_decorator
+from django.utils.http import quote_etag
+from django.views.decorators.http import condition
+from datetime import datetime
+import hashlib
+import hmac
+import json
 import time
 # Create your views here.
 class HelloWorldView(View):
@@ -55,62 +78,177 @@ class BookListView(View):
         return render(request, 'library/book_list.html', context)
 
 
+def make_catalog_etag(request, catalog_version, cache_key, variant=''):
+    """
+    產生 JSON API 的 ETag
+
+    由「目錄版本號 + 查詢條件 + 使用者收藏版本號」組成，
+    只需要讀快取中的版本號，不會查詢資料庫。
+    同一份資料的不同壓縮格式屬於不同的表示法，以 variant 區分。
+    """
+    if request.user.is_authenticated:
+        user_part = f'user:{request.user.id}:{FavoritesCache.get_version(request.user.id)}'
+    else:
+        user_part = 'anonymous'
+    raw = f'{catalog_version}:{cache_key}:{user_part}:{variant}'
+    return hashlib.md5(raw.encode('utf-8')).hexdigest()
+
+
+def catalog_last_modified(request, *args, **kwargs):
+    """JSON API 的 Last-Modified：目錄與使用者收藏較晚的修改時間"""
+    candidates = [CatalogCache.get_last_modified()]
+    if request.user.is_authenticated:
+        candidates.append(FavoritesCache.get_last_modified(request.user.id))
+    candidates = [value for value in candidates if value is not None]
+    return max(candidates) if candidates else None
+
+
+def book_list_etag(request, *args, **kwargs):
+    """書籍列表 API 的 ETag"""
+    try:
+        params = BookListService.parse_params(request.GET)
+    except ValueError:
+        return None
+    return make_catalog_etag(
+        request,
+        CatalogCache.get_version(),
+        BookListService.cache_key(params),
+        BookListBody.choose_encoding(request),
+    )
+
+
+# 條件式請求：If-None-Match 符合時直接回 304，不查資料庫、不重新序列化
+@method_decorator(condition(etag_func=book_list_etag, last_modified_func=catalog_last_modified), name='get')
 class BookListAPIView(View):
-    """書籍列表 API - 回傳 JSON 資料（有快取）"""
+    """書籍列表 API - 回傳 JSON 資料（Cursor 分頁 + 篩選，快取編碼好的回應內容，支援 ETag / 304）"""
 
-    CACHE_KEY = 'api_book_list'
-    CACHE_TIMEOUT = 60  # 快取 60 秒
+    CACHE_TIMEOUT = 300  # 快取 5 分鐘（資料變動時改版本號，不需要靠過期來更新）
 
     def get(self, request):
-        # ========== 快取機制 ==========
-        # 嘗試從快取取得書籍資料
-        cached_books = cache.get(self.CACHE_KEY)
+        # 解析篩選、排序、分頁參數
+        try:
+            params = BookListService.parse_params(request.GET)
+        except ValueError as e:
+            return JsonResponse({
+                'success': False,
+                'message': str(e),
+            }, status=400)
 
-        if cached_books:
-            # 快取命中！
-            print(f"[Cache HIT] {self.CACHE_KEY}")
-            books_data = cached_books
-        else:
-            # 快取未命中，查詢資料庫
-            print(f"[Cache MISS] {self.CACHE_KEY}")
-            books = Book.objects.select_related('publisher').all()
-
-            # 組裝書籍資料
-            books_data = []
-            for book in books:
-                books_data.append({
-                    'id': book.id,
-                    'title': book.title,
-                    'price': book.price,
-                    'stock': book.stock,
-                    'publisher': {
-                        'id': book.publisher.id if book.publisher else None,
-                        'name': book.publisher.name if book.publisher else None,
-                    } if book.publisher else None,
-                })
-
-            # 存入快取
-            cache.set(self.CACHE_KEY, books_data, self.CACHE_TIMEOUT)
-            print(f"[Cache SET] {self.CACHE_KEY}")
+        # ========== 快取機制 ==========
+        # 每一頁（篩選條件 + cursor）快取編碼好的 JSON bytes，並以目錄版本號區分新舊資料；
+        # 書籍變動後只有一個請求會重新查詢，其他請求先拿上一版資料
+        cache_key = BookListService.cache_key(params)
+        body, page_version = CatalogCache.get_or_build(
+            cache_key,
+            lambda: BookListBody.build(params),
+            self.CACHE_TIMEOUT,
+        )
         # ========== 快取機制結束 ==========
 
-        # 取得使用者已收藏的書籍 ID（這部分不快取，因為每個使用者不同）
-        user_favorite_book_ids = []
+        encoding = BookListBody.choose_encoding(request)
         if request.user.is_authenticated:
-            user_favorite_book_ids = list(
-                ReadingList.objects.filter(user=request.user).values_list('book_id', flat=True)
-            )
+            # 取得使用者已收藏的書籍 ID（每個使用者各自的快取），接在目錄 JSON 後面
+            user_favorite_book_ids = FavoritesCache.get_ids(request.user.id)
+            content = BookListBody.assemble(body['catalog'], user_favorite_book_ids, True)
+        else:
+            # 未登入：整份回應直接從快取複製
+            content = body['anonymous'][encoding]
+
+        response = HttpResponse(content, content_type=BookListBody.CONTENT_TYPE)
+        if encoding != 'identity':
+            response['Content-Encoding'] = encoding
+        patch_vary_headers(response, ('Accept-Encoding',))
+
+        # 重建期間回應的是上一版資料，ETag 要對應上一版，避免客戶端把舊資料當成最新版
+        response['ETag'] = quote_etag(make_catalog_etag(request, page_version, cache_key, encoding))
+
+        # 每次都向伺服器驗證（資料沒變時只會拿到 304）
+        patch_cache_control(response, private=True, no_cache=True)
+        return response
+
+
+
+class BookChangesAPIView(View):
+    """書籍異動 API - 回傳某個序號之後新增、更新、刪除的書籍"""
+
+    def get(self, request):
+        try:
+            since = int(request.GET.get('since', 0))
+            limit = int(request.GET.get('limit', BookChangeFeed.DEFAULT_LIMIT))
+            if since < 0 or limit < 1:
+                raise ValueError
+        except (TypeError, ValueError):
+            return JsonResponse({
+                'success': False,
+                'message': 'since 與 limit 必須是正整數',
+            }, status=400)
+
+        try:
+            changes = BookChangeFeed.get_changes(since, limit)
+        except ChangeFeedResetRequired:
+            # 410 Gone：要求的序號已被清除，客戶端需重新載入完整列表
+            return JsonResponse({
+                'success': False,
+                'message': '異動紀錄已過期，請重新載入書籍列表',
+                'reset_required': True,
+            }, status=410)
 
         return JsonResponse({
             'success': True,
-            'data': {
-                'books': books_data,
-                'user_favorite_book_ids': user_favorite_book_ids,
-                'is_authenticated': request.user.is_authenticated,
-            }
+            'data': changes,
         })
 
 
+class BookFacetsAPIView(View):
+    """書籍分面統計 API - 目前篩選條件下各價格分類、庫存狀態、出版社的書籍數量"""
+
+    def get(self, request):
+        try:
+            params = BookListService.parse_params(request.GET)
+        except ValueError as e:
+            return JsonResponse({
+                'success': False,
+                'message': str(e),
+            }, status=400)
+
+        return JsonResponse({
+            'success': True,
+            'data': BookFacetService.get_facets(params),
+        })
+
+
+class BookSearchAPIView(View):
+    """書籍搜尋 API - 全文搜尋書名、作者、出版社、ISBN、簡介"""
+
+    def get(self, request):
+        query = request.GET.get('q', '').strip()
+        if not query:
+            return JsonResponse({
+                'success': False,
+                'message': '請輸入搜尋關鍵字',
+            }, status=400)
+
+        try:
+            limit = int(request.GET.get('limit', BookSearchService.DEFAULT_LIMIT))
+            if limit < 1:
+                raise ValueError
+        except ValueError:
+            return JsonResponse({
+                'success': False,
+                'message': 'limit 必須是正整數',
+            }, status=400)
+
+        # 全文索引只回傳 ID，書籍資料從快取片段取得
+        book_ids = BookSearchService.search_ids(query, limit)
+
+        return JsonResponse({
+            'success': True,
+            'data': {
+                'query': query,
+                'books': BookFragmentCache.get_many(book_ids),
+            },
+        })
+
 
 class BookDetailView(View):
     """書籍詳細頁"""
@@ -188,7 +326,6 @@ class BookCreateView(View):
             publisher=publisher,
         )
 
-        cache.delete('api_book_list')
         # 重定向到書籍列表頁
         return redirect('library:book_list')
 
@@ -256,9 +393,9 @@ class BookEditView(View):
         book.price = price
         book.stock = stock
         book.publisher = get_object_or_404(Publisher, id=publisher_id)
-        book.save()
+        # 不寫回 favorite_count（由 Signal 維護）
+        book.save(update_fields=book.editable_field_names())
 
-        cache.delete('api_book_list')
         # 重定向到書籍詳細頁
         return redirect('library:book_detail', book_id=book.id)
 
@@ -281,7 +418,6 @@ class BookDeleteView(View):
         book = get_object_or_404(Book, id=book_id)
         book.delete()
 
-        cache.delete('api_book_list')
         # 重定向到列表頁
         return redirect('library:book_list')
 
@@ -292,13 +428,9 @@ class PublisherListView(View):
     """出版社列表頁"""
 
     def get(self, request):
-        # 取得所有出版社，並計算每個出版社的書籍數量
+        # 取得所有出版社（書籍數量是維護好的 book_count 欄位，不需要逐一 COUNT）
         publishers = Publisher.objects.all()
 
-        # 為每個出版社加上書籍數量
-        for publisher in publishers:
-            publisher.book_count = Book.objects.filter(publisher=publisher).count()
-
         context = {
             'publishers': publishers,
         }
@@ -394,7 +526,8 @@ class PublisherEditView(View):
         # 更新出版社資料
         publisher.name = name
         publisher.city = city
-        publisher.save()
+        # 不寫回 book_count（由 Signal 維護）
+        publisher.save(update_fields=publisher.editable_field_names())
 
         # 重定向到出版社列表頁
         return redirect('library:publisher_list')
@@ -407,8 +540,8 @@ class PublisherDeleteView(View):
         # 顯示刪除確認頁面
         publisher = get_object_or_404(Publisher, id=publisher_id)
 
-        # 計算關聯的書籍數量
-        book_count = Book.objects.filter(publisher=publisher).count()
+        # 關聯的書籍數量（維護好的計數欄位）
+        book_count = publisher.book_count
 
         context = {
             'publisher': publisher,
@@ -421,8 +554,8 @@ class PublisherDeleteView(View):
         # 執行刪除
         publisher = get_object_or_404(Publisher, id=publisher_id)
 
-        # 檢查是否有關聯的書籍
-        book_count = Book.objects.filter(publisher=publisher).count()
+        # 檢查是否有關聯的書籍（刪除前以實際資料為準，不依賴計數欄位）
+        book_count = publisher.books.count()
 
         if book_count > 0:
             # 如果有關聯的書籍，不允許刪除
@@ -554,19 +687,164 @@ class RemoveFromReadingListAPIView(LoginRequiredMixin, View):
             'book_id': book_id
         })
 
+class BookStockAdjustAPIView(LoginRequiredMixin, PermissionRequiredMixin, View):
+    """批次調整庫存 API（進貨、盤點），需要修改書籍的權限（library.change_book）"""
+
+    permission_required = 'library.change_book'
+
+    def handle_no_permission(self):
+        # 未登入時照常導向登入頁；已登入但沒有權限時回傳 JSON
+        if not self.request.user.is_authenticated:
+            return super().handle_no_permission()
+        return JsonResponse({
+            'success': False,
+            'message': '沒有調整庫存的權限',
+        }, status=403)
+
+    def post(self, request):
+        """
+        Request body（JSON）：
+            {"adjustments": [{"book_id": 1, "delta": 5}, {"book_id": 2, "delta": -3}]}
+
+        整批在一個交易中以增減量寫入，任何一本庫存會變成負數就整批拒絕
+        """
+        try:
+            body = json.loads(request.body)
+        except (ValueError, UnicodeDecodeError):
+            return JsonResponse({
+                'success': False,
+                'message': '請求內容必須是 JSON',
+            }, status=400)
+
+        try:
+            stocks = StockAdjustmentService.apply(
+                body.get('adjustments') if isinstance(body, dict) else None
+            )
+        except StockAdjustmentError as e:
+            return JsonResponse({
+                'success': False,
+                'message': e.message,
+                'errors': e.details,
+            }, status=e.status)
+
+        return JsonResponse({
+            'success': True,
+            'message': f'已調整 {len(stocks)} 本書籍的庫存',
+            'data': [
+                {'book_id': book_id, 'stock': stock}
+                for book_id, stock in stocks.items()
+            ],
+        })
+
 # ==================== 匯出功能 ====================
 
 class ExportBooksView(LoginRequiredMixin, View):
     """匯出書籍報表 API"""
 
+    def get(self, request):
+        """
+        同步下載（書籍數量不多時使用）：邊查詢邊送出 CSV，不必等背景任務
+        """
+        total = BookExportService.count()
+        if total > BookExportService.SYNC_MAX_ROWS:
+            return JsonResponse({
+                'success': False,
+                'message': f'書籍超過 {BookExportService.SYNC_MAX_ROWS} 本，請改用背景匯出',
+            }, status=400)
+
+        filename = f'books_export_{datetime.now().strftime("%Y%m%d_%H%M%S")}.csv'
+        response = StreamingHttpResponse(
+            BookExportService.stream_csv(),
+            content_type='text/csv; charset=utf-8',
+        )
+        response['Content-Disposition'] = f'attachment; filename="{filename}"'
+        return response
+
     def post(self, request):
+        """
+        背景匯出：交給 Celery 產生檔案，完成後以 WebSocket 通知
+
+        Query 參數：
+            format: csv（預設）、csv.gz、jsonl.gz、xlsx
+        """
         from apps.library.tasks import export_books_to_csv
 
-        # 發送任務到 Celery
-        task = export_books_to_csv.delay(user_id=request.user.id)
+        export_format = request.GET.get('format', BookExportService.DEFAULT_FORMAT)
+        if export_format not in BookExportService.FORMATS:
+            return JsonResponse({
+                'success': False,
+                'message': f'format 必須是 {", ".join(BookExportService.FORMATS)} 其中之一',
+            }, status=400)
+
+        # 相同目錄版本與格式的匯出只做一次
+        export = BookExportService.request_export(request.user.id, export_format)
+
+        if export['status'] == 'busy':
+            # 同時有大量匯出請求，等不到登記用的鎖：請客戶端稍後重試
+            response = JsonResponse({
+                'success': False,
+                'message': '目前匯出請求較多，請稍後再試',
+            }, status=503)
+            response['Retry-After'] = str(BookExportService.LOCK_TIMEOUT)
+            return response
+
+        if export['status'] == 'ready':
+            # 目錄沒有變動，直接沿用已經匯出的檔案
+            return JsonResponse({
+                'success': True,
+                'status': 'ready',
+                'message': f'報表已是最新版本！檔案：{export["filename"]}',
+                'filename': export['filename'],
+                'total_books': export['total_books'],
+            })
+
+        if export['status'] == 'queued':
+            # 發送任務到 Celery（使用登記時產生的任務 ID）
+            try:
+                export_books_to_csv.apply_async(
+                    kwargs={
+                        'user_id': request.user.id,
+                        'export_format': export_format,
+                        'catalog_version': export['version'],
+                    },
+                    task_id=export['task_id'],
+                )
+            except Exception:
+                # 任務沒送出去，釋放登記，避免之後的請求一直等這個任務
+                BookExportService.finish_export(export_format, export['version'])
+                raise
 
         return JsonResponse({
             'success': True,
+            'status': export['status'],
             'message': '報表產生中，完成後會通知您！',
-            'task_id': task.id,
+            'task_id': export['task_id'],
         })
+
+
+# ==================== 任務統計 ====================
+
+class TaskMetricsView(View):
+    """
+    Celery 任務統計（Prometheus 文字格式）
+
+    只允許帶有 settings.METRICS_TOKEN（Authorization: Bearer ...）的請求或管理員存取，不對外公開
+    """
+
+    def get(self, request):
+        if not request.user.is_staff and not self._has_valid_token(request):
+            return HttpResponse('Forbidden', status=403, content_type='text/plain; charset=utf-8')
+
+        return HttpResponse(
+            TaskMetrics.render(),
+            content_type='text/plain; version=0.0.4; charset=utf-8',
+        )
+
+    @staticmethod
+    def _has_valid_token(request):
+        """檢查 Bearer 權杖（沒有設定 METRICS_TOKEN 時一律拒絕）"""
+        token = getattr(settings, 'METRICS_TOKEN', None)
+        scheme, _, credentials = request.headers.get('Authorization', '').partition(' ')
+        return bool(token) and scheme.lower() == 'bearer' and hmac.compare_digest(
+            credentials.strip().encode(), token.encode()
+        )
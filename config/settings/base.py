@@ -254,6 +254,28 @@ CELERY_RESULT_SERIALIZER = 'json'
 # 啟動時重試連線（消除 Celery 6.0 棄用警告）
 CELERY_BROKER_CONNECTION_RETRY_ON_STARTUP = True
 
+# ==========================================
+# Celery 任務佇列與執行設定（詳見 config/task_profiles.py）
+# ==========================================
+from config.task_profiles import (
+    DEFAULT_QUEUE, build_task_annotations, build_task_queues, build_task_routes,
+)
+
+# 匯出、警告、整理任務分別放在不同佇列，警告不會排在匯出任務後面
+CELERY_TASK_QUEUES = build_task_queues()
+CELERY_TASK_DEFAULT_QUEUE = DEFAULT_QUEUE
+CELERY_TASK_ROUTES = build_task_routes()
+
+# 各任務的時間限制、acks_late、是否保存結果、速率限制
+CELERY_TASK_ANNOTATIONS = build_task_annotations()
+
+# 任務結果只保留 6 小時（預設 1 天）；警告與整理任務不保存結果
+CELERY_RESULT_EXPIRES = 60 * 60 * 6
+
+# 預設每個 worker 程序一次只預取一個任務，避免短任務被分配到正在執行長任務的程序
+# （以 run_queue_worker 啟動時依 config/task_profiles.py 的 QUEUE_WORKERS 個別設定，例如警告佇列為 4）
+CELERY_WORKER_PREFETCH_MULTIPLIER = 1
+
 # ==========================================
 # Celery Beat 定時任務設定
 # ==========================================
@@ -262,3 +284,45 @@ from celery.schedules import crontab
 # 使用 django-celery-beat 的資料庫排程器
 CELERY_BEAT_SCHEDULER = 'django_celery_beat.schedulers:DatabaseScheduler'
 
+# 固定的系統排程（啟動 Beat 時會同步到資料庫）
+CELERY_BEAT_SCHEDULE = {
+    # 每天凌晨 3 點壓縮書籍異動紀錄
+    'compact-book-changes': {
+        'task': 'apps.library.tasks.compact_book_changes',
+        'schedule': crontab(hour=3, minute=0),
+    },
+    # 每分鐘補上 commit 後沒有編號的異動紀錄（客戶端查詢異動時才看得到）
+    'assign-orphan-book-changes': {
+        'task': 'apps.library.tasks.assign_orphan_book_changes',
+        'schedule': crontab(minute='*'),
+    },
+    # 每天凌晨 4 點修正計數欄位（出版社/作者書籍數量、書籍收藏數）
+    'reconcile-counters': {
+        'task': 'apps.library.tasks.reconcile_counters',
+        'schedule': crontab(hour=4, minute=0),
+    },
+    # 每小時重建庫存不足清單（修正沒有經過 Signal 的庫存異動）
+    'rebuild-low-stock-set': {
+        'task': 'apps.library.tasks.rebuild_low_stock_set',
+        'schedule': crontab(minute=30),
+    },
+}
+
+
+# ==========================================
+# 庫存警告分散發送（apps/accounts/services.py UserPreferenceService）
+# ==========================================
+# 各頻率的發送範圍（秒）：每位使用者固定落在其中某個時段，沒有列出的頻率不分散
+# 最長的延遲必須小於 broker 的 visibility_timeout（Redis 預設 1 小時），啟動時會檢查
+STOCK_ALERT_DELIVERY_WINDOWS = {'hourly': 600, 'daily': 1800, 'weekly': 1800}
+
+# 每個時段的長度（秒）
+STOCK_ALERT_DELIVERY_SLOT_SECONDS = 60
+
+
+# ==========================================
+# 任務統計（GET /metrics/）
+# ==========================================
+# Prometheus 等抓取時以 Authorization: Bearer <METRICS_TOKEN> 驗證，其他請求只限管理員
+# （網站在反向代理後面，REMOTE_ADDR 都是代理的位址，不能用來判斷來源）
+METRICS_TOKEN = os.getenv('METRICS_TOKEN')
@@ -0,0 +1,135 @@
+"""
+Celery 任務執行設定（佇列、時間限制、結果保存）
+
+原本所有任務都排在同一個預設佇列，庫存警告會卡在好幾分鐘的匯出任務後面，
+而且每個警告任務的結果都存進 Redis、沒有人讀取。這裡把任務分成幾種執行設定：
+- exports：匯出、匯入等長時間任務，保留結果（用來查詢進度），失敗後可重新執行
+- alerts：庫存警告，時間很短、不保存結果，不會被匯出任務拖延
+  （實際發送通知的任務另外限制速率，避免同一時段大量通知湧入 channel layer）
+- maintenance：每天/每小時的整理任務，不保存結果
+
+每個佇列由各自的 worker 處理（prefetch 只能設定在 worker 上），依 QUEUE_WORKERS 的設定啟動：
+    python manage.py run_queue_worker exports
+    python manage.py run_queue_worker alerts
+    python manage.py run_queue_worker maintenance
+
+開發環境只啟動一個 worker（不指定 -Q）時會處理所有佇列
+"""
+from kombu import Queue
+
+
+# 沒有指定設定的任務使用的佇列（與 Celery 預設相同，舊的 worker 啟動指令不需要修改）
+DEFAULT_QUEUE = 'celery'
+
+# 各佇列的 worker 設定（run_queue_worker 依此啟動 worker）
+# extra_queues：同一個 worker 另外處理的佇列（沒有指定設定的任務排在預設佇列，由整理任務的 worker 處理）
+QUEUE_WORKERS = {
+    'exports': {'concurrency': 2, 'prefetch_multiplier': 1},
+    'alerts': {'concurrency': 8, 'prefetch_multiplier': 4},
+    'maintenance': {'concurrency': 1, 'prefetch_multiplier': 1, 'extra_queues': [DEFAULT_QUEUE]},
+}
+
+# 執行設定
+# soft_time_limit 到達時任務內會拋出 SoftTimeLimitExceeded（可以清理後結束），time_limit 到達時直接終止
+# acks_late：任務執行完才確認，worker 中途當機時會重新執行（任務必須可以重複執行）
+# 使用 acks_late 時 time_limit 必須小於 broker 的 visibility_timeout（Redis 預設 1 小時），否則會被重複派送
+TASK_PROFILES = {
+    'export': {
+        'queue': 'exports',
+        # 與 BookExportService.INFLIGHT_TIMEOUT（30 分鐘）一致：超過時間的匯出登記也會失效
+        'soft_time_limit': 25 * 60,
+        'time_limit': 30 * 60,
+        'acks_late': True,
+        'ignore_result': False,
+    },
+    'import': {
+        'queue': 'exports',
+        'soft_time_limit': 50 * 60,
+        'time_limit': 55 * 60,
+        # 匯入重新執行會重複建立書籍，只執行一次
+        'acks_late': False,
+        'ignore_result': False,
+    },
+    'alert': {
+        'queue': 'alerts',
+        'soft_time_limit': 30,
+        'time_limit': 60,
+        # 重新執行會重複通知，寧可漏發一次
+        'acks_late': False,
+        'ignore_result': True,
+    },
+    'alert_delivery': {
+        'queue': 'alerts',
+        'soft_time_limit': 30,
+        'time_limit': 60,
+        'acks_late': False,
+        'ignore_result': True,
+        # 每個 worker 每分鐘最多處理的批數，即使同一時段的使用者很多也不會瞬間湧入 channel layer
+        'rate_limit': '60/m',
+    },
+    'maintenance': {
+        'queue': 'maintenance',
+        'soft_time_limit': 10 * 60,
+        'time_limit': 15 * 60,
+        'acks_late': True,
+        'ignore_result': True,
+    },
+}
+
+# 任務名稱 → 執行設定
+TASK_PROFILE_ASSIGNMENTS = {
+    'apps.library.tasks.export_books_to_csv': 'export',
+    'apps.library.tasks.import_books': 'import',
+    'apps.library.tasks.check_low_stock_books': 'alert',
+    'apps.library.tasks.check_low_stock_books_for_user': 'alert',
+    'apps.library.tasks.check_low_stock_books_for_frequency': 'alert',
+    'apps.library.tasks.send_low_stock_alerts': 'alert_delivery',
+    'apps.library.tasks.compact_book_changes': 'maintenance',
+    'apps.library.tasks.assign_orphan_book_changes': 'maintenance',
+    'apps.library.tasks.reconcile_counters': 'maintenance',
+    'apps.library.tasks.rebuild_low_stock_set': 'maintenance',
+}
+
+
+def build_task_queues():
+    """所有佇列（CELERY_TASK_QUEUES）"""
+    names = [DEFAULT_QUEUE, *dict.fromkeys(profile['queue'] for profile in TASK_PROFILES.values())]
+    return [Queue(name, routing_key=name) for name in names]
+
+
+def build_task_routes():
+    """任務 → 佇列（CELERY_TASK_ROUTES）"""
+    return {
+        task_name: {'queue': TASK_PROFILES[profile]['queue']}
+        for task_name, profile in TASK_PROFILE_ASSIGNMENTS.items()
+    }
+
+
+def build_worker_argv(queue, extra_args=()):
+    """
+    某個佇列的 worker 啟動參數（celery worker 的 argv，與 celery -A config worker ... 相同）
+
+    Raises:
+        KeyError: QUEUE_WORKERS 沒有這個佇列
+    """
+    options = QUEUE_WORKERS[queue]
+    return [
+        'worker',
+        '-Q', ','.join([queue, *options.get('extra_queues', ())]),
+        '--concurrency', str(options['concurrency']),
+        '--prefetch-multiplier', str(options['prefetch_multiplier']),
+        '-n', f'{queue}@%h',
+        *extra_args,
+    ]
+
+
+def build_task_annotations():
+    """任務屬性：時間限制、acks_late、ignore_result、rate_limit（CELERY_TASK_ANNOTATIONS）"""
+    return {
+        task_name: {
+            option: value
+            for option, value in TASK_PROFILES[profile].items()
+            if option != 'queue'
+        }
+        for task_name, profile in TASK_PROFILE_ASSIGNMENTS.items()
+    }
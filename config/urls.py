@@ -17,11 +17,14 @@ Including another URLconf
 from django.contrib import admin
 from django.urls import path, include
 
+from apps.library.views import TaskMetricsView
+
 
 urlpatterns = [
     path('admin/', admin.site.urls),  # http://127.0.0.1:8000/admin/
     path('accounts/', include('allauth.urls')),  # allauth 的所有 URLs
     path('settings/', include('apps.accounts.urls')),  # 新增這行：使用者設定
     path('library/', include('apps.library.urls')),  # http://127.0.0.1:8000/library/
+    path('metrics/', TaskMetricsView.as_view(), name='task_metrics'),  # Celery 任務統計（需要權杖或管理員）
     path('', include('apps.core.urls')),
 ]